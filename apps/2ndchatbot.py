@@ -1,25 +1,22 @@
+import time
+STARTUP_T0 = time.perf_counter()
+
 import customtkinter as ctk
-import faiss
-import pickle
-from sentence_transformers import SentenceTransformer
-import numpy as np
 from PIL import Image, ImageTk
 import os
+from inference_worker import InferenceWorker, FRAME_MS
+from chat_engine import ChatEngine, StartupTimeline
+from answer_pipeline import AnswerPipeline, format_timings
 
-# === Load Model and Data ===
-index = faiss.read_index("model_data/chatbot_index.faiss")
-with open("model_data/questions.pkl", "rb") as f:
-    questions = pickle.load(f)
-with open("model_data/answers.pkl", "rb") as f:
-    answers = pickle.load(f)
-
-model = SentenceTransformer("all-MiniLM-L6-v2")
+# === Model and Data (loaded in the background once the window is up) ===
+timeline = StartupTimeline(STARTUP_T0)
+engine = ChatEngine(timeline=timeline)
+# Fact lookups and AIML answer first; the transformer only runs when they can't
+pipeline = AnswerPipeline(engine=engine)
 
 # === Ask Function ===
 def get_answer(query):
-    query_vec = model.encode([query]).astype('float32')
-    _, I = index.search(query_vec, 1)
-    return answers[I[0][0]]
+    return pipeline.answer(query)
 
 # === GUI ===
 ctk.set_appearance_mode("light")  # Kids usually prefer bright
@@ -78,11 +75,38 @@ def on_ask():
     chatbox.configure(state="normal")
     chatbox.insert("end", f"\n🧒 You: {query}\n", "user")
 
-    answer = get_answer(query)
-    chatbox.insert("end", f"🤖 Bot: {answer}\n", "bot")
+    # Placeholder gets its own tag so the reply can replace it in place
+    ticket = worker.submit(query, on_reply)
+    chatbox.insert("end", "🤖 Bot: thinking…\n", ("bot", f"pending{ticket}"))
+    chatbox.configure(state="disabled")
+    chatbox.see("end")
+
+def on_reply(reply):
+    tag = f"pending{reply.ticket}"
+    ranges = chatbox.tag_ranges(tag)
+    if not ranges:
+        return
+
+    if reply.cancelled:
+        text = "🤖 Bot: (skipped, you asked something new)\n"
+    elif reply.error is not None:
+        text = "🤖 Bot: Oops, I got confused. Please try again!\n"
+    else:
+        text = f"🤖 Bot: {reply.answer.text}\n"
+
+    chatbox.configure(state="normal")
+    chatbox.delete(ranges[0], ranges[1])
+    chatbox.insert(ranges[0], text, "bot")
     chatbox.configure(state="disabled")
     chatbox.see("end")
 
+    if not reply.cancelled and reply.error is None:
+        budget = "OK" if reply.ui_lag_ms <= FRAME_MS else "OVER FRAME BUDGET"
+        print(f"[chatbot] answered by {reply.answer.stage} in {reply.elapsed_ms:.0f} ms "
+              f"({format_timings(reply.answer.timings)}), worst UI lag {reply.ui_lag_ms:.1f} ms ({budget})")
+        if engine.cache is not None:
+            print(f"[chatbot] cache: {engine.cache.summary()}")
+
 # === Buttons ===
 button_frame = ctk.CTkFrame(frame, fg_color="transparent")
 button_frame.pack(pady=(0, 10), fill="x", padx=15)
@@ -97,4 +121,17 @@ exit_button.pack(side="right", pady=10)
 chatbox.tag_config("user", foreground="#007FFF")
 chatbox.tag_config("bot", foreground="#008000")
 
+# === Background Inference ===
+def on_pipeline_ready(error):
+    if error is not None:
+        print(f"[chatbot] failed to load answers: {error}")
+        return
+    print("[chatbot] quick answers ready, model still loading in the background")
+
+worker = InferenceWorker(app, get_answer, warmup=pipeline.warm_up, on_ready=on_pipeline_ready)
+app.after(0, lambda: timeline.mark("window shown"))
+
 app.mainloop()
+
+# Keep this session's answers for the next one
+engine.save_cache()
@@ -0,0 +1,133 @@
+"""Load the AIML kernel from a precompiled brain file.
+
+Parsing math.aiml on every launch is the slow part of starting the
+rule-based chatbot. The first launch learns the AIML as usual and saves the
+result with ``saveBrain``; later launches ``bootstrap`` straight from that
+brain file for as long as the SHA-256 of the AIML source stays the same.
+
+    python aiml_brain.py build [math.aiml]     # (re)compile the brain if the source changed
+    python aiml_brain.py bench [--patterns N]  # learn vs. brain load timing
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+
+AIML_FILE = "math.aiml"
+
+
+def brain_path_for(aiml_path):
+    return os.path.splitext(aiml_path)[0] + ".brn"
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _new_kernel():
+    import aiml
+    kernel = aiml.Kernel()
+    kernel.verbose(False)
+    return kernel
+
+
+def brain_is_current(aiml_path, brain_path=None):
+    brain_path = brain_path or brain_path_for(aiml_path)
+    try:
+        with open(brain_path + ".sha256") as f:
+            return f.read().strip() == file_sha256(aiml_path) and os.path.exists(brain_path)
+    except OSError:
+        return False
+
+
+def build_brain(aiml_path=AIML_FILE, brain_path=None):
+    """Learn the AIML source and save the brain plus the source hash it came from."""
+    brain_path = brain_path or brain_path_for(aiml_path)
+    digest = file_sha256(aiml_path)
+    kernel = _new_kernel()
+    kernel.learn(aiml_path)
+    tmp = brain_path + ".tmp"
+    kernel.saveBrain(tmp)
+    os.replace(tmp, brain_path)
+    with open(brain_path + ".sha256.tmp", "w") as f:
+        f.write(digest + "\n")
+    os.replace(brain_path + ".sha256.tmp", brain_path + ".sha256")
+    return kernel
+
+
+def load_kernel(aiml_path=AIML_FILE, brain_path=None):
+    """Kernel for ``aiml_path``, from the brain file when it is up to date."""
+    brain_path = brain_path or brain_path_for(aiml_path)
+    if brain_is_current(aiml_path, brain_path):
+        kernel = _new_kernel()
+        kernel.bootstrap(brainFile=brain_path)
+        return kernel
+    try:
+        return build_brain(aiml_path, brain_path)
+    except OSError:
+        # Read-only install directory: still answer, just without the cached brain
+        kernel = _new_kernel()
+        kernel.learn(aiml_path)
+        return kernel
+
+
+# ---------- Benchmark ----------
+def _synthetic_aiml(path, patterns):
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<aiml version="1.0">\n')
+        for i in range(patterns):
+            a, b = divmod(i, 100)
+            f.write(f"<category><pattern>WHAT IS {a} PLUS {b}</pattern><template>{a + b}</template></category>\n")
+        f.write("</aiml>\n")
+
+
+def bench(aiml_path=None, patterns=150, repeats=5):
+    with tempfile.TemporaryDirectory() as tmp:
+        if aiml_path is None or not os.path.exists(aiml_path):
+            aiml_path = os.path.join(tmp, "math.aiml")
+            _synthetic_aiml(aiml_path, patterns)
+            print(f"using a synthetic AIML file with {patterns} patterns")
+        brain_path = os.path.join(tmp, "bench.brn")
+        build_brain(aiml_path, brain_path)
+
+        learn_s, load_s = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            _new_kernel().learn(aiml_path)
+            learn_s.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            load_kernel(aiml_path, brain_path)
+            load_s.append(time.perf_counter() - start)
+        learn_ms, load_ms = min(learn_s) * 1000, min(load_s) * 1000
+        print(f"learn from AIML: {learn_ms:.1f} ms")
+        print(f"load brain file: {load_ms:.1f} ms (includes hashing the source)")
+        print(f"speedup: {learn_ms / load_ms:.1f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompile and benchmark the AIML brain file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build")
+    build.add_argument("aiml", nargs="?", default=AIML_FILE)
+    b = sub.add_parser("bench")
+    b.add_argument("aiml", nargs="?", default=AIML_FILE)
+    b.add_argument("--patterns", type=int, default=150)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        if brain_is_current(args.aiml):
+            print(f"{brain_path_for(args.aiml)} is up to date")
+        else:
+            build_brain(args.aiml)
+            print(f"wrote {brain_path_for(args.aiml)}")
+    else:
+        bench(args.aiml, args.patterns)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import os
+import pickle
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+CACHE_FILE = os.path.expanduser("~/.cache/edulite/chatbot_answers.pkl")
+TEXT_CACHE_SIZE = 512
+SEMANTIC_CACHE_SIZE = 2048
+CACHE_TTL = 7 * 24 * 3600           # seconds; None keeps entries forever
+SEMANTIC_THRESHOLD = 0.97           # cosine similarity to reuse a cached answer
+
+_PUNCT = re.compile(r"[^\w\s+#]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(text):
+    # "What is  Python??" and "what is python" should share one entry
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = _PUNCT.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+class LRUCache:
+    """Size- and age-bounded LRU with hit/miss counters.
+
+    Entries are stamped with wall-clock time so the TTL still means something
+    after the cache has been saved and reloaded in a later session.
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _expired(self, stamp, now):
+        return self.ttl is not None and now - stamp > self.ttl
+
+    def get(self, key, count=True):
+        """The live value for ``key`` or None; ``count=False`` leaves hits/misses to the caller."""
+        entry = self._data.get(key)
+        if entry is None or self._expired(entry[1], time.time()):
+            if entry is not None:
+                del self._data[key]
+            if count:
+                self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        if count:
+            self.hits += 1
+        return entry[0]
+
+    def purge(self):
+        """Drop every expired entry."""
+        now = time.time()
+        for key in [k for k, (_, stamp) in self._data.items() if self._expired(stamp, now)]:
+            del self._data[key]
+
+    def put(self, key, value):
+        self._data[key] = (value, time.time())
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def items(self):
+        return [(key, value) for key, (value, _) in self._data.items()]
+
+    def state(self):
+        now = time.time()
+        return [(k, v, s) for k, (v, s) in self._data.items() if not self._expired(s, now)]
+
+    def restore(self, entries):
+        for key, value, stamp in entries[-self.maxsize:]:
+            self._data[key] = (value, stamp)
+
+
+class AnswerCache:
+    """Two-tier cache in front of the encoder and the FAISS search.
+
+    Tier 1 maps normalized query text straight to an answer, so a repeated
+    question never reaches the encoder. Tier 2 is keyed by the query
+    embedding: a new phrasing whose embedding is within SEMANTIC_THRESHOLD
+    cosine similarity of a cached one reuses that answer and skips the index
+    search. Both tiers are saved to CACHE_FILE and tagged with a fingerprint
+    of the index, so rebuilding model_data invalidates them.
+    """
+
+    def __init__(self, path=CACHE_FILE, text_size=TEXT_CACHE_SIZE, semantic_size=SEMANTIC_CACHE_SIZE,
+                 ttl=CACHE_TTL, threshold=SEMANTIC_THRESHOLD, fingerprint=None):
+        self.path = path
+        self.threshold = threshold
+        self.fingerprint = fingerprint
+        self.text = LRUCache(text_size, ttl)
+        self.semantic = LRUCache(semantic_size, ttl)
+        self._matrix = None
+        self._matrix_keys = []
+        self._lock = threading.Lock()
+
+    # ---------- Tier 1: normalized text ----------
+    def get_text(self, query):
+        with self._lock:
+            return self.text.get(normalize_query(query))
+
+    def put_text(self, query, answer):
+        with self._lock:
+            self.text.put(normalize_query(query), answer)
+
+    # ---------- Tier 2: embeddings ----------
+    @staticmethod
+    def _embedding_key(vec):
+        import numpy as np
+        return np.round(np.asarray(vec, dtype="float32") * 127).astype("int8").tobytes()
+
+    def get_semantic(self, vec):
+        import numpy as np
+        with self._lock:
+            hit = self.semantic.get(self._embedding_key(vec), count=False)
+            if hit is None and len(self.semantic):
+                # Nearest live neighbour; expired entries must not shadow the next best one
+                self.semantic.purge()
+                if self._matrix is None or len(self._matrix_keys) != len(self.semantic):
+                    entries = self.semantic.items()
+                    self._matrix_keys = [k for k, _ in entries]
+                    self._matrix = np.stack([v[0] for _, v in entries]) if entries else None
+                if self._matrix is not None:
+                    sims = self._matrix @ np.asarray(vec, dtype="float32")
+                    best = int(sims.argmax())
+                    if sims[best] >= self.threshold:
+                        hit = self.semantic.get(self._matrix_keys[best], count=False)
+            if hit is None:
+                self.semantic.misses += 1
+                return None
+            self.semantic.hits += 1
+            return hit[1]
+
+    def put_semantic(self, vec, answer):
+        import numpy as np
+        with self._lock:
+            vec = np.asarray(vec, dtype="float32")
+            self.semantic.put(self._embedding_key(vec), (vec, answer))
+            self._matrix = None
+
+    # ---------- Counters and persistence ----------
+    def stats(self):
+        with self._lock:
+            return {
+                "text_hits": self.text.hits, "text_misses": self.text.misses, "text_size": len(self.text),
+                "semantic_hits": self.semantic.hits, "semantic_misses": self.semantic.misses,
+                "semantic_size": len(self.semantic),
+            }
+
+    def summary(self):
+        s = self.stats()
+        return (f"text {s['text_hits']}/{s['text_hits'] + s['text_misses']} hits ({s['text_size']} entries), "
+                f"semantic {s['semantic_hits']}/{s['semantic_hits'] + s['semantic_misses']} hits "
+                f"({s['semantic_size']} entries)")
+
+    def load(self):
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return
+        if state.get("fingerprint") != self.fingerprint:
+            return
+        with self._lock:
+            self.text.restore(state["text"])
+            self.semantic.restore(state["semantic"])
+            self._matrix = None
+
+    def save(self):
+        with self._lock:
+            state = {"fingerprint": self.fingerprint, "text": self.text.state(), "semantic": self.semantic.state()}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+
+def index_fingerprint(path):
+    st = os.stat(path)
+    return f"{st.st_size}:{int(st.st_mtime)}"
@@ -0,0 +1,202 @@
+"""Append-only journal of a student's exam, for recovery after a crash.
+
+Every event is one JSON line appended with a single write():
+
+    {"t": "start", "test": "test3.json", "questions": 5, "duration": 120, "wall": 1760000000.0}
+    {"t": "answer", "q": 2, "a": 1, "elapsed": 41.2}
+    {"t": "time", "elapsed": 45.0}
+    {"t": "end", "reason": "submitted", "elapsed": 63.9}
+
+Writes go straight to the OS, so the UI thread never waits on the disk.
+A background thread fsyncs at most every FSYNC_INTERVAL seconds while
+there are unsynced lines. One fsync therefore covers a burst of answers,
+and an answer is on disk within about FSYNC_INTERVAL plus one fsync.
+
+On restart, ``recover()`` replays the newest journal that has no "end"
+line and returns the test, the answers and the exam time already used. A
+line torn by a power cut is ignored.
+
+    python answer_journal.py bench [--answers N] [--dir PATH]   # per-answer cost, batched vs. fsync each
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+JOURNAL_DIR = "exam_journal"
+FSYNC_INTERVAL = 0.05
+
+# What recover() found: answers maps question index -> option index
+Recovered = namedtuple("Recovered", "path test answers elapsed duration")
+
+
+class AnswerJournal:
+    def __init__(self, path, fsync_interval=FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+        self._trim_torn_tail()
+        self._dirty = threading.Event()
+        self._closed = False
+        self._lock = threading.Lock()   # keeps fsync and close from racing on the fd
+        self._syncer = threading.Thread(target=self._sync_loop, daemon=True)
+        self._syncer.start()
+
+    @classmethod
+    def create(cls, test, questions, duration=None, folder=JOURNAL_DIR, fsync_interval=FSYNC_INTERVAL):
+        """A new journal file for one sitting of ``test``."""
+        now = time.time()
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f".{int(now * 1000) % 1000:03d}"
+        name = f"{stamp}-{os.getpid()}-{os.path.splitext(test)[0]}.jsonl"
+        journal = cls(os.path.join(folder, name), fsync_interval)
+        journal._append({"t": "start", "test": test, "questions": questions, "duration": duration,
+                         "wall": time.time()})
+        return journal
+
+    def _trim_torn_tail(self):
+        # A crash mid-write leaves a partial last line; appending after it would glue records together
+        size = os.fstat(self._fd).st_size
+        if size == 0 or os.pread(self._fd, 1, size - 1) == b"\n":
+            return
+        with open(self.path, "rb") as f:
+            good = f.read().rfind(b"\n") + 1
+        os.ftruncate(self._fd, good)
+
+    def _append(self, record):
+        if self._closed:
+            return
+        os.write(self._fd, (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8"))
+        self._dirty.set()
+
+    def _sync_loop(self):
+        while True:
+            self._dirty.wait()
+            with self._lock:
+                if self._closed:
+                    return
+                self._dirty.clear()
+                os.fsync(self._fd)
+            time.sleep(self.fsync_interval)
+
+    def answer(self, question, option, elapsed=None):
+        record = {"t": "answer", "q": question, "a": option}
+        if elapsed is not None:
+            record["elapsed"] = round(elapsed, 1)
+        self._append(record)
+
+    def checkpoint(self, elapsed):
+        """Record exam time used so far, so a restart can restore the clock."""
+        self._append({"t": "time", "elapsed": round(elapsed, 1)})
+
+    def finish(self, reason="submitted", elapsed=None):
+        self._append({"t": "end", "reason": reason, "elapsed": None if elapsed is None else round(elapsed, 1)})
+        self.close()
+
+    def close(self):
+        if self._closed:
+            return
+        with self._lock:
+            self._closed = True
+            os.fsync(self._fd)
+            os.close(self._fd)
+        self._dirty.set()   # wake the syncer so it exits
+
+
+def replay(path):
+    """(start record, answers, elapsed, ended) from one journal file."""
+    start, answers, elapsed, ended = None, {}, 0.0, False
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break   # torn write at the tail
+            kind = record.get("t")
+            if kind == "start":
+                start = record
+            elif kind == "answer":
+                answers[record["q"]] = record["a"]
+            elif kind == "end":
+                ended = True
+            if record.get("elapsed") is not None:
+                elapsed = max(elapsed, record["elapsed"])
+    return start, answers, elapsed, ended
+
+
+def recover(folder=JOURNAL_DIR):
+    """The newest unfinished sitting in ``folder``, or None."""
+    try:
+        names = sorted((n for n in os.listdir(folder) if n.endswith(".jsonl")), reverse=True)
+    except FileNotFoundError:
+        return None
+    if not names:
+        return None
+    path = os.path.join(folder, names[0])
+    start, answers, elapsed, ended = replay(path)
+    if ended or start is None:
+        return None
+    return Recovered(path, start["test"], answers, elapsed, start.get("duration"))
+
+
+def abandon(recovered):
+    """Close an unfinished sitting the student chose not to resume."""
+    journal = AnswerJournal(recovered.path)
+    journal.finish("abandoned", recovered.elapsed)
+
+
+def resume(recovered, fsync_interval=FSYNC_INTERVAL):
+    """Keep appending to the journal of a recovered sitting."""
+    return AnswerJournal(recovered.path, fsync_interval)
+
+
+# ---------- Benchmark ----------
+def _bench_one(folder, answers, sync_each, label):
+    start_ns = time.perf_counter_ns()
+    journal = AnswerJournal.create("bench.json", answers, folder=folder)
+    latencies = []
+    for i in range(answers):
+        t0 = time.perf_counter_ns()
+        if sync_each:
+            journal._append({"t": "answer", "q": i, "a": i % 4})
+            os.fsync(journal._fd)
+        else:
+            journal.answer(i, i % 4)
+        latencies.append((time.perf_counter_ns() - t0) / 1e6)
+        time.sleep(0.001)   # answers arrive spread out, not in one burst
+    journal.finish()
+    total_s = (time.perf_counter_ns() - start_ns) / 1e9
+    latencies.sort()
+    print(f"{label:<22} mean {sum(latencies) / len(latencies):7.3f} ms   "
+          f"p99 {latencies[int(0.99 * (len(latencies) - 1))]:7.3f} ms   max {latencies[-1]:7.3f} ms   "
+          f"total {total_s:.2f} s")
+    _, replayed, _, ended = replay(journal.path)
+    assert ended and len(replayed) == answers
+
+
+def bench(answers=1000, folder=None):
+    tmp = tempfile.mkdtemp(dir=folder)
+    try:
+        print(f"{answers} answers written to {tmp} (UI-thread cost per answer)")
+        _bench_one(tmp, answers, True, "fsync every answer")
+        _bench_one(tmp, answers, False, f"batched ({FSYNC_INTERVAL * 1000:.0f} ms fsync)")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the exam answer journal")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("bench")
+    b.add_argument("--answers", type=int, default=1000)
+    b.add_argument("--dir", help="filesystem to test, e.g. a spinning disk (default: system temp)")
+    args = parser.parse_args(argv)
+    bench(args.answers, args.dir)
+
+
+if __name__ == "__main__":
+    main()
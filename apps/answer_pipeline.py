@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+import qa_sources
+from answer_cache import normalize_query
+from chat_engine import FALLBACK_ANSWER
+from fact_router import CODING_KEYWORDS, GENERAL_KEYWORDS, FactIndex, KeywordRouter
+
+AIML_FILE = "math.aiml"
+FACT_SOURCES = {
+    "coding": "coding_facts.csv",
+    "general": "general_facts.csv",
+    "kids": "kids_facts.csv",
+}
+NO_ANSWER = "I don’t understand that yet. Try asking about math, coding, or general facts!"
+
+# text: the reply; stage: which stage produced it; timings: [(stage, ms), ...] in the order tried
+PipelineAnswer = namedtuple("PipelineAnswer", "text stage timings")
+
+
+def load_kernel(path=AIML_FILE):
+    """AIML kernel with the math patterns, or None if aiml or the file is missing."""
+    if not os.path.exists(path):
+        return None
+    try:
+        import aiml_brain
+        return aiml_brain.load_kernel(path)
+    except ImportError:
+        return None
+
+
+class AnswerPipeline:
+    """Tries the cheapest way to answer first and stops at the first hit.
+
+    Stages, in order:
+      lookup     normalized exact match against every fact CSV (dict lookups)
+      aiml       AIML math patterns
+      fuzzy      near-miss match in the fact indexes, keyword-routed one first
+      embedding  sentence-transformer + FAISS search (ChatEngine)
+
+    Every answer reports the stage that produced it and the time each tried
+    stage took, so it is easy to see how many queries reach the transformer.
+    """
+
+    def __init__(self, facts=None, kernel=None, engine=None, router=None):
+        self.facts = facts            # {name: FactIndex}, in fallback order
+        self.kernel = kernel
+        self.engine = engine
+        self.router = router or KeywordRouter([("coding", CODING_KEYWORDS), ("general", GENERAL_KEYWORDS)])
+        self.engine_error = None
+        self._lock = threading.Lock()
+
+    def warm_up(self, sources=FACT_SOURCES, aiml_path=AIML_FILE):
+        """Build the cheap stages now and start loading the encoder in the background."""
+        with self._lock:
+            if self.facts is None:
+                self.facts = {name: FactIndex(qa_sources.load_csv_pairs(path))
+                              for name, path in sources.items() if os.path.exists(path)}
+            if self.kernel is None:
+                self.kernel = load_kernel(aiml_path)
+        if self.engine is not None and not self.engine.ready:
+            threading.Thread(target=self._load_engine, name="engine-load", daemon=True).start()
+
+    def _load_engine(self):
+        try:
+            self.engine.load()
+        except Exception as exc:
+            # e.g. sentence-transformers not installed: keep answering from the cheap stages
+            self.engine_error = exc
+            print(f"[pipeline] embedding search unavailable: {exc}")
+
+    def _stages(self):
+        return [("lookup", self._lookup), ("aiml", self._aiml),
+                ("fuzzy", self._fuzzy), ("embedding", self._embedding)]
+
+    def _lookup(self, text):
+        norm = normalize_query(text)
+        for index in self.facts.values():
+            answer = index.exact.get(norm)
+            if answer is not None:
+                return answer
+        return None
+
+    def _aiml(self, text):
+        if self.kernel is None:
+            return None
+        return self.kernel.respond(text) or None
+
+    def _fuzzy(self, text):
+        routed = self.router.route(text.lower())
+        order = sorted(self.facts, key=lambda name: name != routed)
+        for name in order:
+            answer, _ = self.facts[name].lookup(text)
+            if answer is not None:
+                return answer
+        return None
+
+    def _embedding(self, text):
+        if self.engine is None or self.engine_error is not None:
+            return None
+        answer = self.engine.get_answer(text)
+        return None if answer == FALLBACK_ANSWER else answer
+
+    def answer(self, text):
+        if self.facts is None:
+            self.warm_up()
+        timings = []
+        for stage, fn in self._stages():
+            start = time.perf_counter()
+            try:
+                result = fn(text)
+            except Exception as exc:
+                print(f"[pipeline] {stage} stage failed: {exc}")
+                result = None
+            timings.append((stage, (time.perf_counter() - start) * 1000))
+            if result:
+                return PipelineAnswer(result, stage, timings)
+        return PipelineAnswer(NO_ANSWER, None, timings)
+
+
+def format_timings(timings):
+    return ", ".join(f"{stage} {ms:.1f} ms" for stage, ms in timings)
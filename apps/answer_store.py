@@ -0,0 +1,162 @@
+"""Memory-mapped string store used in place of answers.pkl / questions.pkl.
+
+File layout (little endian):
+
+    b"EDUSTR1\\0"            8-byte magic
+    uint64 count
+    uint64 offsets[count+1]  byte offsets into the blob
+    bytes  blob              UTF-8 strings back to back
+
+Opening a store only maps the file; ``store[i]`` decodes one string. Pages
+that are never read never become resident, and because the mapping is backed
+by the file the kernel can drop them again instead of swapping to ZRAM.
+
+    python answer_store.py convert           # model_data/*.pkl -> *.strs
+    python answer_store.py bench             # load time and RSS, pickle vs store
+"""
+import argparse
+import mmap
+import os
+import pickle
+import struct
+import subprocess
+import sys
+import time
+
+MAGIC = b"EDUSTR1\0"
+HEADER = struct.Struct("<8sQ")
+MODEL_DIR = "model_data"
+
+
+def write_store(strings, path):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(encoded)))
+        f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        for data in encoded:
+            f.write(data)
+    os.replace(tmp, path)
+
+
+class StringStore:
+    """Read-only sequence of strings backed by an mmap'd store file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not an answer store")
+        self._offsets = memoryview(self._mm)[HEADER.size:HEADER.size + 8 * (self._count + 1)].cast("Q")
+        self._blob_start = HEADER.size + 8 * (self._count + 1)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        i = int(i)
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("answer store index out of range")
+        start = self._blob_start + self._offsets[i]
+        end = self._blob_start + self._offsets[i + 1]
+        return self._mm[start:end].decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(self._count))
+
+    def close(self):
+        self._offsets.release()
+        self._mm.close()
+
+
+def store_path(pickle_path):
+    return os.path.splitext(pickle_path)[0] + ".strs"
+
+
+def load_strings(pickle_path):
+    """StringStore when a converted .strs file exists, else the pickled list."""
+    path = store_path(pickle_path)
+    if os.path.exists(path):
+        return StringStore(path)
+    with open(pickle_path, "rb") as f:
+        return pickle.load(f)
+
+
+def convert(model_dir=MODEL_DIR, names=("answers.pkl", "questions.pkl")):
+    for name in names:
+        src = os.path.join(model_dir, name)
+        with open(src, "rb") as f:
+            strings = pickle.load(f)
+        write_store(strings, store_path(src))
+        print(f"{name}: {os.path.getsize(src) / 1024:.0f} KB pickle -> "
+              f"{os.path.getsize(store_path(src)) / 1024:.0f} KB store ({len(strings)} strings)")
+
+
+# ---------- Benchmark ----------
+def _rss_kb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def _bench_one(kind, path, lookups):
+    before = _rss_kb()
+    start = time.perf_counter()
+    if kind == "pickle":
+        with open(path, "rb") as f:
+            strings = pickle.load(f)
+    else:
+        strings = StringStore(path)
+    load_ms = (time.perf_counter() - start) * 1000
+    step = max(1, len(strings) // lookups)
+    start = time.perf_counter()
+    for i in range(0, len(strings), step):
+        strings[i]
+    lookup_us = (time.perf_counter() - start) * 1e6 / len(range(0, len(strings), step))
+    print(f"{load_ms:.2f} {lookup_us:.2f} {_rss_kb() - before}")
+
+
+def bench(model_dir=MODEL_DIR, lookups=50):
+    print(f"{'file':<16}{'format':<8}{'load ms':>9}{'lookup us':>11}{'RSS KB':>9}")
+    for name in ("answers.pkl", "questions.pkl"):
+        src = os.path.join(model_dir, name)
+        for kind, path in (("pickle", src), ("store", store_path(src))):
+            if not os.path.exists(path):
+                continue
+            # Each measurement in its own interpreter so nothing is shared or pre-warmed
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "_bench", kind, path, str(lookups)],
+                                 capture_output=True, text=True, check=True).stdout.split()
+            print(f"{name:<16}{kind:<8}{float(out[0]):>9.2f}{float(out[1]):>11.2f}{int(out[2]):>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert and benchmark the mmap'd answer store")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("convert", help="write .strs stores next to answers.pkl and questions.pkl")
+    sub.add_parser("bench", help="compare load time and RSS of pickles and stores")
+    one = sub.add_parser("_bench")
+    one.add_argument("kind")
+    one.add_argument("path")
+    one.add_argument("lookups", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        convert(args.model_dir)
+    elif args.command == "bench":
+        bench(args.model_dir)
+    else:
+        _bench_one(args.kind, args.path, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
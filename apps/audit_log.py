@@ -0,0 +1,183 @@
+"""Buffered JSONL audit log shared by exam mode and lab mode.
+
+``AuditLog.log()`` only builds a dict and puts it on a bounded queue, so the
+Tk thread never touches the disk. A writer thread drains the queue in
+batches, writes each batch with one write() call, fsyncs at most every
+FSYNC_INTERVAL seconds and rotates the file when it passes MAX_BYTES
+(``exam.log`` -> ``exam.log.1`` -> ... ``exam.log.<BACKUPS>``), so history
+from earlier sessions is kept instead of wiped at startup.
+
+One record per line:
+
+    {"seq": 12, "mono": 5123.482113, "wall": 1760000000.12, "src": "exam_mode", "msg": "Activating Exam Mode..."}
+
+``mono`` is time.monotonic() and orders events correctly even if the clock
+is changed during a session; ``wall`` is for people reading the log.
+If the queue is full (the disk stalled for a long time) new records are
+counted in ``dropped`` instead of blocking the UI.
+
+    python audit_log.py bench [--messages N]    # messages/sec and caller cost vs. open-write-close
+"""
+import argparse
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+MAX_BYTES = 1 << 20
+BACKUPS = 3
+QUEUE_SIZE = 10000
+BATCH_SIZE = 512
+FLUSH_INTERVAL = 0.25
+FSYNC_INTERVAL = 2.0
+
+_CLOSE = object()
+
+
+class AuditLog:
+    def __init__(self, path, source, max_bytes=MAX_BYTES, backups=BACKUPS, queue_size=QUEUE_SIZE,
+                 fsync_interval=FSYNC_INTERVAL):
+        self.path = path
+        self.source = source
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.fsync_interval = fsync_interval
+        self.dropped = 0
+        self._seq = 0
+        self._lock = threading.Lock()   # log() is called from the Tk, monitor and scheduler threads
+        self._queue = queue.Queue(queue_size)
+        self._file = open(path, "ab")
+        self._last_fsync = time.monotonic()
+        self._dirty = False   # written since the last fsync
+        self._writer = threading.Thread(target=self._run, name=f"audit-{source}", daemon=True)
+        self._writer.start()
+
+    def log(self, message, **fields):
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        record = {"seq": seq, "mono": round(time.monotonic(), 6), "wall": round(time.time(), 3),
+                  "src": self.source, "msg": message}
+        record.update(fields)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def close(self, timeout=5):
+        """Write everything still queued, fsync and stop the writer; gives up after ``timeout`` seconds."""
+        deadline = time.monotonic() + timeout
+        if self._writer.is_alive():
+            try:
+                self._queue.put(_CLOSE, timeout=timeout)
+            except queue.Full:
+                pass   # the disk has stalled; exit without the records still queued rather than hang
+            self._writer.join(max(0.0, deadline - time.monotonic()))
+        if not self._writer.is_alive() and not self._file.closed:
+            self._file.close()   # the writer died (e.g. disk full) before it could
+
+    # ---------- writer thread ----------
+    def _run(self):
+        while True:
+            try:
+                # With unsynced records, wake up when the fsync is due even if nothing else is logged
+                timeout = max(0.0, self._last_fsync + self.fsync_interval - time.monotonic()) if self._dirty else None
+                batch = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                self._fsync()
+                continue
+            # Gather whatever else arrives shortly after, up to BATCH_SIZE
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(batch) < BATCH_SIZE and batch[-1] is not _CLOSE:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            closing = batch[-1] is _CLOSE
+            records = batch[:-1] if closing else batch
+            if records:
+                self._write(b"".join((json.dumps(r, ensure_ascii=False) + "\n").encode("utf-8") for r in records))
+            if closing:
+                self._file.flush()
+                self._fsync()
+                self._file.close()
+                return
+
+    def _write(self, data):
+        self._file.write(data)
+        self._file.flush()
+        self._dirty = True
+        if time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self._fsync()
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _fsync(self):
+        os.fsync(self._file.fileno())
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+
+    def _rotate(self):
+        self._fsync()
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "ab")
+
+
+# ---------- Benchmark ----------
+def _old_log_action(path, message):
+    # What exam_mode/lab_mode did per message, minus the print
+    with open(path, "a") as f:
+        f.write(f"[{time.ctime()}] {message}\n")
+
+
+def bench(messages=20000):
+    folder = tempfile.mkdtemp()
+    try:
+        path = os.path.join(folder, "old.log")
+        start = time.perf_counter()
+        for i in range(messages):
+            _old_log_action(path, f"Monitoring processes... {i}")
+        old_s = time.perf_counter() - start
+
+        # Queue sized to hold the whole burst so msg/s measures the writer, not drops
+        log = AuditLog(os.path.join(folder, "audit.log"), "bench", max_bytes=1 << 20, queue_size=messages + 1)
+        start = time.perf_counter()
+        for i in range(messages):
+            log.log(f"Monitoring processes... {i}")
+        caller_s = time.perf_counter() - start
+        log.close()
+        total_s = time.perf_counter() - start
+        rotated = sorted(n for n in os.listdir(folder) if n.startswith("audit.log"))
+
+        print(f"{messages} messages")
+        print(f"open/write/close per message: {old_s * 1e6 / messages:7.1f} us on the caller, "
+              f"{messages / old_s:9.0f} msg/s")
+        print(f"AuditLog:                     {caller_s * 1e6 / messages:7.1f} us on the caller, "
+              f"{messages / total_s:9.0f} msg/s written, {log.dropped} dropped")
+        print(f"files after rotation at 1 MB: {', '.join(rotated)}")
+    finally:
+        shutil.rmtree(folder)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the audit log")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("bench")
+    b.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args(argv)
+    bench(args.messages)
+
+
+if __name__ == "__main__":
+    main()
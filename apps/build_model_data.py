@@ -0,0 +1,250 @@
+"""Regenerate model_data/ for the FAISS chatbot from the CSV/AIML sources.
+
+    python build_model_data.py                        # incremental rebuild
+    python build_model_data.py --variants sq8 hnsw    # also write compact index variants
+    python build_model_data.py --workers 4            # multi-process encoding for big syllabi
+    python build_model_data.py --encoder tfidf        # rebuild the index for another encoder (see encoders.py)
+
+Embeddings are cached by a hash of (encoder, question text), so only new or
+edited questions are encoded; each encoder's entries are kept when building
+with another, so switching back does not re-embed everything. The encoder is recorded in the manifest and
+ChatEngine embeds queries with the same one. Alongside the pickles, questions/answers are
+written as mmap'able .strs stores (see answer_store.py). All outputs are staged as temp files and moved
+into place together at the end, so a crash never leaves a half-written index
+next to a mismatched answer list.
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import time
+
+import answer_store
+import encoders
+import index_tools
+import qa_sources
+from chat_engine import MODEL_DIR
+from encoders import DEFAULT_ENCODER, MANIFEST
+
+EMBED_CACHE = "embedding_cache.npz"
+BATCH_SIZE = 64
+MULTI_PROCESS_MIN = 2000  # below this the process pool costs more to start than it saves
+
+
+def question_key(question, encoder_name=DEFAULT_ENCODER):
+    return hashlib.sha1(f"{encoder_name}\0{question}".encode("utf-8")).hexdigest()
+
+
+def prepare_pairs(pairs):
+    # AIML wildcard patterns ("WHAT IS * PLUS *") are not retrievable questions
+    seen = set()
+    out = []
+    for pair in pairs:
+        q, a = pair["question"].strip(), pair["answer"].strip()
+        if not q or not a or "*" in q.split() or "_" in q.split() or (q, a) in seen:
+            continue
+        seen.add((q, a))
+        out.append({"question": q, "answer": a})
+    return out
+
+
+class EmbeddingCache:
+    """question_key -> embedding, stored as one .npz with keys + a float32 matrix per encoder."""
+
+    def __init__(self, path):
+        self.path = path
+        self.vectors = {}
+        self.encoders = {}   # question_key -> encoder name; "" for caches written before names were kept
+
+    def load(self):
+        import numpy as np
+        if not os.path.exists(self.path):
+            return False
+        with np.load(self.path) as data:
+            if "encoders" not in data.files:   # one unnamed matrix
+                groups = [("", data["keys"], data["vectors"])]
+            else:
+                groups = [(name, data[f"keys_{i}"], data[f"vectors_{i}"])
+                          for i, name in enumerate(data["encoders"].tolist())]
+            for name, keys, vectors in groups:
+                keys = keys.tolist()
+                self.vectors.update(zip(keys, vectors))
+                self.encoders.update(dict.fromkeys(keys, name))
+        return True
+
+    def seed_from_index(self, model_dir, encoder_name=DEFAULT_ENCODER):
+        # First run: reuse the vectors already in the shipped flat index, if it was built with this encoder
+        if encoders.index_encoder_name(model_dir) != encoder_name:
+            return 0
+        questions_path = os.path.join(model_dir, "questions.pkl")
+        if not os.path.exists(questions_path):
+            return 0
+        with open(questions_path, "rb") as f:
+            questions = pickle.load(f)
+        vectors = index_tools.read_vectors(model_dir)
+        if len(vectors) != len(questions):
+            return 0
+        for question, vec in zip(questions, vectors):
+            key = question_key(question, encoder_name)
+            self.vectors[key] = vec
+            self.encoders[key] = encoder_name
+        return len(questions)
+
+    def add(self, keys, vectors, encoder_name):
+        for key, vec in zip(keys, vectors):
+            self.vectors[key] = vec
+            self.encoders[key] = encoder_name
+
+    def staged_save(self, keep_keys, encoder_name):
+        """Stage ``keep_keys`` for ``encoder_name`` plus every other encoder's entries; None if empty."""
+        import numpy as np
+        keep = [k for k in dict.fromkeys(keep_keys) if k in self.vectors]
+        kept = set(keep)
+        others = [k for k, name in self.encoders.items() if name not in ("", encoder_name) and k not in kept]
+        keys = keep + others
+        if not keys:
+            return None
+        for key in keep:
+            self.encoders[key] = encoder_name
+        # Encoders differ in dimension, so each gets its own matrix
+        groups = {}
+        for key in keys:
+            groups.setdefault(self.encoders[key], []).append(key)
+        arrays = {"encoders": np.array(list(groups))}
+        for i, group in enumerate(groups.values()):
+            arrays[f"keys_{i}"] = np.array(group)
+            arrays[f"vectors_{i}"] = np.stack([self.vectors[k] for k in group]).astype("float32")
+        tmp = self.path + ".tmp.npz"
+        np.savez(tmp, **arrays)
+        return tmp
+
+
+def encode(texts, workers=1, batch_size=BATCH_SIZE, encoder=None):
+    encoder = encoder or encoders.create_encoder(DEFAULT_ENCODER)
+    if len(texts) < MULTI_PROCESS_MIN:
+        workers = 1
+    return encoder.encode(texts, batch_size=batch_size, workers=workers, show_progress=len(texts) > 1000)
+
+
+def _stage_pickle(obj, path):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return tmp
+
+
+def _stage_store(strings, path):
+    tmp = path + ".tmp"
+    answer_store.write_store(strings, tmp)
+    return tmp
+
+
+def _corpus_hash(keys, pairs):
+    h = hashlib.sha1()
+    for key, pair in zip(keys, pairs):
+        h.update(key.encode())
+        h.update(pair["answer"].encode("utf-8"))
+    return h.hexdigest()
+
+
+def build(sources=qa_sources.DEFAULT_SOURCES, model_dir=MODEL_DIR, workers=1, variants=(), force=False,
+          encoder_name=DEFAULT_ENCODER):
+    import faiss
+    import numpy as np
+
+    start = time.perf_counter()
+    pairs = prepare_pairs(qa_sources.load_sources(sources))
+    if not pairs:
+        raise SystemExit("No question/answer pairs found in the sources.")
+    keys = [question_key(p["question"], encoder_name) for p in pairs]
+    corpus_hash = _corpus_hash(keys, pairs)
+
+    manifest_path = os.path.join(model_dir, MANIFEST)
+    outputs = ["questions.pkl", "answers.pkl", "qa_data.pkl", "questions.strs", "answers.strs", index_tools.FLAT_INDEX]
+    outputs += [index_tools.INDEX_FILES[kind] for kind in variants]
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if (manifest.get("corpus") == corpus_hash and manifest.get("encoder") == encoder_name
+                and all(os.path.exists(os.path.join(model_dir, name)) for name in outputs)):
+            print(f"model_data is up to date ({len(pairs)} questions)")
+            return
+
+    questions = [p["question"] for p in pairs]
+    answers = [p["answer"] for p in pairs]
+    encoder = None
+    cache = EmbeddingCache(os.path.join(model_dir, EMBED_CACHE))
+    loaded = cache.load()   # also keeps other encoders' entries when this build saves the cache
+    if encoder_name == "tfidf":
+        # IDF weights depend on the whole corpus, so its vectors are never cached; encoding is cheap anyway
+        t0 = time.perf_counter()
+        encoder = encoders.create_encoder(encoder_name).fit(questions)
+        vectors = encode(questions, workers=workers, encoder=encoder)
+        print(f"encoded {len(questions)} questions in {time.perf_counter() - t0:.1f} s")
+        cache_keys = []
+    else:
+        if not loaded:
+            print(f"seeded {cache.seed_from_index(model_dir, encoder_name)} embeddings from the existing index")
+        unique = list(dict.fromkeys(keys))
+        missing = [k for k in unique if k not in cache.vectors]
+        if missing:
+            by_key = {k: p["question"] for k, p in zip(keys, pairs)}
+            t0 = time.perf_counter()
+            encoder = encoders.create_encoder(encoder_name)
+            cache.add(missing, encode([by_key[k] for k in missing], workers=workers, encoder=encoder), encoder_name)
+            print(f"encoded {len(missing)} new/changed questions in {time.perf_counter() - t0:.1f} s")
+        print(f"reused {len(unique) - len(missing)} cached embeddings")
+        vectors = [cache.vectors[k] for k in keys]
+        cache_keys = keys
+
+    vectors = np.stack(vectors).astype("float32")
+    staged_cache = cache.staged_save(cache_keys, encoder_name)
+    staged = (encoder.stage(model_dir) if encoder else []) + [
+        (_stage_pickle(questions, os.path.join(model_dir, "questions.pkl")), "questions.pkl"),
+        (_stage_pickle(answers, os.path.join(model_dir, "answers.pkl")), "answers.pkl"),
+        (_stage_pickle(pairs, os.path.join(model_dir, "qa_data.pkl")), "qa_data.pkl"),
+        (_stage_store(questions, os.path.join(model_dir, "questions.strs")), "questions.strs"),
+        (_stage_store(answers, os.path.join(model_dir, "answers.strs")), "answers.strs"),
+    ]
+    if staged_cache is not None:
+        staged.append((staged_cache, EMBED_CACHE))
+    for kind in ("flat",) + tuple(variants):
+        path = index_tools.index_path(kind, model_dir)
+        faiss.write_index(index_tools.build_index(vectors, kind), path + ".tmp")
+        staged.append((path + ".tmp", os.path.basename(path)))
+
+    manifest = {"corpus": corpus_hash, "encoder": encoder_name, "dim": int(vectors.shape[1]),
+                "count": len(pairs), "built": time.ctime()}
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    staged.append((manifest_path + ".tmp", MANIFEST))
+
+    for tmp, name in staged:
+        os.replace(tmp, os.path.join(model_dir, name))
+    # Variants from an earlier --variants build index the old corpus, and the loader prefers them over flat
+    for kind, name in index_tools.INDEX_FILES.items():
+        if kind != "flat" and kind not in variants and os.path.exists(os.path.join(model_dir, name)):
+            os.remove(os.path.join(model_dir, name))
+            print(f"removed stale {name}")
+    print(f"wrote {len(pairs)} questions to {model_dir}/ in {time.perf_counter() - start:.1f} s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the chatbot index and answer store")
+    parser.add_argument("sources", nargs="*", default=qa_sources.DEFAULT_SOURCES,
+                        help="CSV (question,answer) and AIML files")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="encoder processes when many questions are new")
+    parser.add_argument("--variants", nargs="*", default=[],
+                        choices=[k for k in index_tools.INDEX_PREFERENCE if k != "flat"])
+    parser.add_argument("--encoder", default=DEFAULT_ENCODER, choices=encoders.ENCODER_NAMES,
+                        help="sentence encoder the index is built for")
+    parser.add_argument("--force", action="store_true", help="rebuild even if nothing changed")
+    args = parser.parse_args(argv)
+    build(args.sources, args.model_dir, args.workers, args.variants, args.force, args.encoder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from answer_cache import AnswerCache, index_fingerprint
+import answer_store
+import encoders
+import index_tools
+
+MODEL_DIR = "model_data"
+STARTUP_LOG = "chatbot_startup.log"
+BATCH_SIZE = 64
+MIN_CONFIDENCE = 0.45   # cosine similarity below which the bot admits it doesn't know
+FALLBACK_ANSWER = "I don't know that yet. Try asking in a different way!"
+
+# One search hit; score is cosine similarity (1.0 = same meaning)
+Match = namedtuple("Match", "answer question score row")
+
+
+class StartupTimeline:
+    """Milliseconds since process start for each cold-start stage.
+
+    Every mark is printed as it happens and the whole timeline is appended as
+    one line to STARTUP_LOG on ``save()``, so regressions show up by comparing
+    launches.
+    """
+
+    def __init__(self, t0=None, echo=True):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.echo = echo
+        self.marks = []
+        self._lock = threading.Lock()
+
+    def mark(self, stage):
+        elapsed_ms = (time.perf_counter() - self.t0) * 1000
+        with self._lock:
+            self.marks.append((stage, elapsed_ms))
+        if self.echo:
+            print(f"[startup] {stage}: {elapsed_ms:.0f} ms")
+        return elapsed_ms
+
+    def save(self, path=STARTUP_LOG):
+        with self._lock:
+            stages = ", ".join(f"{stage}={ms:.0f}ms" for stage, ms in self.marks)
+        with open(path, "a") as f:
+            f.write(f"[{time.ctime()}] {stages}\n")
+
+
+class ChatEngine:
+    """FAISS + sentence-encoder answer lookup, loaded on demand.
+
+    Nothing heavy happens at construction time: faiss, the encoder the index
+    was built with (sentence_transformers and torch, unless it is tfidf) and
+    the index/answers are loaded in ``load()``, which is meant to run on a
+    background thread after the window is up.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, timeline=None):
+        self.model_dir = model_dir
+        self.timeline = timeline or StartupTimeline()
+        self.model = None
+        self.encoder_name = None
+        self.index = None
+        self.index_kind = None
+        self.questions = None
+        self.answers = None
+        self.cache = None
+        self._load_lock = threading.Lock()
+        self._answered = False
+
+    @property
+    def ready(self):
+        return self.index is not None
+
+    def load(self):
+        with self._load_lock:
+            if self.ready:
+                return
+            import faiss  # noqa: F401  (timed here rather than inside the index load)
+            self.timeline.mark("imports")
+
+            # Queries must be embedded by the same encoder the index was built with
+            encoder_name = encoders.index_encoder_name(self.model_dir)
+            model = encoders.load_encoder(encoder_name, self.model_dir)
+            self.timeline.mark(f"model load ({encoder_name})")
+
+            # mmap'd .strs stores when converted, otherwise the pickled lists
+            self.questions = answer_store.load_strings(os.path.join(self.model_dir, "questions.pkl"))
+            self.answers = answer_store.load_strings(os.path.join(self.model_dir, "answers.pkl"))
+            kind, index_path, index = index_tools.load_index(self.model_dir, expected=len(self.answers))
+            self.model = model
+            self.encoder_name = encoder_name
+            self.index = index
+            self.index_kind = kind
+            self.timeline.mark(f"index load ({kind})")
+
+            self.cache = AnswerCache(fingerprint=index_fingerprint(index_path))
+            self.cache.load()
+
+    def _scores(self, distances):
+        import faiss
+        if self.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            return distances
+        # Squared L2 between unit vectors is 2 - 2*cos
+        return 1.0 - distances / 2.0
+
+    def _encode(self, queries):
+        return self.model.encode(list(queries), batch_size=BATCH_SIZE).astype("float32")
+
+    def search(self, query_vecs, k=1):
+        distances, rows = self.index.search(query_vecs, k)
+        scores = self._scores(distances)
+        return [
+            [Match(self.answers[row], self.questions[row], float(score), int(row))
+             for score, row in zip(score_row, hit_row) if row >= 0]
+            for score_row, hit_row in zip(scores, rows)
+        ]
+
+    def get_answers(self, queries, k=1, threshold=MIN_CONFIDENCE):
+        """Top-k matches for many queries with one encode pass and one search.
+
+        Each result is a list of Match, best first. When even the best match
+        scores under ``threshold`` the list is just a single fallback Match
+        (row -1) instead of a confidently wrong answer.
+        """
+        self.load()
+        if not queries:
+            return []
+        results = self.search(self._encode(queries), k)
+        fallback = [Match(FALLBACK_ANSWER, None, 0.0, -1)]
+        return [hits if hits and hits[0].score >= threshold else fallback for hits in results]
+
+    def get_answer(self, query, threshold=MIN_CONFIDENCE):
+        self.load()
+        answer = self.cache.get_text(query)
+        if answer is None:
+            query_vec = self._encode([query])
+            answer = self.cache.get_semantic(query_vec[0])
+            if answer is None:
+                hits = self.search(query_vec, 1)[0]
+                answer = hits[0].answer if hits and hits[0].score >= threshold else FALLBACK_ANSWER
+                self.cache.put_semantic(query_vec[0], answer)
+            self.cache.put_text(query, answer)
+        if not self._answered:
+            self._answered = True
+            self.timeline.mark("first answer")
+            self.timeline.save()
+        return answer
+
+    def save_cache(self):
+        if self.cache is not None:
+            self.cache.save()
+
+
+# ---------- Bulk checking from the command line ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a file of questions (one per line) in one batch")
+    parser.add_argument("questions", nargs="?", help="text file, defaults to stdin")
+    parser.add_argument("-k", type=int, default=1, help="matches to show per question")
+    parser.add_argument("--threshold", type=float, default=MIN_CONFIDENCE)
+    args = parser.parse_args(argv)
+
+    src = open(args.questions) if args.questions else sys.stdin
+    with src:
+        queries = [line.strip() for line in src if line.strip()]
+    engine = ChatEngine()
+    start = time.perf_counter()
+    results = engine.get_answers(queries, k=args.k, threshold=args.threshold)
+    elapsed = time.perf_counter() - start
+    print("query\trank\tscore\tmatched_question\tanswer")
+    for query, hits in zip(queries, results):
+        for rank, hit in enumerate(hits, 1):
+            print(f"{query}\t{rank}\t{hit.score:.3f}\t{hit.question or ''}\t{hit.answer}")
+    print(f"# {len(queries)} queries in {elapsed:.2f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,26 @@
-import aiml
-import csv
+import sys
+from answer_pipeline import AnswerPipeline, format_timings
+from chat_engine import ChatEngine, StartupTimeline
 
-# Load CSV files
-coding_facts = {}
-with open("coding_facts.csv", "r") as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        coding_facts[row["question"].lower()] = row["answer"]
+# Show which stage answered and how long each took ("python chatbot.py -v")
+VERBOSE = "-v" in sys.argv[1:]
 
-general_facts = {}
-with open("general_facts.csv", "r") as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        general_facts[row["question"].lower()] = row["answer"]
+# Cheapest first: fact lookup, AIML math patterns, near-miss facts, then embedding search.
+# The embedding model is only loaded in the background and only used when nothing else matched.
+pipeline = AnswerPipeline(engine=ChatEngine(timeline=StartupTimeline(echo=False)))
+pipeline.warm_up()
 
-# Initialize AIML kernel
-kernel = aiml.Kernel()
-kernel.learn("math.aiml")  # 150 math patterns from earlier
-
-# Lookup functions
-def get_coding_answer(input_text):
-    return coding_facts.get(input_text.lower(), "I don’t know that coding topic yet.")
-
-def get_general_answer(input_text):
-    return general_facts.get(input_text.lower(), "I don’t have that general info yet.")
-
-# Chat loop with basic routing
+# Chat loop
 print("Hello! Ask me about math, coding, or general knowledge. Type 'quit' to exit.")
 while True:
     user_input = input("> ").lower()
     if user_input == "quit":
         break
-    
-    # Route based on keywords
-    coding_keywords = ["python", "c++", "javascript", "git", "coding", "algorithm", "data structure", "machine learning", "sql", "api"]
-    general_keywords = ["what is", "why", "how does", "who", "where", "when", "science", "history", "geography", "capital"]
-    
-    if any(keyword in user_input for keyword in coding_keywords):
-        response = get_coding_answer(user_input)
-    elif any(keyword in user_input for keyword in general_keywords):
-        response = get_general_answer(user_input)
-    else:
-        response = kernel.respond(user_input)  # Math patterns
-    
-    # Fallback
-    if not response or response == "":
-        response = "I don’t understand that yet. Try asking about math, coding, or general facts!"
-    print(response)
\ No newline at end of file
+
+    result = pipeline.answer(user_input)
+    print(result.text)
+    if VERBOSE:
+        print(f"  [{result.stage or 'no answer'}: {format_timings(result.timings)}]")
+
+if pipeline.engine_error is None:
+    pipeline.engine.save_cache()
@@ -0,0 +1,278 @@
+"""Sentence encoders the FAISS chatbot can be built with.
+
+The encoder is a build-time choice: build_model_data.py --encoder NAME
+embeds the questions with it and records NAME in build_manifest.json, and
+ChatEngine loads whatever encoder the manifest names so queries and index
+always match. Every encoder returns L2-normalized float32 rows.
+
+    all-MiniLM-L6-v2        the original 6-layer model (default)
+    paraphrase-MiniLM-L3-v2 3-layer MiniLM, about half the compute
+    all-MiniLM-L6-v2-int8   the default model with int8 dynamic-quantized Linear layers
+    tfidf                   hashed word + character n-gram TF-IDF, numpy only, no torch
+
+    python encoders.py eval [NAME ...] [--samples N]   # agreement / latency / RSS vs the default
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+import zlib
+
+DEFAULT_ENCODER = "all-MiniLM-L6-v2"
+ENCODER_NAMES = ["all-MiniLM-L6-v2", "paraphrase-MiniLM-L3-v2", "all-MiniLM-L6-v2-int8", "tfidf"]
+MANIFEST = "build_manifest.json"
+TFIDF_FILE = "tfidf_idf.npy"
+TFIDF_DIM = 1024
+BATCH_SIZE = 64
+
+_WORD = re.compile(r"\w+")
+
+
+def _normalize_rows(vecs):
+    import numpy as np
+    vecs = np.asarray(vecs, dtype="float32")
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vecs / norms
+
+
+class SentenceTransformerEncoder:
+    def __init__(self, name, model_id, quantize=False):
+        from sentence_transformers import SentenceTransformer
+        self.name = name
+        self.model = SentenceTransformer(model_id, device="cpu")
+        self.quantized = quantize
+        if quantize:
+            import torch
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def fit(self, texts):
+        return self
+
+    def stage(self, model_dir):
+        # Weights come from the sentence-transformers cache; nothing to write
+        return []
+
+    def encode(self, texts, batch_size=BATCH_SIZE, workers=1, show_progress=False):
+        texts = list(texts)
+        # Pool workers pickle the model, which the quantized one doesn't survive
+        if workers > 1 and not self.quantized:
+            pool = self.model.start_multi_process_pool(["cpu"] * workers)
+            try:
+                vecs = self.model.encode_multi_process(texts, pool, batch_size=batch_size)
+            finally:
+                self.model.stop_multi_process_pool(pool)
+        else:
+            vecs = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                                     show_progress_bar=show_progress)
+        return _normalize_rows(vecs)
+
+
+class TfidfEncoder:
+    """Hashed TF-IDF over words and character trigrams.
+
+    No model download, no torch, a few KB of state (the IDF vector) and
+    microseconds per query; it matches on spelling rather than meaning, so
+    it is the fallback for machines that can't hold a transformer.
+    """
+
+    name = "tfidf"
+
+    def __init__(self, dim=TFIDF_DIM, idf=None):
+        self.dim = dim
+        self.idf = idf
+
+    @staticmethod
+    def _features(text):
+        text = text.lower()
+        words = _WORD.findall(text)
+        feats = list(words)
+        for word in words:
+            padded = f"#{word}#"
+            feats.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return feats
+
+    def _counts(self, texts):
+        import numpy as np
+        counts = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for feat in self._features(text):
+                counts[row, zlib.crc32(feat.encode("utf-8")) % self.dim] += 1
+        return counts
+
+    def fit(self, texts):
+        import numpy as np
+        df = (self._counts(list(texts)) > 0).sum(axis=0)
+        self.idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype("float32")
+        return self
+
+    def stage(self, model_dir):
+        """Write the IDF vector to a temp file; returns [(tmp, final name)] for the build to move."""
+        import numpy as np
+        tmp = os.path.join(model_dir, TFIDF_FILE + ".tmp.npy")
+        np.save(tmp, self.idf)
+        return [(tmp, TFIDF_FILE)]
+
+    @classmethod
+    def load(cls, model_dir):
+        import numpy as np
+        idf = np.load(os.path.join(model_dir, TFIDF_FILE))
+        return cls(dim=len(idf), idf=idf)
+
+    def encode(self, texts, batch_size=BATCH_SIZE, workers=1, show_progress=False):
+        import numpy as np
+        counts = self._counts(list(texts))
+        return _normalize_rows(np.log1p(counts) * self.idf)
+
+
+def create_encoder(name):
+    """A fresh encoder; tfidf still needs fit() on the corpus."""
+    if name == "all-MiniLM-L6-v2":
+        return SentenceTransformerEncoder(name, "all-MiniLM-L6-v2")
+    if name == "paraphrase-MiniLM-L3-v2":
+        return SentenceTransformerEncoder(name, "paraphrase-MiniLM-L3-v2")
+    if name == "all-MiniLM-L6-v2-int8":
+        return SentenceTransformerEncoder(name, "all-MiniLM-L6-v2", quantize=True)
+    if name == "tfidf":
+        return TfidfEncoder()
+    raise ValueError(f"Unknown encoder {name!r}; choose from {', '.join(ENCODER_NAMES)}")
+
+
+def load_encoder(name, model_dir):
+    """The encoder an index in ``model_dir`` was built with, ready to encode queries."""
+    if name == "tfidf":
+        return TfidfEncoder.load(model_dir)
+    return create_encoder(name)
+
+
+def index_encoder_name(model_dir):
+    # Indexes built before the manifest existed were all MiniLM-L6
+    try:
+        with open(os.path.join(model_dir, MANIFEST)) as f:
+            return json.load(f).get("encoder", DEFAULT_ENCODER)
+    except (OSError, ValueError):
+        return DEFAULT_ENCODER
+
+
+# ---------- Evaluation ----------
+_TEMPLATES = [
+    (re.compile(r"^what is (.+?)\??$", re.I), ["tell me about {}", "what's {}", "can you explain {}", "{}?"]),
+    (re.compile(r"^what are (.+?)\??$", re.I), ["tell me about {}", "what're {}", "explain {}"]),
+    (re.compile(r"^what does (.+?) do\??$", re.I), ["what is the job of {}", "what is {} for"]),
+    (re.compile(r"^who (?:is|was) (.+?)\??$", re.I), ["tell me about {}", "who's {}"]),
+]
+
+
+def paraphrase(question, rng):
+    """A reworded, lower-cased and sometimes misspelled version of ``question``."""
+    text = question.strip()
+    for pattern, templates in _TEMPLATES:
+        m = pattern.match(text)
+        if m:
+            text = rng.choice(templates).format(m.group(1))
+            break
+    else:
+        text = rng.choice(["{}", "please tell me {}", "i want to know {}"]).format(text.rstrip("?"))
+    words = text.lower().split()
+    # One adjacent-letter swap in a longer word, like a quick typist
+    long_words = [i for i, w in enumerate(words) if len(w) > 4 and w.isalpha()]
+    if long_words and rng.random() < 0.5:
+        i = rng.choice(long_words)
+        j = rng.randrange(1, len(words[i]) - 2)
+        w = words[i]
+        words[i] = w[:j] + w[j + 1] + w[j] + w[j + 2:]
+    return " ".join(words)
+
+
+def _sample(questions, samples, seed=0):
+    rng = random.Random(seed)
+    rows = rng.sample(range(len(questions)), min(samples, len(questions)))
+    return rows, [paraphrase(questions[row], rng) for row in rows]
+
+
+def _rss_kb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def _run_encoder(name, model_dir, samples):
+    # Runs in its own interpreter so RSS belongs to this encoder alone
+    import faiss
+    import answer_store
+
+    questions = list(answer_store.load_strings(os.path.join(model_dir, "questions.pkl")))
+    rows, queries = _sample(questions, samples)
+    before = _rss_kb()
+    start = time.perf_counter()
+    encoder = create_encoder(name).fit(questions)
+    load_s = time.perf_counter() - start
+    index = faiss.IndexFlatIP(encoder.dim)
+    index.add(encoder.encode(questions))
+    latencies, top1 = [], []
+    for query in queries:
+        start = time.perf_counter()
+        vec = encoder.encode([query])
+        latencies.append((time.perf_counter() - start) * 1000)
+        top1.append(int(index.search(vec, 1)[1][0][0]))
+    latencies.sort()
+    print(json.dumps({
+        "load_s": load_s,
+        "mean_ms": sum(latencies) / len(latencies),
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+        "rss_mb": (_rss_kb() - before) / 1024,
+        "top1": top1,
+        # Duplicate question texts: the first copy is what an index search returns on a tie
+        "source": [questions.index(questions[row]) for row in rows],
+    }))
+
+
+def evaluate(names, model_dir, samples):
+    results = {}
+    for name in [DEFAULT_ENCODER] + [n for n in names if n != DEFAULT_ENCODER]:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "_run", name,
+                               "--model-dir", model_dir, "--samples", str(samples)],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{name}: skipped ({(proc.stderr.strip().splitlines() or ['failed'])[-1]})")
+            continue
+        results[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+    if not results:
+        return
+    reference = results.get(DEFAULT_ENCODER, {}).get("top1")
+    print(f"{samples} paraphrased questions from questions.pkl; "
+          f"agreement = same top-1 as {DEFAULT_ENCODER}, hit = top-1 is the question it came from")
+    print(f"{'encoder':<25}{'load s':>8}{'mean ms':>9}{'p95 ms':>8}{'RSS MB':>8}{'agreement':>11}{'hit':>7}")
+    for name, r in results.items():
+        n = len(r["top1"])
+        agree = f"{sum(a == b for a, b in zip(r['top1'], reference)) / n:.1%}" if reference else "n/a"
+        hit = sum(a == b for a, b in zip(r["top1"], r["source"])) / n
+        print(f"{name:<25}{r['load_s']:>8.2f}{r['mean_ms']:>9.2f}{r['p95_ms']:>8.2f}{r['rss_mb']:>8.0f}"
+              f"{agree:>11}{hit:>7.1%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare sentence encoders for the chatbot index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ev = sub.add_parser("eval", help=f"top-1 agreement with {DEFAULT_ENCODER}, latency and RSS")
+    ev.add_argument("names", nargs="*", default=ENCODER_NAMES[1:], help=", ".join(ENCODER_NAMES))
+    ev.add_argument("--model-dir", default="model_data")
+    ev.add_argument("--samples", type=int, default=300)
+    run = sub.add_parser("_run")
+    run.add_argument("name")
+    run.add_argument("--model-dir", default="model_data")
+    run.add_argument("--samples", type=int, default=300)
+    args = parser.parse_args(argv)
+
+    if args.command == "eval":
+        evaluate(args.names, args.model_dir, args.samples)
+    else:
+        _run_encoder(args.name, args.model_dir, args.samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,42 @@
 import customtkinter as ctk
-import time
-import threading
-import os
 import hashlib
+import os
 from tkinter import messagebox
+from audit_log import AuditLog
+from exam_scheduler import WARN_AT, ExamScheduler
+from lab_protocol import extend_seconds, remote_controlled, watch_stdin
+from process_monitor import ProcessMonitor
 
 # Simulated state variables
 exam_mode_active = False
-end_time = 0
-monitoring_running = False
-LOG_FILE = "exam_mode_simulation.log"  # Temporary log file for simulation
+monitor = None
+LOG_FILE = "exam_mode_simulation.log"  # JSONL audit log, rotated at 1 MB and kept across runs
+audit = AuditLog(LOG_FILE, "exam_mode")  # writes on a background thread
+DEADLINE_FILE = "exam_mode_deadline.json"  # time left, so a restart continues the countdown
 
 # Simulated configuration
 CONFIG = {
     "password": hashlib.sha256("exam123".encode()).hexdigest(),  # Default password: "exam123"
-    "exam_duration": 120  # 2 minutes in seconds for testing
+    "exam_duration": 120,  # 2 minutes in seconds for testing
+    "allowed_apps": ["python3", "onboard"]  # programs that may be started during the exam (Linux names)
 }
 
-# Log simulation actions (safe, just writes to a file and console)
-def log_action(message):
-    with open(LOG_FILE, "a") as f:
-        f.write(f"[{time.ctime()}] {message}\n")
+# Log simulation actions (queued for the audit log, echoed to the console)
+def log_action(message, **fields):
+    audit.log(message, **fields)
     print(f"SIMULATION: {message}")
 
 # Simulated exam mode activation (no real changes, just logs)
-def activate_exam_mode():
-    global end_time
+def activate_exam_mode(resume=False):
     log_action("Activating Exam Mode...")
     log_action("Simulating: Setting fullscreen and locking window focus")
     log_action("Simulating: Blocking keyboard shortcuts (Alt+Tab, Ctrl+Alt+Del)")
     log_action("Simulating: Restricting processes to exam app only")
     start_process_monitor()
-    if CONFIG["exam_duration"] > 0:
-        end_time = time.time() + CONFIG["exam_duration"]
-        threading.Timer(CONFIG["exam_duration"], lambda: root.after(0, auto_exit)).start()
-        update_timer()
+    if resume:
+        scheduler.restore("exam", auto_exit, on_tick=update_timer, on_warning=warn_time_low)
+    elif CONFIG["exam_duration"] > 0:
+        scheduler.add("exam", CONFIG["exam_duration"], auto_exit, on_tick=update_timer, on_warning=warn_time_low)
 
 # Simulated exam mode deactivation (no real changes, just logs)
 def deactivate_exam_mode():
@@ -43,22 +45,27 @@ def deactivate_exam_mode():
     log_action("Simulating: Re-enabling keyboard shortcuts")
     log_action("Simulating: Restoring process access")
     stop_process_monitor()
+    scheduler.cancel("exam")
 
-# Simulated process monitoring (logs every 5 seconds, no actual process killing)
-def process_monitor():
-    while monitoring_running:
-        log_action("Monitoring processes... (Allowed: exam_app)")
-        log_action("Simulating: Terminating unauthorized process 'firefox'")
-        time.sleep(5)
+# Process monitoring: reacts to each newly started program (no actual process killing)
+def on_unauthorized_process(info):
+    log_action(f"Simulating: Terminating unauthorized process '{info.name}' (pid {info.pid})",
+               pid=info.pid, program=info.name, exe=info.exe)
 
 def start_process_monitor():
-    global monitoring_running
-    monitoring_running = True
-    threading.Thread(target=process_monitor, daemon=True).start()
+    global monitor
+    stop_process_monitor()
+    # on_violation runs on the monitor thread; hand the event to the Tk loop
+    # Only the student's own programs; system services starting meanwhile are not violations
+    monitor = ProcessMonitor(CONFIG["allowed_apps"],
+                             lambda info: root.after(0, on_unauthorized_process, info), uid=os.getuid()).start()
+    log_action(f"Monitoring processes via {monitor.mode}... (Allowed: " + ", ".join(CONFIG["allowed_apps"]) + ")")
 
 def stop_process_monitor():
-    global monitoring_running
-    monitoring_running = False
+    global monitor
+    if monitor is not None:
+        monitor.stop()
+        monitor = None
 
 # Toggle Exam Mode
 def toggle_exam_mode():
@@ -109,16 +116,48 @@ def update_ui():
         timer_label.configure(text="")
         question_frame.pack_forget()
 
-# Update timer display
-def update_timer():
-    if exam_mode_active and end_time > 0:
-        remaining = end_time - time.time()
-        if remaining > 0:
-            mins, secs = divmod(int(remaining), 60)
-            timer_label.configure(text=f"Time remaining: {mins:02d}:{secs:02d}")
-            root.after(1000, update_timer)
-        else:
-            timer_label.configure(text="")
+# Update timer display (called by the scheduler each second)
+def update_timer(seconds):
+    mins, secs = divmod(seconds, 60)
+    timer_label.configure(text=f"Time remaining: {mins:02d}:{secs:02d}" if seconds > 0 else "",
+                          text_color="#FF5555" if seconds <= WARN_AT[0] else "#333333")
+
+def warn_time_low(seconds):
+    log_action(f"{seconds / 60:.0f} minutes left")
+
+# A session cut short by a crash or power cut continues with the time it had left
+def resume_after_restart():
+    global exam_mode_active
+    if "exam" in scheduler.saved():
+        log_action("Resuming Exam Mode after restart...")
+        activate_exam_mode(resume=True)
+        exam_mode_active = True
+        update_ui()
+
+# Started from the teacher console (lab_agent.py): activate at once, then obey "stop" and "extend <seconds>"
+def start_remotely():
+    global exam_mode_active
+    if not exam_mode_active:   # resume_after_restart() may have picked the session up already
+        log_action("Started from the teacher console")
+        activate_exam_mode()
+        exam_mode_active = True
+        update_ui()
+
+def on_remote_command(words):
+    global exam_mode_active
+    if words[0] == "stop":
+        if exam_mode_active:
+            log_action("Stopped from the teacher console")
+            deactivate_exam_mode()
+            exam_mode_active = False
+        root.destroy()
+    elif words[0] == "extend" and scheduler.remaining("exam") is not None:
+        seconds = extend_seconds(words)
+        if seconds is None:
+            log_action(f"Ignored bad command from the teacher console: {' '.join(words)}")
+            return
+        scheduler.extend("exam", seconds)
+        log_action(f"{seconds:g} s extra time from the teacher console")
 
 # Handle window close
 def on_closing():
@@ -139,6 +178,7 @@ root.title("Exam Mode (Simulation)")
 root.geometry("500x400")
 root.resizable(False, False)
 root.configure(fg_color="#F0F0F0")
+scheduler = ExamScheduler(root, DEADLINE_FILE)  # countdown on time.monotonic()
 
 # Header Label
 title_label = ctk.CTkLabel(
@@ -230,13 +270,14 @@ info_label.pack(pady=5)
 
 # Set initial state
 update_ui()
+resume_after_restart()
+if remote_controlled():
+    watch_stdin(root, on_remote_command)
+    start_remotely()
 
 # Bind close event
 root.protocol("WM_DELETE_WINDOW", on_closing)
 
-# Clear log file at start
-if os.path.exists(LOG_FILE):
-    os.remove(LOG_FILE)
-
 # Run GUI loop
-root.mainloop()
\ No newline at end of file
+root.mainloop()
+audit.close()
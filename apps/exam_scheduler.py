@@ -0,0 +1,309 @@
+"""Countdowns for exam and lab sessions, driven by the Tk event loop.
+
+One ``ExamScheduler`` per window replaces the threading.Timer + after(1000)
+pairs: a single after() chain checks every deadline against
+time.monotonic(), so changing the system clock does nothing, nothing keeps
+running after the window is destroyed, and callbacks always run on the Tk
+thread. Deadlines can be paused, resumed, extended or cancelled, several can
+run at once (a whole exam and its sections), and each can warn at set
+remaining times (5 minutes left, ...).
+
+With ``state_path`` the remaining time of every deadline is saved (on each
+change and every CHECKPOINT_SECONDS) so a restarted app can ``restore()`` it;
+time while the app was not running is not counted.
+
+    python exam_scheduler.py bench [--deadlines N]   # wakeups and expiry lateness vs. an after(1000) loop per timer
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import statistics
+import time
+
+MAX_SLEEP_MS = 1000   # re-check at least this often, in case Tk's own clock jumps
+CHECKPOINT_SECONDS = 5
+WARN_AT = (300,)    # seconds remaining; 5 minutes
+
+
+class Deadline:
+    def __init__(self, name, seconds, on_expire, on_tick=None, warnings=(), on_warning=None, repeat=False):
+        self.name = name
+        self.duration = seconds
+        self.on_expire = on_expire
+        self.on_tick = on_tick
+        self.on_warning = on_warning
+        # Only warnings still ahead of us; a 2-minute exam never warns at 5
+        self.warnings = sorted((w for w in warnings if w < seconds), reverse=True)
+        self.repeat = repeat
+        self.paused = False
+        self._end = time.monotonic() + seconds
+        self._left = seconds
+        self._shown = None
+
+    def remaining(self, now=None):
+        if self.paused:
+            return self._left
+        return max(0.0, self._end - (time.monotonic() if now is None else now))
+
+    def pause(self):
+        if not self.paused:
+            self._left = self.remaining()
+            self.paused = True
+
+    def resume(self):
+        if self.paused:
+            self._end = time.monotonic() + self._left
+            self.paused = False
+
+    def extend(self, seconds):
+        if self.paused:
+            self._left += seconds
+        else:
+            self._end += seconds
+        self.duration += seconds
+
+
+class ExamScheduler:
+    def __init__(self, widget, state_path=None, max_sleep_ms=MAX_SLEEP_MS):
+        self.widget = widget
+        self.state_path = state_path
+        self.max_sleep_ms = max_sleep_ms
+        self.deadlines = {}
+        self._job = None
+        self._ticking = False
+        self._last_save = 0.0
+
+    # ---------- Deadlines ----------
+    def add(self, name, seconds, on_expire, on_tick=None, warnings=WARN_AT, on_warning=None, repeat=False):
+        """Start (or restart) deadline ``name``.
+
+        on_expire() runs once it reaches zero (every ``seconds`` if ``repeat``),
+        on_tick(seconds_left) whenever the whole-second display changes and
+        on_warning(seconds_left) as each of ``warnings`` is passed.
+        """
+        self.deadlines[name] = Deadline(name, seconds, on_expire, on_tick, warnings if on_warning else (),
+                                        on_warning, repeat)
+        self._changed()
+        return self.deadlines[name]
+
+    def restore(self, name, on_expire, **kw):
+        """Re-add ``name`` with the remaining time saved by a previous run; None if nothing was saved."""
+        saved = self.saved().get(name)
+        if saved is None:
+            return None
+        deadline = self.add(name, saved["remaining"], on_expire, **kw)
+        if saved.get("paused"):
+            deadline.pause()
+        return deadline
+
+    def cancel(self, name):
+        if self.deadlines.pop(name, None) is not None:
+            self._changed()
+
+    def pause(self, name=None):
+        for deadline in self._select(name):
+            deadline.pause()
+        self._changed()
+
+    def resume(self, name=None):
+        for deadline in self._select(name):
+            deadline.resume()
+        self._changed()
+
+    def extend(self, name, seconds):
+        self.deadlines[name].extend(seconds)
+        self._changed()
+
+    def remaining(self, name):
+        deadline = self.deadlines.get(name)
+        return None if deadline is None else deadline.remaining()
+
+    def stop(self):
+        """Cancel every deadline and the tick; saved state is cleared."""
+        self.deadlines.clear()
+        self._changed()
+
+    def _select(self, name):
+        return list(self.deadlines.values()) if name is None else [self.deadlines[name]]
+
+    # ---------- Tick ----------
+    def _changed(self):
+        self._save(force=True)
+        if self._ticking:
+            return   # a callback changed things; _tick reschedules when it finishes
+        if self._job is not None:
+            self.widget.after_cancel(self._job)
+            self._job = None
+        if self.deadlines:
+            self._tick()
+
+    def _tick(self):
+        self._job = None
+        self._ticking = True
+        try:
+            self._run_due()
+        finally:
+            self._ticking = False
+        if self.deadlines:
+            self._job = self.widget.after(self._sleep_ms(time.monotonic()), self._tick)
+
+    def _run_due(self):
+        now = time.monotonic()
+        finished = False
+        for deadline in list(self.deadlines.values()):
+            if self.deadlines.get(deadline.name) is not deadline:
+                continue   # cancelled or replaced by an earlier callback this tick
+            left = deadline.remaining(now)
+            while deadline.warnings and left <= deadline.warnings[0]:
+                deadline.warnings.pop(0)
+                deadline.on_warning(left)
+            shown = math.ceil(left)
+            if deadline.on_tick is not None and shown != deadline._shown:
+                deadline._shown = shown
+                deadline.on_tick(shown)
+            if left <= 0 and not deadline.paused:
+                if deadline.repeat:
+                    deadline._end = now + deadline.duration
+                else:
+                    del self.deadlines[deadline.name]
+                    finished = True
+                deadline.on_expire()
+        self._save(force=finished)
+
+    def _sleep_ms(self, now):
+        # Sleep until the next expiry, warning or change of a displayed second
+        soonest = self.max_sleep_ms / 1000
+        for deadline in self.deadlines.values():
+            if deadline.paused:
+                continue
+            left = deadline.remaining(now)
+            soonest = min(soonest, left)
+            if deadline.warnings:
+                soonest = min(soonest, left - deadline.warnings[0])
+            if deadline.on_tick is not None:
+                soonest = min(soonest, left % 1 or 1)
+        return max(1, int(soonest * 1000) + 1)
+
+    # ---------- Persistence ----------
+    def saved(self):
+        if not self.state_path:
+            return {}
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, force=False):
+        if not self.state_path:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_save < CHECKPOINT_SECONDS:
+            return
+        self._last_save = now
+        state = {d.name: {"remaining": round(d.remaining(now), 1), "paused": d.paused}
+                 for d in self.deadlines.values() if not d.repeat}
+        if not state:
+            if os.path.exists(self.state_path):
+                os.remove(self.state_path)
+            return
+        with open(self.state_path + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+
+# ---------- Benchmark ----------
+class _Loop:
+    """Stand-in for Tk's after()/after_cancel() so the bench runs without a display."""
+
+    def __init__(self, load):
+        self.load = load   # seconds of other UI work after every callback (redraws, handlers)
+        self.jobs = {}
+        self.wakeups = 0
+        self._ids = itertools.count()
+
+    def after(self, ms, fn, *args):
+        job = next(self._ids)
+        self.jobs[job] = (time.monotonic() + ms / 1000, fn, args)
+        return job
+
+    def after_cancel(self, job):
+        self.jobs.pop(job, None)
+
+    def run(self):
+        while self.jobs:
+            job, (due, fn, args) = min(self.jobs.items(), key=lambda item: item[1][0])
+            time.sleep(max(0.0, due - time.monotonic()))
+            del self.jobs[job]
+            self.wakeups += 1
+            fn(*args)
+            time.sleep(self.load)
+
+
+def _old_timers(loop, durations, expired):
+    # What test.py's tick() did: every timer polls itself (and redraws) with after(1000)
+    def tick(name, end):
+        if time.monotonic() >= end:
+            expired[name] = time.monotonic() - end
+        else:
+            loop.after(1000, tick, name, end)
+    for name, seconds in durations.items():
+        tick(name, time.monotonic() + seconds)
+
+
+def _scheduled(loop, durations, expired, state_path):
+    scheduler = ExamScheduler(loop, state_path)
+    for name, seconds in durations.items():
+        end = time.monotonic() + seconds
+        # Only the whole-exam clock is on screen; sections just need to expire on time
+        scheduler.add(name, seconds, lambda name=name, end=end: expired.__setitem__(name, time.monotonic() - end),
+                      on_tick=(lambda left: None) if name == "section0" else None)
+    return scheduler
+
+
+def bench(deadlines=20, longest=6.0, load=0.002):
+    import tempfile
+    rng = random.Random(0)
+    durations = {f"section{i}": rng.uniform(1.0, longest) for i in range(deadlines)}
+    with tempfile.TemporaryDirectory() as folder:
+        results = {}
+        for label, start in [("after(1000) per timer", lambda loop, exp: _old_timers(loop, durations, exp)),
+                             ("ExamScheduler", lambda loop, exp: _scheduled(loop, durations, exp,
+                                                                           os.path.join(folder, "deadlines.json")))]:
+            loop = _Loop(load)
+            expired = {}
+            wall0 = time.monotonic()
+            start(loop, expired)
+            loop.run()
+            wall = time.monotonic() - wall0
+            late = [expired[name] * 1000 for name in durations]
+            results[label] = (loop.wakeups / wall, statistics.mean(late), max(late))
+        saves = os.path.join(folder, "saves.json")
+        scheduler = ExamScheduler(_Loop(0), saves)
+        for name, seconds in durations.items():
+            scheduler.deadlines[name] = Deadline(name, seconds, None)
+        start = time.perf_counter()
+        for _ in range(200):
+            scheduler._save(force=True)
+        save_ms = (time.perf_counter() - start) * 1000 / 200
+
+    print(f"{deadlines} concurrent deadlines of 1-{longest:.0f} s, {load * 1000:.0f} ms of UI work per callback")
+    for label, (rate, mean_late, max_late) in results.items():
+        print(f"{label + ':':<24}{rate:6.1f} wakeups/s, expiry late by mean {mean_late:6.1f} ms, max {max_late:6.1f} ms")
+    print(f"saving {deadlines} deadlines: {save_ms:.2f} ms per save, at most every {CHECKPOINT_SECONDS} s while running")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the exam countdown scheduler")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("bench")
+    b.add_argument("--deadlines", type=int, default=20)
+    args = parser.parse_args(argv)
+    bench(args.deadlines)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Reusable widgets for the exam question view.
+
+Creating and destroying CTkRadioButtons on every Next/Prev click is the
+slow part of navigating a long test on old hardware: each one builds a
+canvas and several draw items. ``OptionPool`` creates buttons only when a
+question has more options than any question before it; after that,
+navigating only reconfigures the buttons whose text actually changed and
+hides the spares.
+
+    python exam_widgets.py bench [--questions 200]   # per-question render time, recreate vs. pool
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import customtkinter as ctk
+
+
+class OptionPool:
+    """Radio buttons for the options of the question on screen, gridded into ``parent``."""
+
+    def __init__(self, parent, variable, **button_kw):
+        self.parent = parent
+        self.variable = variable
+        self.button_kw = button_kw
+        self.buttons = []
+        self._texts = []
+        self._visible = 0
+        self._on_select = None
+
+    def _button(self, i):
+        while len(self.buttons) <= i:
+            value = len(self.buttons)
+            btn = ctk.CTkRadioButton(self.parent, text="", variable=self.variable, value=value,
+                                     command=lambda v=value: self._selected(v), **self.button_kw)
+            self.buttons.append(btn)
+            self._texts.append("")
+        return self.buttons[i]
+
+    def _selected(self, value):
+        if self._on_select is not None:
+            self._on_select(value)
+
+    def show(self, options, on_select=None, selected=-1):
+        """Display ``options``; ``on_select(option_index)`` runs when one is picked."""
+        self._on_select = on_select
+        for i, text in enumerate(options):
+            btn = self._button(i)
+            if self._texts[i] != text:
+                btn.configure(text=text)
+                self._texts[i] = text
+            if i >= self._visible:
+                btn.grid(row=i, column=0, pady=5, sticky="w")
+        for btn in self.buttons[len(options):self._visible]:
+            btn.grid_remove()
+        self._visible = len(options)
+        self.variable.set(selected)
+
+
+class QuestionPalette:
+    """One small button per question: answered ones green, the current one outlined.
+
+    Buttons are kept between exams like OptionPool's. Marking an answer or
+    moving to another question touches one or two buttons, never the grid.
+    """
+
+    ANSWERED = "#55AA55"
+    UNANSWERED = "#AEA79F"
+    CURRENT_BORDER = "#E95420"
+
+    def __init__(self, parent, columns=10):
+        self.parent = parent
+        self.columns = columns
+        self.buttons = []
+        self._count = 0
+        self._current = None
+        self._on_jump = None
+
+    def reset(self, count, on_jump, answered=()):
+        """Show ``count`` questions, all unanswered except ``answered``; ``on_jump(i)`` on click."""
+        self._on_jump = on_jump
+        while len(self.buttons) < count:
+            i = len(self.buttons)
+            btn = ctk.CTkButton(self.parent, text=str(i + 1), width=36, height=28, border_width=0,
+                                border_color=self.CURRENT_BORDER, command=lambda i=i: self._jump(i))
+            self.buttons.append(btn)
+        for i in range(count):
+            btn = self.buttons[i]
+            btn.configure(fg_color=self.UNANSWERED, border_width=0)
+            if i >= self._count:
+                btn.grid(row=i // self.columns, column=i % self.columns, padx=2, pady=2)
+        for btn in self.buttons[count:self._count]:
+            btn.grid_remove()
+        self._count = count
+        self._current = None
+        for i in answered:
+            self.mark(i)
+
+    def _jump(self, i):
+        if self._on_jump is not None:
+            self._on_jump(i)
+
+    def mark(self, index, answered=True):
+        self.buttons[index].configure(fg_color=self.ANSWERED if answered else self.UNANSWERED)
+
+    def set_current(self, index):
+        if self._current == index:
+            return
+        if self._current is not None and self._current < self._count:
+            self.buttons[self._current].configure(border_width=0)
+        self.buttons[index].configure(border_width=2)
+        self._current = index
+
+
+# ---------- Benchmark ----------
+def _questions(count, seed=0):
+    rng = random.Random(seed)
+    return [[f"Option {q}.{i}" for i in range(rng.choice((2, 3, 4, 4, 4, 5)))] for q in range(count)]
+
+
+def _render_recreate(parent, variable, buttons, options):
+    # What test.py did before the pool
+    for btn in buttons:
+        btn.destroy()
+    buttons.clear()
+    for i, opt in enumerate(options):
+        btn = ctk.CTkRadioButton(parent, text=opt, variable=variable, value=i)
+        btn.pack(pady=5)
+        buttons.append(btn)
+
+
+def bench(count=200, passes=2):
+    if sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+        raise SystemExit("bench needs a display (set DISPLAY or run under xvfb-run)")
+    root = ctk.CTk()
+    root.geometry("900x600")
+    questions = _questions(count)
+    results = {}
+    for name in ("recreate", "pool"):
+        frame = ctk.CTkFrame(root)
+        frame.pack(fill="both", expand=True)
+        variable = ctk.IntVar(value=-1)
+        pool, buttons = OptionPool(frame, variable), []
+        times = []
+        for _ in range(passes):   # forward then back, like a student reviewing
+            order = range(count) if not times else reversed(range(count))
+            for q in order:
+                start = time.perf_counter()
+                if name == "pool":
+                    pool.show(questions[q])
+                else:
+                    _render_recreate(frame, variable, buttons, questions[q])
+                root.update_idletasks()
+                times.append((time.perf_counter() - start) * 1000)
+        frame.destroy()
+        times.sort()
+        results[name] = times
+        print(f"{name:<9} mean {statistics.mean(times):6.2f} ms   p95 {times[int(0.95 * (len(times) - 1))]:6.2f} ms"
+              f"   max {times[-1]:6.2f} ms")
+    root.destroy()
+    print(f"{count} questions x {passes} passes; pool is "
+          f"{statistics.mean(results['recreate']) / statistics.mean(results['pool']):.1f}x faster per navigation")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the exam option widgets")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("bench")
+    b.add_argument("--questions", type=int, default=200)
+    args = parser.parse_args(argv)
+    bench(args.questions)
+
+
+if __name__ == "__main__":
+    main()
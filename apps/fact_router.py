@@ -0,0 +1,200 @@
+"""Keyword routing and near-miss question lookup for the rule-based chatbot.
+
+    python fact_router.py bench       # lookup latency on a 100x synthetic corpus
+"""
+import argparse
+import heapq
+import math
+import random
+import re
+import time
+from collections import defaultdict
+
+from answer_cache import normalize_query
+
+CODING_KEYWORDS = ["python", "c++", "javascript", "git", "coding", "algorithm", "data structure",
+                   "machine learning", "sql", "api"]
+GENERAL_KEYWORDS = ["what is", "why", "how does", "who", "where", "when", "science", "history",
+                    "geography", "capital"]
+
+MIN_SCORE = 0.6          # cosine over tf-idf token sets needed for a fuzzy match
+COMMON_DF = 0.05         # tokens in more docs than this don't generate candidates on their own
+MIN_FUZZY_LEN = 4        # shorter tokens are never spell-corrected
+TOP_CANDIDATES = 32      # docs rescored with the full query after the rare-token pass
+
+
+def compile_keywords(keywords):
+    # Longest first so "data structure" wins over any shorter overlap; whole words only,
+    # so "digit" no longer routes to coding because it contains "git"
+    alternation = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+    return re.compile(rf"(?<!\w)(?:{alternation})(?!\w)")
+
+
+class KeywordRouter:
+    """Picks the first route (in priority order) whose keywords appear in the text."""
+
+    def __init__(self, routes):
+        self.routes = [(name, compile_keywords(keywords)) for name, keywords in routes]
+
+    def route(self, text, default=None):
+        for name, pattern in self.routes:
+            if pattern.search(text):
+                return name
+        return default
+
+
+def _tokens(normalized):
+    return normalized.split()
+
+
+def _deletes(token):
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+class FactIndex:
+    """Exact + fuzzy lookup over a list of {"question", "answer"} pairs.
+
+    Exact lookups hit a dict keyed by the normalized question. Otherwise the
+    query is matched through a token inverted index scored by tf-idf cosine.
+    Only the query's rarer tokens are walked to collect candidates, and only
+    the best TOP_CANDIDATES of those are rescored with every query token, so
+    the cost tracks a few short posting lists rather than the corpus.
+    Misspelled tokens one edit away from a known word are corrected through a
+    precomputed deletion map.
+    """
+
+    def __init__(self, pairs, min_score=MIN_SCORE):
+        self.min_score = min_score
+        self.answers = []
+        self.exact = {}
+        self.postings = defaultdict(list)
+        doc_tokens = []
+        for pair in pairs:
+            norm = normalize_query(pair["question"])
+            self.exact.setdefault(norm, pair["answer"])
+            doc_id = len(self.answers)
+            self.answers.append(pair["answer"])
+            tokens = frozenset(_tokens(norm))
+            doc_tokens.append(tokens)
+            for token in tokens:
+                self.postings[token].append(doc_id)
+
+        n = max(1, len(self.answers))
+        self.idf = {t: math.log((n + 1) / (len(ids) + 1)) + 1 for t, ids in self.postings.items()}
+        self.doc_tokens = doc_tokens
+        self.doc_norm = [math.sqrt(sum(self.idf[t] ** 2 for t in toks)) or 1.0 for toks in doc_tokens]
+        self.common_df = max(1, int(COMMON_DF * n))
+
+        self.corrections = {}
+        for token in self.postings:
+            if len(token) >= MIN_FUZZY_LEN:
+                for variant in _deletes(token):
+                    self.corrections.setdefault(variant, token)
+
+    def __len__(self):
+        return len(self.answers)
+
+    def _resolve(self, token):
+        if token in self.postings:
+            return token
+        if len(token) < MIN_FUZZY_LEN:
+            return None
+        # Catches a dropped, extra or swapped-neighbour letter
+        if token in self.corrections:
+            return self.corrections[token]
+        for variant in _deletes(token):
+            if variant in self.postings:
+                return variant
+            if variant in self.corrections:
+                return self.corrections[variant]
+        return None
+
+    def lookup(self, text):
+        """(answer, score) for the best match, or (None, best_score) when nothing is close."""
+        norm = normalize_query(text)
+        answer = self.exact.get(norm)
+        if answer is not None:
+            return answer, 1.0
+
+        query = {t for t in (self._resolve(tok) for tok in _tokens(norm)) if t is not None}
+        if not query:
+            return None, 0.0
+        rare = [t for t in query if len(self.postings[t]) <= self.common_df]
+        # Term-at-a-time over the short posting lists only, then rescore the front runners
+        partial = defaultdict(float)
+        for token in rare or query:
+            weight = self.idf[token] ** 2
+            for doc_id in self.postings[token]:
+                partial[doc_id] += weight
+        doc_norm = self.doc_norm
+        front = heapq.nlargest(TOP_CANDIDATES, partial, key=lambda d: partial[d] / doc_norm[d])
+
+        q_norm = math.sqrt(sum(self.idf[t] ** 2 for t in query))
+        best_id, best = None, 0.0
+        for doc_id in front:
+            shared = query & self.doc_tokens[doc_id]
+            score = sum(self.idf[t] ** 2 for t in shared) / (q_norm * doc_norm[doc_id])
+            if score > best:
+                best_id, best = doc_id, score
+        if best_id is None or best < self.min_score:
+            return None, best
+        return self.answers[best_id], best
+
+
+# ---------- Benchmark ----------
+_FILLERS = ["please", "tell", "me", "quickly", "exactly", "again", "simply", "now"]
+
+
+def _near_miss(question, rng):
+    words = question.split()
+    i = rng.randrange(len(words))
+    word = words[i]
+    if len(word) > MIN_FUZZY_LEN:
+        j = rng.randrange(1, len(word) - 1)
+        words[i] = word[:j] + word[j + 1:]       # drop a letter
+    words.insert(rng.randrange(len(words) + 1), rng.choice(_FILLERS))
+    return " ".join(words)
+
+
+def bench(sources=("coding_facts.csv", "general_facts.csv"), scale=100, queries=2000, seed=0):
+    import qa_sources
+    rng = random.Random(seed)
+    base = [p for path in sources for p in qa_sources.load_csv_pairs(path)]
+    # Scale the corpus with distinct copies: each copy gets its own topic word
+    corpus = [{"question": f"{p['question']} topic{c}", "answer": p["answer"]}
+              for c in range(scale) for p in base]
+
+    start = time.perf_counter()
+    index = FactIndex(corpus)
+    build_s = time.perf_counter() - start
+
+    sample = [rng.choice(corpus) for _ in range(queries)]
+    probes = [(_near_miss(p["question"], rng), p["answer"]) for p in sample]
+    start = time.perf_counter()
+    results = [index.lookup(q) for q, _ in probes]
+    per_query_us = (time.perf_counter() - start) * 1e6 / len(probes)
+    correct = sum(answer == expected for (answer, _), (_, expected) in zip(results, probes))
+
+    router = KeywordRouter([("coding", CODING_KEYWORDS), ("general", GENERAL_KEYWORDS)])
+    start = time.perf_counter()
+    for q, _ in probes:
+        router.route(q.lower())
+    route_us = (time.perf_counter() - start) * 1e6 / len(probes)
+
+    print(f"corpus: {len(corpus)} questions ({scale}x {len(base)}), index built in {build_s:.2f} s")
+    print(f"near-miss lookup: {per_query_us:.1f} us/query, {correct / len(probes):.1%} resolved to the right answer")
+    print(f"keyword routing: {route_us:.1f} us/query")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the chatbot fact router")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("bench")
+    b.add_argument("--scale", type=int, default=100)
+    b.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args(argv)
+    bench(scale=args.scale, queries=args.queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""Grade a whole class's submissions at once and write a class report.
+
+test.py writes one file per submitted exam to submissions/:
+
+    {"student": "asha@lab-pc-07", "test": "test3.json", "answers": [1, -1, 2, ...],
+     "submitted": 1760000000.0, "elapsed": 512.3}
+
+``answers`` holds one option index per question (-1 = unanswered). All
+submissions for a test are stacked into one students x questions int8 matrix
+and compared with the answer key in a single NumPy operation; the per-question
+statistics are column reductions of the same matrix.
+
+    difficulty      share of students who got the question right (low = hard)
+    discrimination  share right among the top 27% minus among the bottom 27% by
+                    score; near zero or negative flags a question worth reviewing
+
+    python grading.py grade [submissions] [--tests test_jsons] [--out reports]
+    python grading.py bench [--students N] [--questions N]   # NumPy vs. per-student Python loop
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import tempfile
+import time
+from collections import defaultdict, namedtuple
+
+from question_bank import TEST_FOLDER, QuestionBank
+
+SUBMISSION_FOLDER = "submissions"
+REPORT_FOLDER = "reports"
+GROUP_FRACTION = 0.27
+UNANSWERED = -1
+
+ClassReport = namedtuple("ClassReport", "test students scores percent difficulty discrimination option_counts invalid")
+
+
+def safe_name(text):
+    # Names come from other machines too (lab_console.py); never let them leave ``folder``
+    return "".join(c if c.isalnum() or c in "-_.@" else "_" for c in text).lstrip(".") or "_"
+
+
+def submission_path(student, test, submitted, folder=SUBMISSION_FOLDER):
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(submitted))
+    return os.path.join(folder, f"{safe_name(os.path.splitext(test)[0])}-{safe_name(student)}-{stamp}.json")
+
+
+def write_submission(student, test, answers, elapsed=None, folder=SUBMISSION_FOLDER):
+    """Save one student's answers (list of option indexes, -1 unanswered); returns (path, record)."""
+    record = {"student": student, "test": test, "answers": list(answers), "submitted": time.time(),
+              "elapsed": None if elapsed is None else round(elapsed, 1)}
+    return save_submission(record, folder), record
+
+
+def save_submission(record, folder=SUBMISSION_FOLDER):
+    """Write a submission dict as is (e.g. one collected by lab_console.py); returns its path."""
+    os.makedirs(folder, exist_ok=True)
+    path = submission_path(record["student"], record["test"], record["submitted"], folder)
+    with open(path + ".tmp", "w") as f:
+        json.dump(record, f)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def check_submission(sub):
+    """Why ``sub`` is not a usable submission record, or None if it is."""
+    if not isinstance(sub, dict):
+        return "not an object"
+    for field in ("student", "test"):
+        if not isinstance(sub.get(field), str) or not sub[field]:
+            return f"no {field}"
+    answers = sub.get("answers")
+    if not isinstance(answers, list) or not all(type(a) is int for a in answers):
+        return "answers must be a list of option indexes"
+    for field in ("submitted", "elapsed"):
+        value = sub.get(field)
+        if value is None and field == "elapsed":
+            continue
+        if type(value) not in (int, float) or not math.isfinite(value) or value < 0:
+            return f"bad {field} {value!r}"
+    return None
+
+
+def iter_submissions(folder=SUBMISSION_FOLDER):
+    """Every submission dict in ``folder``, resubmissions included; unreadable or invalid files are skipped."""
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".json"):
+                continue
+            with open(entry.path) as f:
+                try:
+                    sub = json.load(f)
+                except ValueError as e:
+                    print(f"skipping {entry.name}: not JSON ({e})")
+                    continue
+            problem = check_submission(sub)
+            if problem is not None:
+                print(f"skipping {entry.name}: {problem}")
+                continue
+            yield sub
+
+
+def load_submissions(folder=SUBMISSION_FOLDER):
+    """test name -> list of submission dicts, latest submission per student only."""
+    latest = {}
+    for sub in iter_submissions(folder):
+        key = (sub["test"], sub["student"])
+        if key not in latest or sub["submitted"] > latest[key]["submitted"]:
+            latest[key] = sub
+    by_test = defaultdict(list)
+    for (test, _), sub in sorted(latest.items()):
+        by_test[test].append(sub)
+    return by_test
+
+
+def answer_matrix(submissions, questions):
+    import numpy as np
+    rows = [sub["answers"] for sub in submissions]
+    if all(len(r) == questions for r in rows):
+        matrix = np.array(rows, dtype=np.int64).reshape(len(rows), questions)
+    else:
+        # Older or truncated submissions: pad with "unanswered"
+        matrix = np.full((len(submissions), questions), UNANSWERED, dtype=np.int64)
+        for row, sub in enumerate(submissions):
+            answers = sub["answers"][:questions]
+            matrix[row, :len(answers)] = answers
+    # Anything outside int8 is not a real option; keep it out of range rather than wrapping around
+    return np.clip(matrix, UNANSWERED - 1, 127).astype(np.int8)
+
+
+def grade(test, submissions):
+    """ClassReport for every submission of ``test`` (a question_bank.Test)."""
+    import numpy as np
+    key = np.array([q.correct for q in test.questions], dtype=np.int8)
+    answers = answer_matrix(submissions, len(key))
+    correct = answers == key                       # students x questions
+    scores = correct.sum(axis=1)
+    difficulty = correct.mean(axis=0)
+
+    # Upper/lower group discrimination on the ranked scores
+    n = len(scores)
+    group = max(1, int(round(n * GROUP_FRACTION)))
+    order = np.argsort(scores, kind="stable")
+    discrimination = correct[order[-group:]].mean(axis=0) - correct[order[:group]].mean(axis=0)
+
+    # How often each option was picked, per question (distractor analysis)
+    options = np.array([len(q.options) for q in test.questions])
+    width = options.max()
+    # Indexes the question does not have (options removed since the exam, or a damaged file) count as invalid
+    bad = (answers < UNANSWERED) | (answers >= options)
+    invalid = bad.sum(axis=0)
+    picked = np.where(bad, UNANSWERED, answers)
+    # One bincount over (question, option + 1) cells; column 0 counts unanswered and is dropped
+    cells = (picked.astype(np.intp) + 1) + np.arange(len(key)) * (width + 1)
+    option_counts = np.bincount(cells.ravel(), minlength=len(key) * (width + 1)).reshape(len(key), width + 1)[:, 1:]
+
+    return ClassReport(test.name, [s["student"] for s in submissions], scores,
+                       scores * 100.0 / len(key), difficulty, discrimination, option_counts, invalid)
+
+
+def write_report(report, folder=REPORT_FOLDER):
+    """Two CSVs a teacher can open in a spreadsheet: per student and per question."""
+    os.makedirs(folder, exist_ok=True)
+    stem = os.path.join(folder, os.path.splitext(report.test)[0])
+    with open(stem + "-students.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["student", "score", "percent"])
+        for student, score, percent in zip(report.students, report.scores, report.percent):
+            writer.writerow([student, int(score), f"{percent:.1f}"])
+    with open(stem + "-questions.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["question", "difficulty", "discrimination"]
+                        + [f"option_{i + 1}" for i in range(report.option_counts.shape[1])] + ["invalid"])
+        for q, (p, d) in enumerate(zip(report.difficulty, report.discrimination)):
+            writer.writerow([q + 1, f"{p:.3f}", f"{d:.3f}"] + [int(c) for c in report.option_counts[q]]
+                            + [int(report.invalid[q])])
+    return stem + "-students.csv", stem + "-questions.csv"
+
+
+def grade_folder(submission_folder=SUBMISSION_FOLDER, test_folder=TEST_FOLDER, extra_tests=(),
+                 report_folder=REPORT_FOLDER):
+    bank = QuestionBank(test_folder, extra_tests)
+    bank.scan()
+    reports = []
+    for test_name, submissions in load_submissions(submission_folder).items():
+        if test_name not in bank.tests:
+            print(f"skipping {len(submissions)} submission(s) for unknown test {test_name}")
+            continue
+        report = grade(bank.tests[test_name], submissions)
+        paths = write_report(report, report_folder)
+        print(f"{test_name}: {len(submissions)} students, mean {report.percent.mean():.1f}% -> {', '.join(paths)}")
+        reports.append(report)
+    return reports
+
+
+# ---------- Benchmark ----------
+def bench(students=5000, questions=50, options=4):
+    import numpy as np
+    from question_bank import Question, Test
+
+    rng = np.random.default_rng(0)
+    key = rng.integers(0, options, questions)
+    test = Test("bench.json", tuple(Question(f"Q{i}", tuple(map(str, range(options))), int(k))
+                                    for i, k in enumerate(key)), None)
+    # Stronger students pick the key more often, so the statistics are not flat
+    ability = rng.random(students)[:, None]
+    picks = np.where(rng.random((students, questions)) < 0.25 + 0.7 * ability, key,
+                     rng.integers(-1, options, (students, questions)))
+    submissions = [{"student": f"s{i}", "answers": row.tolist()} for i, row in enumerate(picks)]
+
+    start = time.perf_counter()
+    loop_scores = [sum(1 for i, ans in enumerate(sub["answers"]) if ans == test.questions[i].correct)
+                   for sub in submissions]
+    loop_s = time.perf_counter() - start
+    start = time.perf_counter()
+    report = grade(test, submissions)
+    numpy_s = time.perf_counter() - start
+    assert report.scores.tolist() == loop_scores
+
+    # End to end from submission files, as "grade" runs it
+    with tempfile.TemporaryDirectory() as folder:
+        for sub in submissions:
+            with open(os.path.join(folder, sub["student"] + ".json"), "w") as f:
+                json.dump(dict(sub, test=test.name, submitted=0.0), f)
+        start = time.perf_counter()
+        loaded = load_submissions(folder)[test.name]
+        load_s = time.perf_counter() - start
+    start = time.perf_counter()
+    grade(test, loaded)
+    files_s = load_s + time.perf_counter() - start
+
+    print(f"{students} submissions x {questions} questions")
+    print(f"python loop, scores only:          {loop_s * 1000:8.1f} ms")
+    print(f"numpy, scores + item statistics:   {numpy_s * 1000:8.1f} ms")
+    print(f"read {students} files + grade:       {files_s * 1000:8.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grade submitted exams for a whole class")
+    sub = parser.add_subparsers(dest="command", required=True)
+    g = sub.add_parser("grade")
+    g.add_argument("submissions", nargs="?", default=SUBMISSION_FOLDER)
+    g.add_argument("--tests", default=TEST_FOLDER)
+    g.add_argument("--extra-tests", nargs="*", default=["simulated_test.json"])
+    g.add_argument("--out", default=REPORT_FOLDER)
+    b = sub.add_parser("bench")
+    b.add_argument("--students", type=int, default=5000)
+    b.add_argument("--questions", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    if args.command == "grade":
+        grade_folder(args.submissions, args.tests, args.extra_tests, args.out)
+    else:
+        bench(args.students, args.questions)
+
+
+if __name__ == "__main__":
+    main()
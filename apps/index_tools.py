@@ -0,0 +1,218 @@
+"""Build, pick and compare FAISS index variants for the chatbot.
+
+    python index_tools.py build sq8 hnsw ivfpq   # write variants next to the flat index
+    python index_tools.py report                 # recall / latency / RAM vs the flat index
+
+Variants are built from the vectors stored in model_data/chatbot_index.faiss,
+so no encoder is needed. The chatbot loads whichever variant is present,
+in INDEX_PREFERENCE order, unless EDULITE_INDEX names one explicitly.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+MODEL_DIR = "model_data"
+FLAT_INDEX = "chatbot_index.faiss"
+
+# kind -> file name; "flat" is the original exhaustive float32 index
+INDEX_FILES = {
+    "hnsw": "chatbot_index.hnsw.faiss",
+    "ivfpq": "chatbot_index.ivfpq.faiss",
+    "sq8": "chatbot_index.sq8.faiss",
+    "fp16": "chatbot_index.fp16.faiss",
+    "flat": FLAT_INDEX,
+}
+# Smallest resident footprint first; build only the variants you want loaded
+INDEX_PREFERENCE = ["ivfpq", "sq8", "fp16", "hnsw", "flat"]
+
+# Search-time knobs; FAISS does not store these in the index file
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 64
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 8
+PQ_SUBQUANTIZERS = 48
+PQ_BITS = 8
+
+
+def index_path(kind, model_dir=MODEL_DIR):
+    return os.path.join(model_dir, INDEX_FILES[kind])
+
+
+def build_index(vectors, kind):
+    import faiss
+    n, d = vectors.shape
+    if kind == "flat":
+        index = faiss.IndexFlatL2(d)
+    elif kind == "sq8":
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit)
+    elif kind == "fp16":
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_fp16)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif kind == "ivfpq":
+        # ~sqrt(n) lists keeps list scans short; PQ needs 2**bits training points per centroid set
+        nlist = max(1, min(int(n ** 0.5), n // 39))
+        m = PQ_SUBQUANTIZERS if d % PQ_SUBQUANTIZERS == 0 else 1
+        bits = PQ_BITS if n >= 2 ** PQ_BITS else max(1, n.bit_length() - 1)
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(d), d, nlist, m, bits)
+    else:
+        raise ValueError(f"Unknown index kind: {kind}")
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    configure_search(index)
+    return index
+
+
+def configure_search(index):
+    import faiss
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    try:
+        faiss.extract_index_ivf(index).nprobe = IVF_NPROBE
+    except (RuntimeError, AttributeError):
+        pass
+    return index
+
+
+def available_kinds(model_dir=MODEL_DIR):
+    return [kind for kind in INDEX_PREFERENCE if os.path.exists(index_path(kind, model_dir))]
+
+
+def find_index(model_dir=MODEL_DIR, prefer=None):
+    prefer = prefer or os.environ.get("EDULITE_INDEX")
+    if prefer:
+        return prefer, index_path(prefer, model_dir)
+    kinds = available_kinds(model_dir)
+    kind = kinds[0] if kinds else "flat"
+    return kind, index_path(kind, model_dir)
+
+
+def _manifest_count(model_dir):
+    from encoders import MANIFEST
+    try:
+        with open(os.path.join(model_dir, MANIFEST)) as f:
+            return json.load(f).get("count")
+    except (OSError, ValueError):
+        return None
+
+
+def load_index(model_dir=MODEL_DIR, prefer=None, expected=None):
+    """(kind, path, index) for the preferred variant.
+
+    ``expected`` is the number of stored answers (default: the build
+    manifest's count). A variant with a different number of vectors was built
+    for an older corpus and is skipped in favour of the flat index.
+    """
+    import faiss
+    if expected is None:
+        expected = _manifest_count(model_dir)
+    kind, path = find_index(model_dir, prefer)
+    index = faiss.read_index(path)
+    if expected is not None and index.ntotal != expected and kind != "flat":
+        print(f"{path} holds {index.ntotal} vectors but there are {expected} answers; using the flat index")
+        kind, path = "flat", index_path("flat", model_dir)
+        index = faiss.read_index(path)
+    if expected is not None and index.ntotal != expected:
+        raise ValueError(f"{path} holds {index.ntotal} vectors but there are {expected} answers; "
+                         f"rebuild with build_model_data.py")
+    return kind, path, configure_search(index)
+
+
+def read_vectors(model_dir=MODEL_DIR):
+    import faiss
+    flat = faiss.read_index(os.path.join(model_dir, FLAT_INDEX))
+    return flat.reconstruct_n(0, flat.ntotal)
+
+
+def write_index(index, path):
+    import faiss
+    tmp = path + ".tmp"
+    faiss.write_index(index, tmp)
+    os.replace(tmp, path)
+
+
+# ---------- Report ----------
+def _rss_kb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def _measure_rss(path):
+    # Fresh interpreter per variant so allocator reuse doesn't hide the cost
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "_rss", path],
+                         capture_output=True, text=True, check=True)
+    return int(out.stdout.strip())
+
+
+def _noisy_queries(vectors, noise, seed=0):
+    # Perturbed copies of the stored questions stand in for paraphrases
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    q = vectors + rng.normal(0, noise, vectors.shape).astype("float32")
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def report(model_dir=MODEL_DIR, kinds=None, k=10, noise=0.05, repeats=3):
+    import faiss
+    import numpy as np
+
+    vectors = read_vectors(model_dir)
+    queries = _noisy_queries(vectors, noise)
+    _, truth = faiss.read_index(os.path.join(model_dir, FLAT_INDEX)).search(queries, k)
+
+    kinds = kinds or available_kinds(model_dir)
+    print(f"{len(vectors)} vectors, {len(queries)} noisy queries (sigma={noise}), k={k}")
+    print(f"{'index':<8}{'file MB':>9}{'RAM MB':>9}{'recall@1':>10}{'recall@10':>11}{'ms/query':>10}")
+    for kind in kinds:
+        path = index_path(kind, model_dir)
+        index = configure_search(faiss.read_index(path))
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for row in range(len(queries)):
+                _, found = index.search(queries[row:row + 1], k)
+            best = min(best, time.perf_counter() - start)
+        _, found = index.search(queries, k)
+        recall1 = float(np.mean(found[:, 0] == truth[:, 0]))
+        recall_k = float(np.mean([len(set(a) & set(b)) / k for a, b in zip(found, truth)]))
+        print(f"{kind:<8}{os.path.getsize(path) / 2**20:>9.2f}{_measure_rss(path) / 1024:>9.2f}"
+              f"{recall1:>10.3f}{recall_k:>11.3f}{best * 1000 / len(queries):>10.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and compare chatbot index variants")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="write compact index variants from the flat index")
+    build.add_argument("kinds", nargs="+", choices=[k for k in INDEX_PREFERENCE if k != "flat"])
+    rep = sub.add_parser("report", help="recall/latency/RAM of every variant present")
+    rep.add_argument("--noise", type=float, default=0.05)
+    rep.add_argument("-k", type=int, default=10)
+    rss = sub.add_parser("_rss")
+    rss.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "_rss":
+        import faiss
+        before = _rss_kb()
+        index = faiss.read_index(args.path)
+        print(_rss_kb() - before)
+    elif args.command == "build":
+        vectors = read_vectors(args.model_dir)
+        for kind in args.kinds:
+            start = time.perf_counter()
+            index = build_index(vectors, kind)
+            path = index_path(kind, args.model_dir)
+            write_index(index, path)
+            print(f"{kind}: {path} ({os.path.getsize(path) / 2**20:.2f} MB, {time.perf_counter() - start:.1f} s)")
+    elif args.command == "report":
+        report(args.model_dir, k=args.k, noise=args.noise)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+
+# One frame at 60 Hz; the Tk thread should never stall longer than this
+FRAME_MS = 1000 / 60
+
+# What the UI gets back for every submitted query
+Reply = namedtuple("Reply", "ticket query answer error cancelled elapsed_ms ui_lag_ms")
+
+
+class InferenceWorker:
+    """Runs a slow answer function on a background thread.
+
+    Queries go in through ``submit()``; replies come back on the Tk thread via
+    ``widget.after`` polling, so Tk is only ever touched from its own thread.
+    The poll only runs while a reply (or the warmup result) is outstanding, so
+    an idle chat window does not wake up every ``poll_ms``.
+    Only the newest query is answered: anything still waiting when a newer one
+    arrives is dropped, and an answer that finishes after being superseded is
+    delivered with ``cancelled=True`` so the UI can clean up its placeholder.
+
+    An optional ``warmup`` callable runs on the worker thread before the first
+    query (e.g. importing torch and loading the model); queries submitted in
+    the meantime simply wait, and ``on_ready(error)`` fires on the Tk thread
+    once it is done.
+
+    The poll loop doubles as a latency probe: it records how late each
+    ``after`` callback fired while a query was in flight, which is exactly the
+    delay a click or keypress would have seen.
+    """
+
+    def __init__(self, widget, answer_fn, poll_ms=10, warmup=None, on_ready=None):
+        self.widget = widget
+        self.answer_fn = answer_fn
+        self.warmup = warmup
+        self.on_ready = on_ready
+        self.poll_ms = poll_ms
+        self.max_lag_ms = 0.0
+        self._requests = queue.Queue()
+        self._replies = queue.Queue()
+        self._callbacks = {}
+        self._latest = 0
+        self._lock = threading.Lock()
+        self._in_flight_lag = 0.0
+        self._stopped = False
+        self._awaiting_ready = warmup is not None
+        self._after_id = None
+        self._due = 0.0
+        self._thread = threading.Thread(target=self._run, name="inference-worker", daemon=True)
+        self._thread.start()
+        if self._awaiting_ready:
+            self._schedule()
+
+    # ---------- Tk thread API ----------
+    def submit(self, query, on_reply):
+        with self._lock:
+            self._latest += 1
+            ticket = self._latest
+        self._callbacks[ticket] = on_reply
+        self._requests.put((ticket, query))
+        self._schedule()
+        return ticket
+
+    def cancel(self):
+        # Supersede whatever is queued or running without submitting anything new
+        with self._lock:
+            self._latest += 1
+
+    def busy(self):
+        return bool(self._callbacks)
+
+    def stop(self):
+        self._stopped = True
+        self.cancel()
+        self._requests.put(None)
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    # ---------- Worker thread ----------
+    def _is_current(self, ticket):
+        with self._lock:
+            return ticket == self._latest
+
+    def _run(self):
+        if self.warmup is not None:
+            error = None
+            try:
+                self.warmup()
+            except Exception as exc:
+                error = exc
+            self._replies.put(("ready", error))
+
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            ticket, query = item
+            if not self._is_current(ticket):
+                self._replies.put((ticket, query, None, None, True, 0.0))
+                continue
+            start = time.perf_counter()
+            answer, error = None, None
+            try:
+                answer = self.answer_fn(query)
+            except Exception as exc:
+                error = exc
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            cancelled = not self._is_current(ticket)
+            self._replies.put((ticket, query, answer, error, cancelled, elapsed_ms))
+
+    # ---------- Delivery on the Tk thread ----------
+    def _schedule(self):
+        if self._after_id is None and not self._stopped:
+            self._due = time.perf_counter() + self.poll_ms / 1000
+            self._after_id = self.widget.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        self._after_id = None
+        if self._stopped:
+            return
+        now = time.perf_counter()
+        lag_ms = max(0.0, (now - self._due) * 1000)
+        if self._callbacks:
+            self._in_flight_lag = max(self._in_flight_lag, lag_ms)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+
+        while True:
+            try:
+                item = self._replies.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] == "ready":
+                self._awaiting_ready = False
+                if self.on_ready is not None:
+                    self.on_ready(item[1])
+                continue
+            ticket, query, answer, error, cancelled, elapsed_ms = item
+            on_reply = self._callbacks.pop(ticket, None)
+            if on_reply is not None:
+                on_reply(Reply(ticket, query, answer, error, cancelled, elapsed_ms, self._in_flight_lag))
+            if not self._callbacks:
+                self._in_flight_lag = 0.0
+
+        # Nothing left to wait for: stay idle until the next submit()
+        if self._callbacks or self._awaiting_ready:
+            self._schedule()
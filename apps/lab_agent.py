@@ -0,0 +1,262 @@
+"""Seat side of the teacher console; runs on every student machine.
+
+Connects to lab_console.py on the teacher PC (and reconnects if it
+restarts), saves tests the teacher sends into test_jsons/ and starts or
+stops test.py, exam_mode.py or lab_mode.py on request. Answers are not
+sent by test.py itself: the agent follows the exam's answer journal
+(answer_journal.py) and forwards each answer as it is journaled, then the
+submission file once the exam is submitted. test.py therefore works the
+same with or without an agent, and nothing is lost while the console is
+unreachable; the answers so far are sent again on reconnect.
+
+Run it from the repository root, like test.py:
+
+    python apps/lab_agent.py 192.168.1.10 [--port 5757] [--key SECRET] [--seat NAME]
+"""
+import argparse
+import asyncio
+import getpass
+import json
+import os
+import platform
+import sys
+import time
+
+from answer_journal import JOURNAL_DIR
+from grading import SUBMISSION_FOLDER, safe_name
+from lab_protocol import MAX_LINE, MODES, PORT, ProtocolError, encode, read_message
+from question_bank import TEST_FOLDER, QuestionBankError, parse_test
+
+APPS = {"test": "test.py", "exam": "exam_mode.py", "lab": "lab_mode.py"}
+FOLLOW_INTERVAL = 0.25
+RECONNECT_MAX = 30
+# Same as test.py's STUDENT_ID
+STUDENT_ID = os.environ.get("EDULITE_STUDENT") or f"{getpass.getuser()}@{platform.node()}"
+
+
+class LabAgent:
+    def __init__(self, host, port=PORT, key=None, seat=None, student=STUDENT_ID, test_folder=TEST_FOLDER,
+                 journal_folder=JOURNAL_DIR, submission_folder=SUBMISSION_FOLDER):
+        self.host = host
+        self.port = port
+        self.key = key
+        self.seat = seat or platform.node()
+        self.student = student
+        self.test_folder = test_folder
+        self.journal_folder = journal_folder
+        self.submission_folder = submission_folder
+        self.apps = {}        # mode -> running asyncio subprocess
+        self.answers = {}     # test -> {question: (option, elapsed)} of the sitting being followed
+        self._follows = {}    # (test, started) -> where reading that sitting's journal got to
+        self._writer = None
+
+    # ---------- Connection ----------
+    async def run(self):
+        """Stay connected to the console until cancelled."""
+        delay = 1
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port, limit=MAX_LINE)
+            except OSError:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX)
+                continue
+            delay = 1
+            try:
+                await self._session(reader, writer)
+            finally:
+                self._writer = None
+                writer.close()
+            await asyncio.sleep(delay)
+
+    async def _session(self, reader, writer):
+        self._writer = writer
+        await self.send({"type": "hello", "seat": self.seat, "student": self.student, "key": self.key})
+        # Catch a restarted console up on what is already running here
+        for mode in self.apps:
+            await self.send({"type": "status", "mode": mode, "running": True})
+        # The follower task keeps adding answers while this awaits, so iterate over copies
+        for test, answers in list(self.answers.items()):
+            for q, (a, elapsed) in list(answers.items()):
+                await self.send({"type": "answer", "test": test, "q": q, "a": a, "elapsed": elapsed})
+        while True:
+            try:
+                message = await read_message(reader)
+            except ProtocolError as e:
+                await self.send({"type": "error", "message": str(e)})
+                continue
+            if message is None:
+                return
+            handler = getattr(self, "on_" + message["type"], None)
+            if handler is None:
+                await self.send({"type": "error", "message": f"unknown message {message['type']!r}"})
+                continue
+            try:
+                await handler(message)
+            except (KeyError, TypeError, ValueError, OSError) as e:
+                await self.send({"type": "error", "message": f"{message['type']}: {e}"})
+
+    async def send(self, message):
+        writer = self._writer
+        if writer is None:
+            return   # offline; answers are resent from self.answers on reconnect
+        try:
+            writer.write(encode(message))
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    # ---------- Console requests ----------
+    async def on_test(self, message):
+        name = message["name"]
+        if os.path.basename(name) != name or not name.endswith(".json"):
+            raise ValueError(f"bad test name {name!r}")
+        try:
+            self.save_test(name, message["data"])
+        except QuestionBankError as e:
+            raise ValueError(f"{name}: {e}") from None
+        await self.send({"type": "have", "test": name})
+
+    async def on_start(self, message):
+        mode = message["mode"]
+        if mode not in MODES:
+            raise ValueError(f"unknown mode {mode!r}")
+        if mode in self.apps:
+            raise ValueError(f"{mode} is already running")
+        test = message.get("test")
+        if mode == "test" and not test:
+            raise ValueError("no test given")
+        await self.launch(mode, test)
+        await self.send({"type": "status", "mode": mode, "running": True, "test": test})
+
+    async def on_stop(self, message):
+        await self._tell(message["mode"], "stop")
+
+    async def on_extend(self, message):
+        await self._tell(message["mode"], f"extend {int(message['seconds'])}")
+
+    async def _tell(self, mode, command):
+        proc = self.apps.get(mode)
+        if proc is None:
+            await self.send({"type": "status", "mode": mode, "running": False})
+            return
+        proc.stdin.write(command.encode() + b"\n")
+        await proc.stdin.drain()
+
+    # ---------- Tests and apps on this seat ----------
+    def save_test(self, name, data):
+        parse_test(data, name)   # refuse anything test.py could not open
+        os.makedirs(self.test_folder, exist_ok=True)
+        path = os.path.join(self.test_folder, name)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+        os.replace(path + ".tmp", path)
+
+    async def launch(self, mode, test=None):
+        env = dict(os.environ, EDULITE_REMOTE="1", EDULITE_STUDENT=self.student)
+        if test:
+            env["EDULITE_START_TEST"] = test
+        app = os.path.join(os.path.dirname(os.path.abspath(__file__)), APPS[mode])
+        started = time.time()
+        proc = await asyncio.create_subprocess_exec(sys.executable, app, stdin=asyncio.subprocess.PIPE, env=env)
+        self.apps[mode] = proc
+        asyncio.create_task(self._watch(mode, proc, test, started))
+
+    async def _watch(self, mode, proc, test, started):
+        follower = asyncio.create_task(self._follow(test, started)) if mode == "test" else None
+        code = await proc.wait()
+        if follower is not None:
+            follower.cancel()
+            await self._follow_once(test, started)   # whatever was journaled just before exit
+            self._follows.pop((test, started), None)
+        del self.apps[mode]
+        await self.send({"type": "status", "mode": mode, "running": False, "exit": code})
+
+    # ---------- Following test.py's answer journal ----------
+    async def _follow(self, test, started):
+        while True:
+            await self._follow_once(test, started)
+            await asyncio.sleep(FOLLOW_INTERVAL)
+
+    async def _follow_once(self, test, started):
+        state = self._follows.setdefault((test, started), {"path": None, "offset": 0, "pending": b""})
+        if state["path"] is None:
+            state["path"] = self._find_journal(test, started)
+            if state["path"] is None:
+                return
+            self.answers[test] = {}
+        with open(state["path"], "rb") as f:
+            f.seek(state["offset"])
+            data = f.read()
+        state["offset"] += len(data)
+        *lines, state["pending"] = (state["pending"] + data).split(b"\n")
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("t") == "answer":
+                self.answers[test][record["q"]] = (record["a"], record.get("elapsed"))
+                await self.send({"type": "answer", "test": test, "q": record["q"], "a": record["a"],
+                                 "elapsed": record.get("elapsed")})
+            elif record.get("t") == "end":
+                if record.get("reason") == "submitted":
+                    submission = self._find_submission(test, started)
+                    if submission is not None:
+                        await self.send({"type": "submitted", "record": submission})
+                self.answers.pop(test, None)
+
+    def _find_journal(self, test, started):
+        # test.py starts a new journal, or appends to an interrupted one it resumes
+        try:
+            entries = [e for e in os.scandir(self.journal_folder)
+                       if e.name.endswith(".jsonl") and e.stat().st_mtime >= started - 1]
+        except FileNotFoundError:
+            return None
+        for entry in sorted(entries, key=lambda e: e.stat().st_mtime, reverse=True):
+            with open(entry.path, "rb") as f:
+                try:
+                    first = json.loads(f.readline())
+                except ValueError:
+                    continue
+            if first.get("t") == "start" and first.get("test") == test:
+                return entry.path
+        return None
+
+    def _find_submission(self, test, started):
+        stem = safe_name(os.path.splitext(test)[0]) + "-"
+        newest = None
+        try:
+            entries = [e for e in os.scandir(self.submission_folder)
+                       if e.name.startswith(stem) and e.name.endswith(".json") and e.stat().st_mtime >= started - 1]
+        except FileNotFoundError:
+            return None   # test.py could not write its submission
+        for entry in entries:
+            try:
+                with open(entry.path) as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if isinstance(record, dict) and record.get("test") == test and record.get("student") == self.student \
+                    and (newest is None or record["submitted"] > newest["submitted"]):
+                newest = record
+        return newest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Let the teacher console control this seat")
+    parser.add_argument("console", help="address of the teacher PC")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--key", default=os.environ.get("EDULITE_LAB_KEY"))
+    parser.add_argument("--seat", help="name shown on the console (default: host name)")
+    args = parser.parse_args(argv)
+    agent = LabAgent(args.console, args.port, args.key, args.seat)
+    print(f"seat {agent.seat} ({agent.student}) -> {args.console}:{args.port}")
+    try:
+        asyncio.run(agent.run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+"""Teacher console: run exams on every seat in the lab from one PC.
+
+Each student machine runs lab_agent.py, which connects here. From the
+``lab>`` prompt the teacher can copy a test from test_jsons/ to every seat,
+start or stop test.py, exam mode or lab mode everywhere at once, give extra
+time and watch answers arrive. Submitted exams are saved to submissions/
+and results.db exactly as if they had been sat on this PC, so grading.py
+and the result queries work unchanged.
+
+One asyncio event loop serves all seats: a broadcast is encoded once and
+the same bytes are written to every socket, an answer only updates a dict,
+and submissions are stored in batches (one SQLite transaction every
+STORE_INTERVAL). Meant for a closed lab network; give the console and the
+agents the same --key (or EDULITE_LAB_KEY) so other machines cannot join.
+Without a key the console only listens on loopback. A seat can only submit
+for the student it said hello as.
+
+    python apps/lab_console.py serve [--port 5757] [--key SECRET]
+    python apps/lab_console.py bench [--agents 500] [--questions 40]   # simulated seats on loopback
+"""
+import argparse
+import asyncio
+import hmac
+import json
+import os
+import socket
+import sqlite3
+import time
+
+import grading
+from lab_protocol import MAX_LINE, MODES, PORT, ProtocolError, encode, read_message
+from question_bank import TEST_FOLDER, QuestionBank, dump_test
+from result_store import RESULTS_DB, ResultStore
+
+HELLO_TIMEOUT = 10
+SEND_TIMEOUT = 5       # a seat that cannot take a broadcast this fast is dropped
+STORE_INTERVAL = 0.5
+BACKLOG = 1024         # a whole lab connects at once when the console starts
+LOOPBACK = ("127.0.0.1", "::1", "localhost")
+
+HELP = """\
+seats                       who is connected and what is running
+send <test>                 copy a test to every seat
+start test <test>           open <test> in test.py on every seat (sends it first)
+start exam | start lab      turn on exam mode / lab mode everywhere
+stop test|exam|lab          submit the test / end the mode everywhere
+extend test|exam|lab <min>  give everyone extra minutes
+progress                    answers received per seat for the running test
+quit"""
+
+
+class Seat:
+    def __init__(self, name, student, writer):
+        self.name = name
+        self.student = student
+        self.writer = writer
+        self.running = {}      # mode -> test name (or None) while it runs there
+        self.tests = set()     # tests saved on the seat
+        self.answers = {}      # test -> {question: option}
+        self.submitted = set()
+        self.last_error = None
+
+
+class LabConsole:
+    def __init__(self, bank, key=None, submission_folder=grading.SUBMISSION_FOLDER, results_db=RESULTS_DB,
+                 on_event=print):
+        self.bank = bank
+        self.key = key
+        self.submission_folder = submission_folder
+        self.results_db = results_db
+        self.on_event = on_event or (lambda text: None)
+        self.seats = {}
+        self.stored = 0
+        self._pending = []     # submissions waiting for the next batch write
+        self._server = None
+        self._store_task = None
+        self._handlers = set()   # connection tasks, so close() can wait for them
+
+    async def start(self, host="0.0.0.0", port=PORT):
+        """Listen for agents; returns the port (useful with port=0)."""
+        if not self.key and host not in LOOPBACK:
+            raise ValueError(f"a --key is needed to listen on {host}; without one only loopback is allowed")
+        self._server = await asyncio.start_server(self._connection, host, port, limit=MAX_LINE, backlog=BACKLOG)
+        self._store_task = asyncio.create_task(self._store_loop())
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self._server.close()
+        for seat in list(self.seats.values()):
+            seat.writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+        self._store_task.cancel()
+        self._store_pending()
+
+    # ---------- Seats ----------
+    async def _connection(self, reader, writer):
+        self._handlers.add(asyncio.current_task())
+        try:
+            await self._serve_seat(reader, writer)
+        finally:
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+    async def _serve_seat(self, reader, writer):
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)   # notice seats that were switched off
+        try:
+            hello = await asyncio.wait_for(read_message(reader), HELLO_TIMEOUT)
+        except (asyncio.TimeoutError, ProtocolError):
+            hello = None
+        if hello is None or hello["type"] != "hello" or not isinstance(hello.get("seat"), str) \
+                or not hmac.compare_digest(str(hello.get("key") or ""), str(self.key or "")):
+            return
+        seat = Seat(hello["seat"], hello.get("student"), writer)
+        old = self.seats.get(seat.name)
+        if old is not None:
+            old.writer.close()   # the agent reconnected before we noticed it had gone
+        self.seats[seat.name] = seat
+        self.on_event(f"{seat.name} joined ({seat.student})")
+        try:
+            while True:
+                try:
+                    message = await read_message(reader)
+                except ProtocolError as e:
+                    seat.last_error = str(e)
+                    continue
+                if message is None:
+                    break
+                self._handle(seat, message)
+        finally:
+            if self.seats.get(seat.name) is seat:
+                del self.seats[seat.name]
+                self.on_event(f"{seat.name} left")
+
+    def _handle(self, seat, message):
+        kind = message["type"]
+        if kind == "answer":
+            seat.answers.setdefault(message.get("test"), {})[message.get("q")] = message.get("a")
+        elif kind == "have":
+            seat.tests.add(message.get("test"))
+        elif kind == "status":
+            if message.get("running"):
+                seat.running[message.get("mode")] = message.get("test")
+            else:
+                seat.running.pop(message.get("mode"), None)
+        elif kind == "submitted":
+            record = message.get("record")
+            problem = self._check_submission(seat, record)
+            if problem is not None:
+                seat.last_error = f"submission rejected: {problem}"
+                self.on_event(f"{seat.name}: {seat.last_error}")
+                return
+            seat.submitted.add(record["test"])
+            self._pending.append(record)
+            self.on_event(f"{seat.name} submitted {record['test']}")
+        elif kind == "error":
+            seat.last_error = message.get("message")
+            self.on_event(f"{seat.name}: {seat.last_error}")
+
+    def _check_submission(self, seat, record):
+        """Why a submission from ``seat`` cannot be stored, or None if it is fine."""
+        problem = grading.check_submission(record)
+        if problem is not None:
+            return problem
+        if record["test"] not in self.bank.tests:
+            return f"unknown test {record['test']!r}"
+        if record["student"] != seat.student:
+            return f"student {record['student']!r} is not the one at this seat ({seat.student!r})"
+        return None
+
+    # ---------- Sending ----------
+    async def broadcast(self, message, seats=None):
+        """Send ``message`` to every seat (or to ``seats``); returns how many got it."""
+        data = encode(message)
+        targets = list(self.seats.values()) if seats is None else list(seats)
+        for seat in targets:
+            seat.writer.write(data)
+        results = await asyncio.gather(*(asyncio.wait_for(seat.writer.drain(), SEND_TIMEOUT) for seat in targets),
+                                       return_exceptions=True)
+        delivered = 0
+        for seat, result in zip(targets, results):
+            if isinstance(result, BaseException):
+                self.on_event(f"{seat.name}: not responding, disconnected")
+                seat.writer.close()
+            else:
+                delivered += 1
+        return delivered
+
+    async def send_test(self, name):
+        test = self.bank.get(name)   # only tests that pass validation are sent
+        return await self.broadcast({"type": "test", "name": test.name, "data": dump_test(test)})
+
+    async def start_mode(self, mode, test=None):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        if mode == "test":
+            await self.send_test(test)
+        return await self.broadcast({"type": "start", "mode": mode, "test": test})
+
+    async def stop_mode(self, mode):
+        return await self.broadcast({"type": "stop", "mode": mode})
+
+    async def extend(self, mode, seconds):
+        return await self.broadcast({"type": "extend", "mode": mode, "seconds": seconds})
+
+    # ---------- Results ----------
+    async def _store_loop(self):
+        while True:
+            await asyncio.sleep(STORE_INTERVAL)
+            self._store_pending()
+
+    def _store_pending(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        pairs = []
+        for record in batch:
+            # One bad record must not stop the loop that stores everyone else's
+            try:
+                grading.save_submission(record, self.submission_folder)
+            except (OSError, ValueError, OverflowError) as e:
+                self.on_event(f"could not save {record['student']}'s {record['test']}: {e}")
+                continue
+            if record["test"] in self.bank.tests:
+                pairs.append((record, [q.correct for q in self.bank.tests[record["test"]].questions]))
+        if pairs:
+            store = ResultStore(self.results_db)
+            try:
+                store.add_many(pairs)
+            except sqlite3.Error as e:
+                self.on_event(f"could not record results in {self.results_db}: {e}")   # the files are saved
+            finally:
+                store.close()
+        self.stored += len(batch)
+
+    def progress(self, test):
+        """(seat, answered, questions, submitted) for every connected seat."""
+        total = len(self.bank.tests[test].questions) if test in self.bank.tests else None
+        return [(seat.name, len(seat.answers.get(test, {})), total, test in seat.submitted)
+                for seat in sorted(self.seats.values(), key=lambda s: s.name)]
+
+
+# ---------- Teacher prompt ----------
+async def prompt(console):
+    loop = asyncio.get_running_loop()
+    current_test = None
+    print(HELP)
+    while True:
+        try:
+            line = await loop.run_in_executor(None, input, "lab> ")
+        except EOFError:
+            return
+        words = line.split()
+        if not words:
+            continue
+        command, args = words[0], words[1:]
+        try:
+            if command == "quit":
+                return
+            elif command == "seats":
+                for seat in sorted(console.seats.values(), key=lambda s: s.name):
+                    running = ", ".join(f"{m} {t or ''}".strip() for m, t in seat.running.items()) or "idle"
+                    print(f"{seat.name:<20}{seat.student or '':<30}{running}")
+                print(f"{len(console.seats)} seat(s)")
+            elif command == "send" and len(args) == 1:
+                print(f"sent to {await console.send_test(args[0])} seat(s)")
+            elif command == "start" and args:
+                test = args[1] if len(args) > 1 else None
+                if args[0] == "test":
+                    current_test = test
+                print(f"started on {await console.start_mode(args[0], test)} seat(s)")
+            elif command == "stop" and len(args) == 1:
+                print(f"stopped on {await console.stop_mode(args[0])} seat(s)")
+            elif command == "extend" and len(args) == 2:
+                print(f"extended on {await console.extend(args[0], float(args[1]) * 60)} seat(s)")
+            elif command == "progress":
+                test = args[0] if args else current_test
+                for name, answered, total, submitted in console.progress(test):
+                    print(f"{name:<20}{answered:>4}/{total or '?'}{'  submitted' if submitted else ''}")
+            else:
+                print(HELP)
+        except (KeyError, ValueError, OSError) as e:
+            print(f"error: {e}")
+
+
+async def serve(host, port, key, test_folder):
+    bank = QuestionBank(test_folder, ["simulated_test.json"])
+    bank.scan()
+    console = LabConsole(bank, key)
+    port = await console.start(host, port)
+    print(f"listening on {host}:{port}, {len(bank.names)} test(s) in {test_folder}")
+    try:
+        await prompt(console)
+    finally:
+        await console.close()
+
+
+# ---------- Benchmark ----------
+async def _wait_for(condition, timeout=120):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("simulated seats did not finish in time")
+        await asyncio.sleep(0.005)
+
+
+async def _bench(agents, questions):
+    import random
+    import tempfile
+    from lab_agent import LabAgent
+    from question_bank import parse_test
+
+    class SimulatedAgent(LabAgent):
+        # Keeps tests in memory and answers at once instead of launching test.py
+        def __init__(self, *args, **kw):
+            super().__init__(*args, **kw)
+            self.tests = {}
+
+        def save_test(self, name, data):
+            self.tests[name] = parse_test(data, name)
+
+        async def launch(self, mode, test=None):
+            if mode == "test":
+                asyncio.create_task(self._sit(self.tests[test]))
+
+        async def _sit(self, test):
+            rng = random.Random(self.seat)
+            answers = [rng.randrange(len(q.options)) for q in test.questions]
+            for q, a in enumerate(answers):
+                await self.send({"type": "answer", "test": test.name, "q": q, "a": a, "elapsed": q * 10.0})
+            await self.send({"type": "submitted", "record": {"student": self.student, "test": test.name,
+                                                             "answers": answers, "submitted": time.time(),
+                                                             "elapsed": len(answers) * 10.0}})
+
+    with tempfile.TemporaryDirectory() as folder:
+        tests = os.path.join(folder, "tests")
+        os.makedirs(tests)
+        with open(os.path.join(tests, "bench.json"), "w") as f:
+            json.dump({"questions": [{"question": f"Question {i}?", "options": ["A", "B", "C", "D"],
+                                      "correct": "A"} for i in range(questions)]}, f)
+        bank = QuestionBank(tests)
+        bank.scan()
+        console = LabConsole(bank, key="bench", submission_folder=os.path.join(folder, "submissions"),
+                             results_db=os.path.join(folder, RESULTS_DB), on_event=None)
+        port = await console.start("127.0.0.1", 0)
+        cpu0 = time.process_time()
+
+        start = time.perf_counter()
+        seats = [SimulatedAgent("127.0.0.1", port, key="bench", seat=f"seat{i:04d}", student=f"student{i:04d}")
+                 for i in range(agents)]
+        tasks = [asyncio.create_task(seat.run()) for seat in seats]
+        await _wait_for(lambda: len(console.seats) == agents)
+        connect_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await console.send_test("bench.json")
+        await _wait_for(lambda: all("bench.json" in s.tests for s in console.seats.values()))
+        send_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await console.broadcast({"type": "start", "mode": "test", "test": "bench.json"})
+        await _wait_for(lambda: console.stored == agents)
+        exam_s = time.perf_counter() - start
+        cpu = time.process_time() - cpu0
+
+        answers = sum(len(s.answers.get("bench.json", {})) for s in console.seats.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await console.close()
+        store = ResultStore(os.path.join(folder, RESULTS_DB))
+        summary = store.test_summary("bench.json")
+        store.close()
+        files = len(os.listdir(os.path.join(folder, "submissions")))
+
+    print(f"{agents} simulated seats on loopback, {questions}-question test, one event loop "
+          f"(seats and console share this process)")
+    print(f"all seats connected:              {connect_s * 1000:8.0f} ms")
+    print(f"test delivered to every seat:     {send_s * 1000:8.0f} ms")
+    print(f"start -> all answers + stored:    {exam_s * 1000:8.0f} ms  "
+          f"({answers} answers, {answers / exam_s:.0f} answers/s)")
+    print(f"stored: {files} submission files, {summary.attempts} results in results.db")
+    print(f"CPU used by the whole run:        {cpu:8.2f} s")
+
+
+def bench(agents=500, questions=40):
+    asyncio.run(_bench(agents, questions))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Control every seat in the lab")
+    sub = parser.add_subparsers(dest="command", required=True)
+    s = sub.add_parser("serve")
+    s.add_argument("--host", default="0.0.0.0")
+    s.add_argument("--port", type=int, default=PORT)
+    s.add_argument("--key", default=os.environ.get("EDULITE_LAB_KEY"))
+    s.add_argument("--tests", default=TEST_FOLDER)
+    b = sub.add_parser("bench")
+    b.add_argument("--agents", type=int, default=500)
+    b.add_argument("--questions", type=int, default=40)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(args.host, args.port, args.key, args.tests))
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        bench(args.agents, args.questions)
+
+
+if __name__ == "__main__":
+    main()
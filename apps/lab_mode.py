@@ -1,43 +1,45 @@
 import customtkinter as ctk
-import time
-import threading
-import os
 import hashlib
+import os
 from tkinter import messagebox
+from audit_log import AuditLog
+from exam_scheduler import WARN_AT, ExamScheduler
+from lab_protocol import extend_seconds, remote_controlled, watch_stdin
+from process_monitor import ProcessMonitor
 
 # Simulated state variables
 lab_mode_active = False
-end_time = 0
-monitoring_running = False
-LOG_FILE = "lab_mode_simulation.log"  # Temporary log file for simulation
+monitor = None
+LOG_FILE = "lab_mode_simulation.log"  # JSONL audit log, rotated at 1 MB and kept across runs
+audit = AuditLog(LOG_FILE, "lab_mode")  # writes on a background thread
+DEADLINE_FILE = "lab_mode_deadline.json"  # time left, so a restart continues the countdown
 
 # Simulated configuration
 CONFIG = {
     "password": hashlib.sha256("labpass".encode()).hexdigest(),  # Default password: "labpass"
     "restrictions": {
-        "apps": ["notepad.exe", "python.exe"],  # Simulated allowed apps
+        "apps": ["gedit", "gnome-text-editor", "python3"],  # Simulated allowed apps (Linux names)
         "time_limit": 120  # 2 minutes in seconds for testing
     }
 }
 
-# Log simulation actions
-def log_action(message):
-    with open(LOG_FILE, "a") as f:
-        f.write(f"[{time.ctime()}] {message}\n")
+# Log simulation actions (queued for the audit log, echoed to the console)
+def log_action(message, **fields):
+    audit.log(message, **fields)
     print(f"SIMULATION: {message}")
 
 # Simulated restriction application
-def apply_restrictions():
-    global end_time
+def apply_restrictions(resume=False):
     log_action("Applying restrictions...")
     log_action("Simulating: Blocking internet (iptables rules)")
     log_action("Simulating: Disabling USB storage (modprobe -r usb-storage)")
     log_action("Simulating: Restricting file system (chmod 700 lab_dir)")
     start_process_monitor()
-    if CONFIG["restrictions"]["time_limit"] > 0:
-        end_time = time.time() + CONFIG["restrictions"]["time_limit"]
-        threading.Timer(CONFIG["restrictions"]["time_limit"], lambda: root.after(0, auto_deactivate)).start()
-        update_timer()
+    if resume:
+        scheduler.restore("lab", auto_deactivate, on_tick=update_timer, on_warning=warn_time_low)
+    elif CONFIG["restrictions"]["time_limit"] > 0:
+        scheduler.add("lab", CONFIG["restrictions"]["time_limit"], auto_deactivate,
+                      on_tick=update_timer, on_warning=warn_time_low)
 
 # Simulated restriction removal
 def revert_restrictions():
@@ -46,22 +48,27 @@ def revert_restrictions():
     log_action("Simulating: Enabling USB storage (modprobe usb-storage)")
     log_action("Simulating: Restoring file system (chmod 755 home_dir)")
     stop_process_monitor()
+    scheduler.cancel("lab")
 
-# Simulated process monitoring
-def process_monitor():
-    while monitoring_running:
-        log_action("Monitoring processes... (Allowed: " + ", ".join(CONFIG["restrictions"]["apps"]) + ")")
-        log_action("Simulating: Terminating unauthorized process 'chrome.exe'")
-        time.sleep(5)
+# Process monitoring: reacts to each newly started program (no actual process killing)
+def on_unauthorized_process(info):
+    log_action(f"Simulating: Terminating unauthorized process '{info.name}' (pid {info.pid})",
+               pid=info.pid, program=info.name, exe=info.exe)
 
 def start_process_monitor():
-    global monitoring_running
-    monitoring_running = True
-    threading.Thread(target=process_monitor, daemon=True).start()
+    global monitor
+    stop_process_monitor()
+    # on_violation runs on the monitor thread; hand the event to the Tk loop
+    # Only the student's own programs; system services starting meanwhile are not violations
+    monitor = ProcessMonitor(CONFIG["restrictions"]["apps"],
+                             lambda info: root.after(0, on_unauthorized_process, info), uid=os.getuid()).start()
+    log_action(f"Monitoring processes via {monitor.mode}... (Allowed: " + ", ".join(CONFIG["restrictions"]["apps"]) + ")")
 
 def stop_process_monitor():
-    global monitoring_running
-    monitoring_running = False
+    global monitor
+    if monitor is not None:
+        monitor.stop()
+        monitor = None
 
 # Toggle Lab Mode
 def toggle_lab_mode():
@@ -110,16 +117,48 @@ def update_ui():
         action_button.configure(text="Activate Lab Mode", fg_color="#E95420", hover_color="#CF4B1E")
         timer_label.configure(text="")
 
-# Update timer display
-def update_timer():
-    if lab_mode_active and end_time > 0:
-        remaining = end_time - time.time()
-        if remaining > 0:
-            mins, secs = divmod(int(remaining), 60)
-            timer_label.configure(text=f"Time remaining: {mins:02d}:{secs:02d}")
-            root.after(1000, update_timer)
-        else:
-            timer_label.configure(text="")
+# Update timer display (called by the scheduler each second)
+def update_timer(seconds):
+    mins, secs = divmod(seconds, 60)
+    timer_label.configure(text=f"Time remaining: {mins:02d}:{secs:02d}" if seconds > 0 else "",
+                          text_color="#FF5555" if seconds <= WARN_AT[0] else "#333333")
+
+def warn_time_low(seconds):
+    log_action(f"{seconds / 60:.0f} minutes left")
+
+# A session cut short by a crash or power cut continues with the time it had left
+def resume_after_restart():
+    global lab_mode_active
+    if "lab" in scheduler.saved():
+        log_action("Resuming Lab Mode after restart...")
+        apply_restrictions(resume=True)
+        lab_mode_active = True
+        update_ui()
+
+# Started from the teacher console (lab_agent.py): activate at once, then obey "stop" and "extend <seconds>"
+def start_remotely():
+    global lab_mode_active
+    if not lab_mode_active:   # resume_after_restart() may have picked the session up already
+        log_action("Started from the teacher console")
+        apply_restrictions()
+        lab_mode_active = True
+        update_ui()
+
+def on_remote_command(words):
+    global lab_mode_active
+    if words[0] == "stop":
+        if lab_mode_active:
+            log_action("Stopped from the teacher console")
+            revert_restrictions()
+            lab_mode_active = False
+        root.destroy()
+    elif words[0] == "extend" and scheduler.remaining("lab") is not None:
+        seconds = extend_seconds(words)
+        if seconds is None:
+            log_action(f"Ignored bad command from the teacher console: {' '.join(words)}")
+            return
+        scheduler.extend("lab", seconds)
+        log_action(f"{seconds:g} s extra time from the teacher console")
 
 # Handle window close
 def on_closing():
@@ -140,6 +179,7 @@ root = ctk.CTk()
 root.title("Lab Mode Control (Simulation)")
 root.geometry("400x300")
 root.resizable(False, False)
+scheduler = ExamScheduler(root, DEADLINE_FILE)  # countdown on time.monotonic()
 
 # Custom styling
 root.configure(fg_color="#F0F0F0")  # Ubuntu light gray background
@@ -217,13 +257,14 @@ info_label.pack(pady=5)
 
 # Set initial state
 update_ui()
+resume_after_restart()
+if remote_controlled():
+    watch_stdin(root, on_remote_command)
+    start_remotely()
 
 # Bind close event
 root.protocol("WM_DELETE_WINDOW", on_closing)
 
-# Clear log file at start
-if os.path.exists(LOG_FILE):
-    os.remove(LOG_FILE)
-
 # Run GUI loop
-root.mainloop()
\ No newline at end of file
+root.mainloop()
+audit.close()
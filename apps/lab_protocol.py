@@ -0,0 +1,93 @@
+"""Wire format shared by lab_console.py (teacher PC) and lab_agent.py (each seat).
+
+One JSON object per line over TCP, UTF-8, ``"type"`` saying what it is:
+
+    agent -> console
+        {"type": "hello", "seat": "lab-pc-07", "student": "asha@lab-pc-07", "key": "..."}
+        {"type": "have", "test": "test3.json"}                      test saved on the seat
+        {"type": "status", "mode": "test", "running": true, "test": "test3.json"}
+        {"type": "answer", "test": "test3.json", "q": 2, "a": 1, "elapsed": 41.2}
+        {"type": "submitted", "record": {grading.py submission}}
+        {"type": "error", "message": "..."}
+    console -> agent
+        {"type": "test", "name": "test3.json", "data": {test file contents}}
+        {"type": "start", "mode": "test" | "exam" | "lab", "test": "test3.json"}
+        {"type": "stop", "mode": "test" | "exam" | "lab"}
+        {"type": "extend", "mode": "test" | "exam" | "lab", "seconds": 300}
+
+The agent passes "stop" and "extend" on to the app it started as lines on
+the app's stdin; ``watch_stdin`` delivers them to the app's Tk loop.
+"""
+import json
+import math
+import os
+import sys
+
+PORT = 5757
+MAX_LINE = 1 << 22   # a whole test file travels in one line
+MODES = ("test", "exam", "lab")
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def encode(message):
+    return (json.dumps(message, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+
+
+async def read_message(reader):
+    """Next message from an asyncio StreamReader, or None once the peer has gone."""
+    try:
+        line = await reader.readline()
+    except ValueError:   # longer than the reader's limit
+        raise ProtocolError(f"line longer than {MAX_LINE} bytes") from None
+    except ConnectionError:
+        return None
+    if not line:
+        return None
+    try:
+        message = json.loads(line)
+    except ValueError:
+        raise ProtocolError(f"not JSON: {line[:80]!r}") from None
+    if not isinstance(message, dict) or not isinstance(message.get("type"), str):
+        raise ProtocolError("expected an object with a 'type'")
+    return message
+
+
+# ---------- Remote control of the Tk apps ----------
+def remote_controlled():
+    """True when this app was started by lab_agent.py."""
+    return os.environ.get("EDULITE_REMOTE") == "1"
+
+
+def extend_seconds(words):
+    """Seconds asked for by an ``extend <seconds>`` command, or None if it is malformed."""
+    if len(words) != 2:
+        return None
+    try:
+        seconds = float(words[1])
+    except ValueError:
+        return None
+    return seconds if math.isfinite(seconds) and seconds > 0 else None
+
+
+def watch_stdin(root, on_command):
+    """Call ``on_command(words)`` on the Tk thread for each line lab_agent.py writes to stdin."""
+    import tkinter
+    fd = sys.stdin.fileno()
+    pending = b""
+
+    def readable(file, mask):
+        nonlocal pending
+        data = os.read(fd, 4096)
+        if not data:   # the agent went away; keep running as a normal window
+            root.tk.deletefilehandler(fd)
+            return
+        *lines, pending = (pending + data).split(b"\n")
+        for line in lines:
+            words = line.decode("utf-8", "replace").split()
+            if words:
+                on_command(words)
+
+    root.tk.createfilehandler(fd, tkinter.READABLE, readable)
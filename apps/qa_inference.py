@@ -0,0 +1,221 @@
+"""int8 inference for the fine-tuned DistilBERT Q&A model.
+
+    python qa_inference.py export               # TorchScript + dynamic int8 quantization
+    python qa_inference.py export --onnx        # ONNX Runtime int8 instead
+    python qa_inference.py compare              # latency / memory / agreement vs. fp32
+
+``ask_question(question)`` keeps the signature used in todo.py and answers
+from the quantized model when it has been exported, else from the fp32
+checkpoint. Inputs are not padded to 128 tokens; a single question only
+needs its own length.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+MODEL_DIR = "fine_tuned_distilbert"
+INT8_DIR = "fine_tuned_distilbert_int8"
+TORCHSCRIPT_FILE = "model_int8.pt"
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+# What a training run rewrites; the checkpoint folder's own mtime only changes when files are added
+CHECKPOINT_FILES = ("model.safetensors", "pytorch_model.bin", "config.json")
+MAX_LENGTH = 128
+NO_ANSWER = "I don’t know that yet."
+
+
+# ---------- Export ----------
+def _example_inputs(tokenizer):
+    enc = tokenizer("What is a neural network?", return_tensors="pt")
+    return enc["input_ids"], enc["attention_mask"]
+
+
+def export_torchscript(model_dir=MODEL_DIR, out_dir=INT8_DIR):
+    import torch
+    from transformers import DistilBertForQuestionAnswering, DistilBertTokenizer
+
+    tokenizer = DistilBertTokenizer.from_pretrained(model_dir)
+    model = DistilBertForQuestionAnswering.from_pretrained(model_dir, torchscript=True).eval()
+    quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    with torch.inference_mode():
+        traced = torch.jit.trace(quantized, _example_inputs(tokenizer), strict=False)
+    os.makedirs(out_dir, exist_ok=True)
+    tmp = os.path.join(out_dir, TORCHSCRIPT_FILE + ".tmp")
+    torch.jit.save(traced, tmp)
+    os.replace(tmp, os.path.join(out_dir, TORCHSCRIPT_FILE))
+    tokenizer.save_pretrained(out_dir)
+    return os.path.join(out_dir, TORCHSCRIPT_FILE)
+
+
+def export_onnx(model_dir=MODEL_DIR, out_dir=INT8_DIR):
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import DistilBertForQuestionAnswering, DistilBertTokenizer
+
+    tokenizer = DistilBertTokenizer.from_pretrained(model_dir)
+    model = DistilBertForQuestionAnswering.from_pretrained(model_dir, torchscript=True).eval()
+    os.makedirs(out_dir, exist_ok=True)
+    fp32_path = os.path.join(out_dir, ONNX_FILE)
+    axes = {0: "batch", 1: "sequence"}
+    torch.onnx.export(model, _example_inputs(tokenizer), fp32_path,
+                      input_names=["input_ids", "attention_mask"], output_names=["start_logits", "end_logits"],
+                      dynamic_axes={"input_ids": axes, "attention_mask": axes, "start_logits": axes, "end_logits": axes},
+                      opset_version=14)
+    int8_path = os.path.join(out_dir, ONNX_INT8_FILE)
+    quantize_dynamic(fp32_path, int8_path + ".tmp", weight_type=QuantType.QInt8)
+    os.replace(int8_path + ".tmp", int8_path)
+    os.remove(fp32_path)
+    tokenizer.save_pretrained(out_dir)
+    return int8_path
+
+
+def checkpoint_time(model_dir=MODEL_DIR):
+    """mtime of the newest weights/config file in ``model_dir``, 0 if there are none."""
+    times = [os.path.getmtime(os.path.join(model_dir, name)) for name in CHECKPOINT_FILES
+             if os.path.exists(os.path.join(model_dir, name))]
+    return max(times, default=0)
+
+
+# ---------- Inference ----------
+class QAModel:
+    """Tokenizer + model loaded once and reused for every question.
+
+    backend is "onnx", "torchscript" (both int8) or "fp32"; "auto" picks the
+    first one that has been exported.
+    """
+
+    def __init__(self, backend="auto", model_dir=MODEL_DIR, int8_dir=INT8_DIR):
+        from transformers import DistilBertTokenizer
+
+        if backend == "auto":
+            backend = "fp32"
+            # An export older than the checkpoint is from a previous training run
+            trained_at = checkpoint_time(model_dir)
+            for name, filename in (("onnx", ONNX_INT8_FILE), ("torchscript", TORCHSCRIPT_FILE)):
+                path = os.path.join(int8_dir, filename)
+                if os.path.exists(path) and os.path.getmtime(path) >= trained_at:
+                    backend = name
+                    break
+        self.backend = backend
+        self.tokenizer = DistilBertTokenizer.from_pretrained(model_dir if backend == "fp32" else int8_dir)
+
+        if backend == "onnx":
+            import onnxruntime as ort
+            self._session = ort.InferenceSession(os.path.join(int8_dir, ONNX_INT8_FILE),
+                                                 providers=["CPUExecutionProvider"])
+        elif backend == "torchscript":
+            import torch
+            self._model = torch.jit.load(os.path.join(int8_dir, TORCHSCRIPT_FILE)).eval()
+        else:
+            from transformers import DistilBertForQuestionAnswering
+            self._model = DistilBertForQuestionAnswering.from_pretrained(model_dir, torchscript=True).eval()
+
+    def _logits(self, input_ids, attention_mask):
+        if self.backend == "onnx":
+            start, end = self._session.run(
+                ["start_logits", "end_logits"],
+                {"input_ids": input_ids.numpy(), "attention_mask": attention_mask.numpy()})
+            return int(start[0].argmax()), int(end[0].argmax())
+        import torch
+        with torch.inference_mode():
+            start, end = self._model(input_ids, attention_mask)[:2]
+        return int(start[0].argmax()), int(end[0].argmax())
+
+    def ask_question(self, question):
+        inputs = self.tokenizer(question, return_tensors="pt", truncation=True, max_length=MAX_LENGTH)
+        start_idx, end_idx = self._logits(inputs["input_ids"], inputs["attention_mask"])
+        answer_ids = inputs["input_ids"][0][start_idx:end_idx + 1]
+        answer = self.tokenizer.decode(answer_ids, skip_special_tokens=True)
+        return answer if answer else NO_ANSWER
+
+
+_default = None
+
+
+def ask_question(question):
+    global _default
+    if _default is None:
+        _default = QAModel()
+    return _default.ask_question(question)
+
+
+# ---------- Comparison ----------
+def _questions():
+    import qa_sources
+    return [p["question"] for p in qa_sources.load_sources(["coding_facts.csv", "general_facts.csv"])]
+
+
+def _dir_size_mb(paths):
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p)) / 2**20
+
+
+def _run_backend(backend):
+    # Runs in its own interpreter so peak RSS belongs to this backend alone
+    import json
+    import resource
+    questions = _questions()
+    start = time.perf_counter()
+    model = QAModel(backend)
+    load_s = time.perf_counter() - start
+    answers, latencies = [], []
+    for q in questions:
+        start = time.perf_counter()
+        answers.append(model.ask_question(q))
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(json.dumps({
+        "load_s": load_s,
+        "mean_ms": sum(latencies) / len(latencies),
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "answers": answers,
+    }))
+
+
+def compare(backends):
+    import json
+    results = {}
+    for backend in ["fp32"] + [b for b in backends if b != "fp32"]:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "_run", backend],
+                             capture_output=True, text=True, check=True).stdout
+        results[backend] = json.loads(out.strip().splitlines()[-1])
+    sizes = {
+        "fp32": _dir_size_mb([os.path.join(MODEL_DIR, f) for f in ("model.safetensors", "pytorch_model.bin")]),
+        "torchscript": _dir_size_mb([os.path.join(INT8_DIR, TORCHSCRIPT_FILE)]),
+        "onnx": _dir_size_mb([os.path.join(INT8_DIR, ONNX_INT8_FILE)]),
+    }
+    reference = results["fp32"]["answers"]
+    print(f"{len(reference)} CSV questions; agreement = same answer span as fp32")
+    print(f"{'backend':<13}{'model MB':>9}{'load s':>8}{'mean ms':>9}{'p95 ms':>8}{'peak RSS MB':>13}{'agreement':>11}")
+    for backend, r in results.items():
+        agree = sum(a == b for a, b in zip(r["answers"], reference)) / len(reference)
+        print(f"{backend:<13}{sizes[backend]:>9.1f}{r['load_s']:>8.2f}{r['mean_ms']:>9.1f}{r['p95_ms']:>8.1f}"
+              f"{r['peak_rss_mb']:>13.0f}{agree:>11.1%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export and compare int8 DistilBERT Q&A models")
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help=f"quantize {MODEL_DIR} into {INT8_DIR}")
+    exp.add_argument("--onnx", action="store_true", help="export for ONNX Runtime instead of TorchScript")
+    cmp_ = sub.add_parser("compare", help="latency, memory and agreement of every exported backend vs fp32")
+    cmp_.add_argument("backends", nargs="*", default=["torchscript", "onnx"])
+    run = sub.add_parser("_run")
+    run.add_argument("backend")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        path = export_onnx() if args.onnx else export_torchscript()
+        print(f"wrote {path}")
+    elif args.command == "compare":
+        available = [b for b, f in (("torchscript", TORCHSCRIPT_FILE), ("onnx", ONNX_INT8_FILE))
+                     if b in args.backends and os.path.exists(os.path.join(INT8_DIR, f))]
+        compare(available)
+    else:
+        _run_backend(args.backend)
+
+
+if __name__ == "__main__":
+    main()
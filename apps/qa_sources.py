@@ -0,0 +1,49 @@
+import csv
+import os
+import xml.etree.ElementTree as ET
+
+# Everything the chatbots learn from, in the order rows end up in the index
+DEFAULT_SOURCES = ["kids_facts.csv", "coding_facts.csv", "general_facts.csv", "math.aiml"]
+
+
+def load_csv_pairs(path):
+    with open(path, "r", newline="") as f:
+        return [{"question": row["question"], "answer": row["answer"]} for row in csv.DictReader(f)]
+
+
+def iter_aiml_pairs(path):
+    """Yield {"question", "answer"} for every <category> in an AIML file.
+
+    Uses iterparse and clears each category once read, so memory stays flat
+    however large the file is; nested template markup (<star/>, <srai>, ...)
+    is flattened to its text.
+    """
+    for _, elem in ET.iterparse(path, events=("end",)):
+        if elem.tag != "category":
+            continue
+        pattern = elem.find("pattern")
+        template = elem.find("template")
+        if pattern is not None and template is not None:
+            question = " ".join("".join(pattern.itertext()).split())
+            answer = " ".join("".join(template.itertext()).split())
+            if question and answer:
+                yield {"question": question, "answer": answer}
+        elem.clear()
+
+
+def load_pairs(path):
+    if path.endswith(".aiml"):
+        return list(iter_aiml_pairs(path))
+    return load_csv_pairs(path)
+
+
+def load_sources(paths=DEFAULT_SOURCES, skip_missing=True):
+    pairs = []
+    for path in paths:
+        if not os.path.exists(path):
+            if skip_missing:
+                print(f"[sources] skipping missing {path}")
+                continue
+            raise FileNotFoundError(path)
+        pairs.extend(load_pairs(path))
+    return pairs
@@ -0,0 +1,283 @@
+"""Scan, validate and cache every test file for test.py.
+
+Two schemas are in use and both load into the same shape:
+
+    test_jsons/*.json     {"question": str, "options": [...], "correct": "<option text>"}
+    simulated_test.json   {"text": str, "options": [...], "correct": <option index>}, "duration": seconds
+
+Each test becomes a ``Test`` of ``Question(text, options, correct)`` tuples
+with ``correct`` as an option index and repeated strings interned. Files are
+parsed once and kept until their mtime or size changes, so rescanning a
+folder of hundreds of tests only costs one stat() per file. Exam packages
+(``*.eqp``, see question_store.py) in the folder add their tests too; a
+loose JSON file wins over a packaged test of the same name.
+
+    python question_bank.py check [folder]           # validate every test, list problems
+    python question_bank.py bench [--tests N]        # cold vs. warm scan of a synthetic folder
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+TEST_FOLDER = "test_jsons"
+PACKAGE_EXT = ".eqp"
+PAGE_SIZE = 10
+
+Question = namedtuple("Question", "text options correct")
+Test = namedtuple("Test", "name questions duration")
+
+
+class QuestionBankError(ValueError):
+    pass
+
+
+def _natural_key(name):
+    # test2.json before test10.json
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+
+def normalize_question(raw, number):
+    if not isinstance(raw, dict):
+        raise QuestionBankError(f"question {number}: expected an object")
+    text = raw.get("question", raw.get("text"))
+    if not isinstance(text, str) or not text.strip():
+        raise QuestionBankError(f"question {number}: missing 'question' or 'text'")
+    options = raw.get("options")
+    if not isinstance(options, list) or len(options) < 2 or not all(isinstance(o, str) for o in options):
+        raise QuestionBankError(f"question {number}: 'options' must be a list of at least two strings")
+    correct = raw.get("correct")
+    if isinstance(correct, bool):
+        correct = None
+    if isinstance(correct, str):
+        if correct not in options:
+            raise QuestionBankError(f"question {number}: correct answer {correct!r} is not one of the options")
+        correct = options.index(correct)
+    elif not isinstance(correct, int) or not 0 <= correct < len(options):
+        raise QuestionBankError(f"question {number}: 'correct' must be an option or an option index")
+    # The same options ("True", "Mars", ...) recur across tests; keep one copy of each
+    return Question(sys.intern(text.strip()), tuple(sys.intern(o) for o in options), correct)
+
+
+def parse_test(data, name):
+    if not isinstance(data, dict) or not isinstance(data.get("questions"), list) or not data["questions"]:
+        raise QuestionBankError("expected {\"questions\": [...]} with at least one question")
+    duration = data.get("duration")
+    if duration is not None and (isinstance(duration, bool) or not isinstance(duration, (int, float))
+                                 or duration <= 0):
+        raise QuestionBankError("'duration' must be a positive number of seconds")
+    questions = tuple(normalize_question(q, i) for i, q in enumerate(data["questions"], 1))
+    return Test(name, questions, duration)
+
+
+def dump_test(test):
+    """``test`` as JSON data in the simulated_test.json schema (correct as an index)."""
+    data = {"questions": [{"text": q.text, "options": list(q.options), "correct": q.correct}
+                          for q in test.questions]}
+    if test.duration:
+        data["duration"] = test.duration
+    return data
+
+
+def load_test(path):
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except ValueError as e:
+            raise QuestionBankError(f"not valid JSON ({e})") from None
+    return parse_test(data, os.path.basename(path))
+
+
+class QuestionBank:
+    """Every valid test in ``folder`` (plus any ``extra_paths``), by file name.
+
+    ``scan()`` picks up added, edited and removed files; ``errors`` maps the
+    name of each file that failed validation to the reason.
+    """
+
+    def __init__(self, folder=TEST_FOLDER, extra_paths=()):
+        self.folder = folder
+        self.extra_paths = list(extra_paths)
+        self.tests = {}
+        self.errors = {}
+        self.names = []
+        self._stamps = {}   # name -> (path, mtime_ns, size) the cached entry was parsed from
+        self._packages = {}   # package file name -> ((path, mtime_ns, size), Package or None)
+        self._packed = {}     # name -> Test served from a package
+
+    def _candidates(self):
+        paths = {}
+        packages = {}
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".json") and entry.is_file():
+                        paths[entry.name] = entry.path
+                    elif entry.name.endswith(PACKAGE_EXT) and entry.is_file():
+                        packages[entry.name] = entry.path
+        except FileNotFoundError:
+            pass
+        for path in self.extra_paths:
+            if os.path.isfile(path):
+                paths.setdefault(os.path.basename(path), path)
+        return paths, packages
+
+    def scan(self):
+        seen, packages = self._candidates()
+        for name in list(self._stamps):
+            if name not in seen:
+                del self._stamps[name]
+                self.tests.pop(name, None)
+                self.errors.pop(name, None)
+        for name, path in seen.items():
+            self._refresh(name, path)
+        for name in list(self._packages):
+            if name not in packages:
+                del self._packages[name]
+                self.errors.pop(name, None)
+        for name, path in packages.items():
+            self._refresh_package(name, path)
+        self._merge_packed(seen)
+        self.names = sorted(self.tests, key=_natural_key)
+        return self.names
+
+    def _refresh_package(self, name, path):
+        # Only the package index is read here; questions are decoded when a test is used
+        from question_store import Package
+        st = os.stat(path)
+        stamp = (path, st.st_mtime_ns, st.st_size)
+        cached = self._packages.get(name)
+        if cached is not None and cached[0] == stamp:
+            return
+        try:
+            self._packages[name] = (stamp, Package(path))
+            self.errors.pop(name, None)
+        except (OSError, QuestionBankError) as e:
+            self._packages[name] = (stamp, None)
+            self.errors[name] = str(e)
+
+    def _merge_packed(self, loose):
+        # Loose JSON files win over packaged tests of the same name, earlier packages over later ones
+        packed = {}
+        for name in sorted(self._packages):
+            package = self._packages[name][1]
+            if package is not None:
+                for test_name, test in package.tests.items():
+                    if test_name not in loose:
+                        packed.setdefault(test_name, test)
+        for name in self._packed:
+            if name not in packed and name not in loose:
+                self.tests.pop(name, None)
+        self._packed = packed
+        self.tests.update(packed)
+
+    def _refresh(self, name, path):
+        st = os.stat(path)
+        stamp = (path, st.st_mtime_ns, st.st_size)
+        if self._stamps.get(name) == stamp:
+            return
+        self._stamps[name] = stamp
+        try:
+            self.tests[name] = load_test(path)
+            self.errors.pop(name, None)
+        except (OSError, QuestionBankError) as e:
+            self.tests.pop(name, None)
+            self.errors[name] = str(e)
+
+    def get(self, name):
+        """The parsed test, re-read first if the file changed since the last scan."""
+        if name in self._packed:
+            for package, ((path, _, _), _) in list(self._packages.items()):
+                try:
+                    self._refresh_package(package, path)
+                except OSError:
+                    pass   # deleted since the scan; its tests are still read from the open file
+            self._merge_packed(self._stamps)
+            if name in self._packed:
+                return self._packed[name]
+            raise KeyError(name)
+        path = self._stamps.get(name, (None,))[0]
+        if path is None:
+            raise KeyError(name)
+        try:
+            self._refresh(name, path)
+        except OSError:
+            pass   # deleted since the scan; keep serving the copy already loaded
+        if name not in self.tests:
+            raise QuestionBankError(f"{name}: {self.errors[name]}")
+        return self.tests[name]
+
+    def page_count(self, page_size=PAGE_SIZE):
+        return max(1, -(-len(self.names) // page_size))
+
+    def page(self, number, page_size=PAGE_SIZE):
+        """Names on page ``number`` (0-based), clamped to the last page."""
+        number = min(max(number, 0), self.page_count(page_size) - 1)
+        return self.names[number * page_size:(number + 1) * page_size]
+
+
+# ---------- Command line ----------
+def _write_synthetic(folder, tests, questions=40):
+    for t in range(tests):
+        data = {"questions": [
+            {"question": f"Question {q} of test {t}: which is {q % 4}?",
+             "options": ["0", "1", "2", "3"], "correct": str(q % 4)}
+            for q in range(questions)]}
+        with open(os.path.join(folder, f"test{t + 1}.json"), "w") as f:
+            json.dump(data, f)
+
+
+def bench(tests=500):
+    folder = tempfile.mkdtemp()
+    try:
+        _write_synthetic(folder, tests)
+        bank = QuestionBank(folder)
+        start = time.perf_counter()
+        bank.scan()
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        bank.scan()
+        warm = time.perf_counter() - start
+        start = time.perf_counter()
+        for name in bank.names:
+            bank.get(name)
+        get_ms = (time.perf_counter() - start) * 1000 / len(bank.names)
+        print(f"{len(bank.names)} tests x 40 questions")
+        print(f"cold scan (parse + validate): {cold * 1000:.1f} ms")
+        print(f"warm scan (stat only):        {warm * 1000:.1f} ms")
+        print(f"get() on a cached test:       {get_ms:.3f} ms")
+    finally:
+        shutil.rmtree(folder)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate and benchmark the test question bank")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("check", help="validate every test file")
+    check.add_argument("folder", nargs="?", default=TEST_FOLDER)
+    check.add_argument("extra", nargs="*", help="single test files outside the folder")
+    b = sub.add_parser("bench")
+    b.add_argument("--tests", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        bank = QuestionBank(args.folder, args.extra)
+        bank.scan()
+        for name in bank.names:
+            test = bank.tests[name]
+            duration = f", {test.duration} s" if test.duration else ""
+            print(f"ok    {name}: {len(test.questions)} questions{duration}")
+        for name, error in sorted(bank.errors.items()):
+            print(f"error {name}: {error}")
+        sys.exit(1 if bank.errors else 0)
+    else:
+        bench(args.tests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""Question store with every question kept once, and packed exam packages.
+
+The test files repeat the same questions ("Which organ pumps blood?", ...)
+across tests. ``QuestionStore`` keys each question by a hash of its content
+(text, options, correct option, after question_bank's normalization, so both
+test schemas dedupe against each other) and keeps a test as its duration
+plus a list of question ids.
+
+A store is written to one ``.eqp`` package for copying to lab machines:
+
+    header   "EDQP", version, block size, question count, index/refs lengths
+    index    zlib(JSON)            test names and durations, block offsets
+    refs     zlib(uint32 array)    question ids of every test, back to back
+    blocks   zlib(block) each      BLOCK_SIZE questions: option counts,
+                                   correct indexes, then the text and options
+                                   as NUL-separated UTF-8
+
+Opening a package reads only the header, index and refs. Questions are
+decoded a block at a time the first time one of them is used, so listing
+the tests, or opening one test, does not unpack the whole bank. Questions
+are stored in the order tests first use them, so a test's new questions
+sit together. QuestionBank loads ``*.eqp`` files found in test_jsons/ next
+to the loose JSON tests.
+
+    python question_store.py pack [test_jsons] [-o tests.eqp]   # dedupe a folder into a package
+    python question_store.py list tests.eqp
+    python question_store.py bench [--questions 50000]         # size and load time vs. JSON files
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+from collections.abc import Sequence
+
+from question_bank import PACKAGE_EXT, TEST_FOLDER, Question, QuestionBank, QuestionBankError, Test
+
+MAGIC = b"EDQP"
+VERSION = 1
+BLOCK_SIZE = 64     # small, so opening one test decodes little beyond its own questions
+HEADER = struct.Struct("<4sBxxxIIII")   # magic, version, block size, questions, index length, refs length
+BLOCK_HEADER = struct.Struct("<H")
+
+
+def question_hash(question):
+    h = hashlib.blake2b(digest_size=16)
+    for part in (question.text, *question.options):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    h.update(str(question.correct).encode())
+    return h.digest()
+
+
+class QuestionStore:
+    """Questions stored once by content hash; tests are lists of question ids."""
+
+    def __init__(self):
+        self.questions = []   # id -> Question
+        self.tests = {}       # name -> (ids, duration)
+        self._ids = {}        # content hash -> id
+
+    def add_question(self, question):
+        key = question_hash(question)
+        qid = self._ids.get(key)
+        if qid is None:
+            qid = self._ids[key] = len(self.questions)
+            self.questions.append(question)
+        return qid
+
+    def add_test(self, test):
+        self.tests[test.name] = (tuple(self.add_question(q) for q in test.questions), test.duration)
+
+    def add_bank(self, bank):
+        for name in bank.names:
+            self.add_test(bank.tests[name])
+
+    def test(self, name):
+        ids, duration = self.tests[name]
+        return Test(name, tuple(self.questions[i] for i in ids), duration)
+
+    def write(self, path, block_size=BLOCK_SIZE):
+        blocks = []
+        for start in range(0, len(self.questions), block_size):
+            blocks.append(zlib.compress(_encode_block(self.questions[start:start + block_size]), 9))
+        offsets, offset = [], 0
+        for block in blocks:
+            offsets.append([offset, len(block)])
+            offset += len(block)
+        refs = array("I")
+        entries = []
+        for name, (ids, duration) in self.tests.items():
+            entries.append([name, duration, len(ids)])
+            refs.extend(ids)
+        if sys.byteorder != "little":
+            refs.byteswap()
+        index = zlib.compress(json.dumps({"tests": entries, "blocks": offsets},
+                                         separators=(",", ":")).encode("utf-8"), 9)
+        refs = zlib.compress(refs.tobytes(), 9)
+        with open(path + ".tmp", "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, block_size, len(self.questions), len(index), len(refs)))
+            f.write(index)
+            f.write(refs)
+            for block in blocks:
+                f.write(block)
+        os.replace(path + ".tmp", path)
+
+
+def _encode_block(questions):
+    counts = bytearray()
+    correct = bytearray()
+    strings = []
+    for q in questions:
+        if len(q.options) > 255:
+            raise QuestionBankError(f"{q.text[:40]!r}: more than 255 options")
+        counts.append(len(q.options))
+        correct.append(q.correct)
+        strings.append(q.text)
+        strings.extend(q.options)
+    if any("\0" in s for s in strings):
+        raise QuestionBankError("question text or option contains a NUL character")
+    return BLOCK_HEADER.pack(len(questions)) + bytes(counts) + bytes(correct) + "\0".join(strings).encode("utf-8")
+
+
+def _decode_block(data):
+    (n,) = BLOCK_HEADER.unpack_from(data)
+    pos = BLOCK_HEADER.size
+    counts = data[pos:pos + n]
+    correct = data[pos + n:pos + 2 * n]
+    strings = data[pos + 2 * n:].decode("utf-8").split("\0")
+    questions = []
+    at = 0
+    for count, right in zip(counts, correct):
+        questions.append(Question(sys.intern(strings[at]), tuple(sys.intern(o) for o in strings[at + 1:at + 1 + count]),
+                                  right))
+        at += 1 + count
+    return questions
+
+
+class LazyQuestions(Sequence):
+    """A test's questions, decoded from the package on first access."""
+
+    def __init__(self, package, ids):
+        self._package = package
+        self._ids = ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self._package.question(i) for i in self._ids[index])
+        return self._package.question(self._ids[index])
+
+
+class Package:
+    """A read-only ``.eqp`` package; ``tests`` maps name -> Test with lazily decoded questions."""
+
+    def __init__(self, path):
+        self.path = path
+        # Kept open so blocks are read from the file the index came from, even once it is replaced
+        self._file = open(path, "rb")
+        self._lock = threading.Lock()
+        try:
+            header = self._read_at(0, HEADER.size)
+            if len(header) < HEADER.size:
+                raise QuestionBankError("not an exam package (too short)")
+            magic, version, self.block_size, self.question_count, index_len, refs_len = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise QuestionBankError("not an exam package")
+            if version != VERSION:
+                raise QuestionBankError(f"package version {version} is not supported")
+            try:
+                index = json.loads(zlib.decompress(self._read_at(HEADER.size, index_len)))
+                refs = array("I", zlib.decompress(self._read_at(HEADER.size + index_len, refs_len)))
+            except (zlib.error, ValueError) as e:
+                raise QuestionBankError(f"damaged package ({e})") from None
+        except BaseException:
+            self._file.close()
+            raise
+        if sys.byteorder != "little":
+            refs.byteswap()
+        self._data_start = HEADER.size + index_len + refs_len
+        self._offsets = index["blocks"]
+        self._blocks = {}
+        self.tests = {}
+        at = 0
+        for name, duration, count in index["tests"]:
+            self.tests[name] = Test(name, LazyQuestions(self, refs[at:at + count]), duration)
+            at += count
+        self.names = list(self.tests)
+
+    def _read_at(self, offset, length):
+        if hasattr(os, "pread"):
+            return os.pread(self._file.fileno(), length, offset)
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(length)
+
+    def question(self, qid):
+        number, slot = divmod(qid, self.block_size)
+        block = self._blocks.get(number)
+        if block is None:
+            offset, length = self._offsets[number]
+            try:
+                block = self._blocks[number] = _decode_block(zlib.decompress(self._read_at(self._data_start + offset,
+                                                                                         length)))
+            except zlib.error as e:
+                raise QuestionBankError(f"{os.path.basename(self.path)}: damaged block {number} ({e})") from None
+        return block[slot]
+
+    def close(self):
+        self._file.close()
+
+    def __del__(self):
+        file = getattr(self, "_file", None)
+        if file is not None:
+            file.close()
+
+    @property
+    def decoded_blocks(self):
+        return len(self._blocks)
+
+
+def pack_folder(folder=TEST_FOLDER, out="tests" + PACKAGE_EXT, extra_paths=()):
+    bank = QuestionBank(folder, extra_paths)
+    bank.scan()
+    for name, error in sorted(bank.errors.items()):
+        print(f"skipping {name}: {error}")
+    store = QuestionStore()
+    store.add_bank(bank)
+    store.write(out)
+    total = sum(len(ids) for ids, _ in store.tests.values())
+    print(f"{len(store.tests)} tests, {total} questions, {len(store.questions)} unique "
+          f"({total - len(store.questions)} repeats stored once) -> {out}, {os.path.getsize(out)} bytes")
+    return store
+
+
+# ---------- Benchmark ----------
+def _synthetic_store(questions, per_test=40, reuse=0.4, seed=0):
+    # ``reuse`` of each test's questions come from earlier tests, as in test_jsons/
+    import random
+    rng = random.Random(seed)
+    words = ["planet", "organ", "river", "element", "capital", "author", "ocean", "gas", "bone", "metal"]
+    store = QuestionStore()
+    made = 0
+    t = 0
+    while made < questions:
+        t += 1
+        ids = []
+        for _ in range(per_test):
+            if store.questions and rng.random() < reuse:
+                ids.append(rng.randrange(len(store.questions)))
+            elif made < questions:
+                w = rng.choice(words)
+                options = tuple(f"{word.title()} {rng.randrange(1000)}" for word in rng.sample(words, 4))
+                ids.append(store.add_question(Question(f"Which {w} is number {made} on the list?", options,
+                                                       rng.randrange(4))))
+                made += 1
+        store.tests[f"test{t}.json"] = (tuple(ids), None)
+    return store
+
+
+def _folder_size(folder):
+    return sum(e.stat().st_size for e in os.scandir(folder))
+
+
+def bench(questions=50000):
+    store = _synthetic_store(questions)
+    refs = sum(len(ids) for ids, _ in store.tests.values())
+    folder = tempfile.mkdtemp()
+    try:
+        json_folder = os.path.join(folder, "json")
+        os.makedirs(json_folder)
+        for name in store.tests:
+            test = store.test(name)
+            data = {"questions": [{"question": q.text, "options": list(q.options), "correct": q.options[q.correct]}
+                                  for q in test.questions]}
+            with open(os.path.join(json_folder, name), "w") as f:
+                json.dump(data, f, indent=4)   # as the files in test_jsons/ are written
+        package = os.path.join(folder, "bank" + PACKAGE_EXT)
+        start = time.perf_counter()
+        store.write(package)
+        write_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bank = QuestionBank(json_folder)
+        bank.scan()
+        json_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        opened = Package(package)
+        open_s = time.perf_counter() - start
+        name = opened.names[len(opened.names) // 2]
+        start = time.perf_counter()
+        list(opened.tests[name].questions)
+        one_ms = (time.perf_counter() - start) * 1000
+        one_blocks = opened.decoded_blocks
+        start = time.perf_counter()
+        for test in opened.tests.values():
+            list(test.questions)
+        all_s = time.perf_counter() - start
+        assert [tuple(t.questions) for t in opened.tests.values()] == [bank.tests[n].questions for n in opened.names]
+
+        json_mb = _folder_size(json_folder) / 2**20
+        package_mb = os.path.getsize(package) / 2**20
+        print(f"{len(store.tests)} tests, {refs} question references, {len(store.questions)} unique questions")
+        print(f"size:  JSON files {json_mb:7.1f} MB   package {package_mb:6.2f} MB ({json_mb / package_mb:.0f}x smaller)")
+        print(f"load:  QuestionBank scan of JSON {json_s * 1000:7.0f} ms")
+        print(f"       open package              {open_s * 1000:7.1f} ms (index only)")
+        print(f"       + one test's questions    {one_ms:7.1f} ms ({one_blocks} of {len(opened._offsets)} blocks decoded)")
+        print(f"       + every question          {all_s * 1000:7.0f} ms")
+        print(f"pack:  {write_s * 1000:.0f} ms")
+    finally:
+        shutil.rmtree(folder)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deduplicated, compressed exam packages")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("pack", help="store every test in a folder once per question")
+    p.add_argument("folder", nargs="?", default=TEST_FOLDER)
+    p.add_argument("-o", "--out", default="tests" + PACKAGE_EXT)
+    p.add_argument("--extra", nargs="*", default=[], help="single test files outside the folder")
+    ls = sub.add_parser("list")
+    ls.add_argument("package")
+    b = sub.add_parser("bench")
+    b.add_argument("--questions", type=int, default=50000)
+    args = parser.parse_args(argv)
+
+    if args.command == "pack":
+        pack_folder(args.folder, args.out, args.extra)
+    elif args.command == "list":
+        package = Package(args.package)
+        for name, test in package.tests.items():
+            duration = f", {test.duration} s" if test.duration else ""
+            print(f"{name}: {len(test.questions)} questions{duration}")
+        print(f"{len(package.tests)} tests, {package.question_count} unique questions")
+    else:
+        bench(args.questions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""SQLite store of exam results for teacher dashboards.
+
+One row per submitted exam in ``results`` and one per answered question in
+``answers``; students and tests are interned into small lookup tables. The
+indexes cover the queries teachers actually run:
+
+    results(student_id, submitted)   a student's history
+    results(test_id, submitted)      a test's results, optionally in a date range
+    results(submitted)               everything in a term / week
+
+Each submission is written in one transaction with its answers inserted by
+executemany, and ``import_folder`` loads a whole submissions/ folder in one
+transaction. The database runs in WAL mode so a dashboard can read while
+submissions are written.
+
+    python result_store.py import [submissions]    # add grading.py submission files
+    python result_store.py bench [--students 1000] # a synthetic school year: inserts, size, query times
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+RESULTS_DB = "results.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS tests (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, questions INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    student_id INTEGER NOT NULL REFERENCES students(id),
+    test_id INTEGER NOT NULL REFERENCES tests(id),
+    submitted REAL NOT NULL,
+    score INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    elapsed REAL,
+    UNIQUE (student_id, test_id, submitted)
+);
+CREATE TABLE IF NOT EXISTS answers (
+    result_id INTEGER NOT NULL REFERENCES results(id) ON DELETE CASCADE,
+    question INTEGER NOT NULL,
+    option INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    PRIMARY KEY (result_id, question)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_by_student ON results(student_id, submitted);
+CREATE INDEX IF NOT EXISTS results_by_test ON results(test_id, submitted);
+CREATE INDEX IF NOT EXISTS results_by_date ON results(submitted);
+"""
+
+TestSummary = namedtuple("TestSummary", "test attempts mean_percent min_percent max_percent")
+QuestionStat = namedtuple("QuestionStat", "question attempts percent_correct unanswered")
+HistoryRow = namedtuple("HistoryRow", "submitted test score total")
+
+
+class ResultStore:
+    def __init__(self, path=RESULTS_DB):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+        self._ids = {"students": {}, "tests": {}}
+
+    def close(self):
+        self.db.close()
+
+    def _id(self, table, name, questions=None):
+        cache = self._ids[table]
+        if name not in cache:
+            if table == "tests":
+                self.db.execute("INSERT OR IGNORE INTO tests(name, questions) VALUES (?, ?)", (name, questions))
+            else:
+                self.db.execute("INSERT OR IGNORE INTO students(name) VALUES (?)", (name,))
+            cache[name] = self.db.execute(f"SELECT id FROM {table} WHERE name = ?", (name,)).fetchone()[0]
+        return cache[name]
+
+    def _insert(self, submission, key):
+        answers = submission["answers"]
+        marks = [int(a == k) for a, k in zip(answers, key)]
+        cur = self.db.execute(
+            "INSERT OR IGNORE INTO results(student_id, test_id, submitted, score, total, elapsed) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (self._id("students", submission["student"]), self._id("tests", submission["test"], len(key)),
+             submission["submitted"], sum(marks), len(key), submission.get("elapsed")))
+        if cur.rowcount == 0:
+            return False   # already stored
+        self.db.executemany("INSERT INTO answers(result_id, question, option, correct) VALUES (?, ?, ?, ?)",
+                            [(cur.lastrowid, q, a, m) for q, (a, m) in enumerate(zip(answers, marks))])
+        return True
+
+    @contextmanager
+    def _transaction(self):
+        try:
+            with self.db:
+                yield
+        except BaseException:
+            # Ids looked up in the rolled-back transaction may never have been committed
+            self._ids = {"students": {}, "tests": {}}
+            raise
+
+    def add(self, submission, key):
+        """Store one grading.py submission dict; ``key`` is the correct option per question."""
+        with self._transaction():
+            return self._insert(submission, key)
+
+    def add_many(self, pairs):
+        """Store many (submission, key) pairs in a single transaction; returns how many were new."""
+        with self._transaction():
+            return sum(self._insert(submission, key) for submission, key in pairs)
+
+    # ---------- Teacher queries ----------
+    def test_summary(self, test, since=None, until=None):
+        row = self.db.execute(
+            "SELECT COUNT(*), AVG(100.0 * score / total), MIN(100.0 * score / total), MAX(100.0 * score / total) "
+            "FROM results JOIN tests ON tests.id = results.test_id "
+            "WHERE tests.name = ? AND submitted >= ? AND submitted < ?",
+            (test, since or 0, until or float("inf"))).fetchone()
+        return TestSummary(test, *row)
+
+    def averages(self, since=None, until=None):
+        """TestSummary for every test sat in the period, most attempted first."""
+        rows = self.db.execute(
+            "SELECT tests.name, COUNT(*), AVG(100.0 * score / total), MIN(100.0 * score / total), "
+            "MAX(100.0 * score / total) FROM results INDEXED BY results_by_date "
+            "JOIN tests ON tests.id = results.test_id "
+            "WHERE submitted >= ? AND submitted < ? GROUP BY results.test_id ORDER BY COUNT(*) DESC",
+            (since or 0, until or float("inf")))
+        return [TestSummary(*row) for row in rows]
+
+    def question_stats(self, test, since=None, until=None):
+        rows = self.db.execute(
+            "SELECT question, COUNT(*), 100.0 * AVG(correct), SUM(option < 0) "
+            "FROM results JOIN tests ON tests.id = results.test_id "
+            "JOIN answers ON answers.result_id = results.id "
+            "WHERE tests.name = ? AND submitted >= ? AND submitted < ? GROUP BY question ORDER BY question",
+            (test, since or 0, until or float("inf")))
+        return [QuestionStat(*row) for row in rows]
+
+    def student_history(self, student, limit=None):
+        rows = self.db.execute(
+            "SELECT submitted, tests.name, score, total FROM results "
+            "JOIN students ON students.id = results.student_id JOIN tests ON tests.id = results.test_id "
+            "WHERE students.name = ? ORDER BY submitted DESC LIMIT ?",
+            (student, -1 if limit is None else limit))
+        return [HistoryRow(*row) for row in rows]
+
+
+def import_folder(store, submission_folder, bank):
+    """Add every submission file whose test is in ``bank`` (a scanned QuestionBank).
+
+    Earlier attempts are imported too; files already in the store are skipped by its UNIQUE key.
+    Files that fail grading.check_submission are skipped with a message.
+    """
+    import grading
+    keys = {}
+    pairs = []
+    for sub in grading.iter_submissions(submission_folder):   # only records that pass check_submission
+        test_name = sub["test"]
+        if test_name in bank.tests:
+            if test_name not in keys:
+                keys[test_name] = [q.correct for q in bank.tests[test_name].questions]
+            pairs.append((sub, keys[test_name]))
+    return store.add_many(pairs)
+
+
+# ---------- Benchmark ----------
+def _synthetic_year(students, tests, questions, sittings, seed=0):
+    import random
+    rng = random.Random(seed)
+    keys = {f"test{t + 1}.json": [rng.randrange(4) for _ in range(questions)] for t in range(tests)}
+    names = list(keys)
+    year_start = time.mktime((2025, 6, 1, 0, 0, 0, 0, 0, -1))
+    for s in range(students):
+        skill = rng.random()
+        for _ in range(sittings):
+            test = rng.choice(names)
+            key = keys[test]
+            answers = [k if rng.random() < 0.3 + 0.6 * skill else rng.randrange(-1, 4) for k in key]
+            yield ({"student": f"student{s:04d}", "test": test, "answers": answers,
+                    "submitted": year_start + rng.random() * 300 * 86400, "elapsed": rng.uniform(300, 1800)}, key)
+
+
+def _time_ms(fn, repeats=20):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench(students=1000, tests=60, questions=25, sittings=40):
+    with tempfile.TemporaryDirectory() as folder:
+        data = list(_synthetic_year(students, tests, questions, sittings))
+
+        single = ResultStore(os.path.join(folder, "single.db"))
+        sample = data[:500]
+        start = time.perf_counter()
+        for submission, key in sample:
+            single.add(submission, key)
+        per_commit_ms = (time.perf_counter() - start) * 1000 / len(sample)
+        single.close()
+
+        store = ResultStore(os.path.join(folder, RESULTS_DB))
+        start = time.perf_counter()
+        for batch in range(0, len(data), 5000):
+            store.add_many(data[batch:batch + 5000])
+        batched_s = time.perf_counter() - start
+        store.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size_mb = os.path.getsize(store.path) / 2**20
+
+        month = (time.mktime((2025, 9, 1, 0, 0, 0, 0, 0, -1)), time.mktime((2025, 10, 1, 0, 0, 0, 0, 0, -1)))
+        print(f"{students} students x {sittings} sittings = {len(data)} results, "
+              f"{len(data) * questions} answers, {tests} tests")
+        print(f"insert, one transaction per submission: {per_commit_ms:7.2f} ms/submission")
+        print(f"insert, batched:                        {batched_s * 1000 / len(data):7.3f} ms/submission "
+              f"({batched_s:.1f} s total)")
+        print(f"database size:                          {size_mb:7.1f} MB")
+        queries = [
+            ("student history", lambda: store.student_history("student0421")),
+            ("test summary (year)", lambda: store.test_summary("test7.json")),
+            ("test summary (one month)", lambda: store.test_summary("test7.json", *month)),
+            ("per-question stats", lambda: store.question_stats("test7.json")),
+            ("all test averages (one month)", lambda: store.averages(*month)),
+        ]
+        for label, query in queries:
+            print(f"{label + ':':<40}{_time_ms(query):7.2f} ms")
+        store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Store and query exam results")
+    parser.add_argument("--db", default=RESULTS_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="add submission files written by test.py")
+    imp.add_argument("submissions", nargs="?", default="submissions")
+    imp.add_argument("--tests", default="test_jsons")
+    b = sub.add_parser("bench")
+    b.add_argument("--students", type=int, default=1000)
+    b.add_argument("--sittings", type=int, default=40, help="exams per student per year")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        from question_bank import QuestionBank
+        bank = QuestionBank(args.tests, ["simulated_test.json"])
+        bank.scan()
+        store = ResultStore(args.db)
+        print(f"added {import_folder(store, args.submissions, bank)} new result(s) to {args.db}")
+        store.close()
+    else:
+        bench(args.students, sittings=args.sittings)
+
+
+if __name__ == "__main__":
+    main()
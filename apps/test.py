@@ -1,21 +1,39 @@
 import customtkinter as ctk
 import tkinter.messagebox as messagebox
-import json
 import os
 import random
-import threading
+import getpass
+import platform
+import sqlite3
 import time
+import answer_journal
+import grading
+from exam_scheduler import WARN_AT, ExamScheduler
+from exam_widgets import OptionPool, QuestionPalette
+from lab_protocol import extend_seconds, remote_controlled, watch_stdin
+from process_monitor import ProcessMonitor
+from question_bank import QuestionBank, QuestionBankError
+from result_store import ResultStore
 
 # ---------- Constants ----------
 TEST_FOLDER = "test_jsons"
-NUM_TESTS = 10
+EXTRA_TESTS = ["simulated_test.json"]
+TESTS_PER_PAGE = 10
 MAX_FOCUS_LOSSES = 3
+ALLOWED_APPS = ["python3", "onboard", "ibus-daemon"]   # programs students may start during an exam (Linux names)
+BANNER_SECONDS = 8   # how long an anti-cheat notice stays on screen
+CHECKPOINT_SECONDS = 5   # how often the time used is written to the answer journal
+# Who is sitting the exam; lab PCs share accounts, so the machine name is part of it
+STUDENT_ID = os.environ.get("EDULITE_STUDENT") or f"{getpass.getuser()}@{platform.node()}"
 
 # ---------- Global Variables ----------
-test_data = {}
+test_data = None
 student_answers = {}
-process_monitor_thread = None
-monitor_running = False
+current_index = 0
+journal = None              # answer_journal.AnswerJournal of the exam in progress
+exam_started_at = 0.0       # time.monotonic() when this sitting (or resumed sitting) began
+elapsed_before = 0.0        # exam time used before a crash, restored from the journal
+monitor = None              # process_monitor.ProcessMonitor while an exam runs
 focus_loss_count = 0
 exam_mode_active = False
 
@@ -25,29 +43,72 @@ ctk.set_default_color_theme("blue")
 root = ctk.CTk()
 root.title("Exam Simulation App")
 root.geometry("1200x700")
+scheduler = ExamScheduler(root)   # exam countdown and journal checkpoints, on time.monotonic()
 
 # ---------- Logging ----------
 def log(message):
     print("[LOG]", message)
 
 # ---------- Load JSON Tests ----------
+# Every test is validated once and re-read only when its file changes
+bank = QuestionBank(TEST_FOLDER, EXTRA_TESTS)
+current_page = 0
+
 def load_test_files():
-    return [f for f in os.listdir(TEST_FOLDER) if f.endswith(".json")]
+    names = bank.scan()
+    for name, error in bank.errors.items():
+        log(f"Skipping {name}: {error}")
+    return names
 
 # ---------- Start Exam ----------
-def start_exam(filename):
-    global test_data, student_answers, focus_loss_count, exam_mode_active
+def start_exam(filename, recovered=None):
+    global test_data, student_answers, focus_loss_count, exam_mode_active, journal, exam_started_at, elapsed_before
+    try:
+        test_data = bank.get(filename)
+    except (KeyError, QuestionBankError) as e:
+        messagebox.showerror("Error", f"Cannot open {filename}: {e}")
+        return
     focus_loss_count = 0
     student_answers.clear()
     exam_mode_active = True
 
-    with open(os.path.join(TEST_FOLDER, filename), "r") as f:
-        test_data = json.load(f)
+    # Every answer is journaled, so a crash or power cut can resume here
+    if recovered:
+        student_answers.update((q, a) for q, a in recovered.answers.items()
+                               if 0 <= q < len(test_data.questions))
+        elapsed_before = recovered.elapsed
+        journal = answer_journal.resume(recovered)
+        log(f"Resumed {filename}: {len(student_answers)} answers, {elapsed_before:.0f} s used")
+    else:
+        elapsed_before = 0.0
+        journal = answer_journal.AnswerJournal.create(filename, len(test_data.questions), test_data.duration)
+    exam_started_at = time.monotonic()
 
     show_exam_ui()
+    palette.reset(len(test_data.questions), load_question, answered=student_answers)
     load_question(0)
+    start_timer()
     start_process_monitor()
 
+def exam_elapsed():
+    return elapsed_before + time.monotonic() - exam_started_at
+
+def close_journal(reason):
+    global journal
+    if journal is not None:
+        journal.finish(reason, exam_elapsed())
+        journal = None
+
+def offer_recovery():
+    recovered = answer_journal.recover()
+    if recovered is None:
+        return
+    if recovered.test in bank.tests and messagebox.askyesno(
+            "Resume Exam", f"{recovered.test} was interrupted with {len(recovered.answers)} answer(s) saved. Resume it?"):
+        start_exam(recovered.test, recovered)
+    else:
+        answer_journal.abandon(recovered)
+
 # ---------- UI: Test Selection ----------
 selection_frame = ctk.CTkFrame(root)
 selection_frame.pack(fill="both", expand=True)
@@ -55,12 +116,31 @@ selection_frame.pack(fill="both", expand=True)
 ctk.CTkLabel(selection_frame, text="Select a Test", font=("Arial", 30)).pack(pady=20)
 test_buttons_frame = ctk.CTkFrame(selection_frame)
 test_buttons_frame.pack()
+page_frame = ctk.CTkFrame(selection_frame)
+page_frame.pack(pady=10)
+prev_page_btn = ctk.CTkButton(page_frame, text="⟵ Page", width=90, command=lambda: show_page(current_page - 1))
+page_label = ctk.CTkLabel(page_frame, text="")
+next_page_btn = ctk.CTkButton(page_frame, text="Page ⟶", width=90, command=lambda: show_page(current_page + 1))
+prev_page_btn.grid(row=0, column=0, padx=10)
+page_label.grid(row=0, column=1, padx=10)
+next_page_btn.grid(row=0, column=2, padx=10)
 
 def create_test_buttons():
-    files = load_test_files()[:NUM_TESTS]
-    for idx, f in enumerate(files):
-        btn = ctk.CTkButton(test_buttons_frame, text=f"Test {idx+1}", command=lambda file=f: confirm_start(file))
+    load_test_files()
+    show_page(current_page)
+
+def show_page(page):
+    global current_page
+    current_page = min(max(page, 0), bank.page_count(TESTS_PER_PAGE) - 1)
+    for btn in test_buttons_frame.winfo_children():
+        btn.destroy()
+    first = current_page * TESTS_PER_PAGE
+    for idx, f in enumerate(bank.page(current_page, TESTS_PER_PAGE)):
+        btn = ctk.CTkButton(test_buttons_frame, text=f"Test {first+idx+1}", command=lambda file=f: confirm_start(file))
         btn.grid(row=idx//5, column=idx%5, padx=10, pady=10)
+    page_label.configure(text=f"Page {current_page+1} of {bank.page_count(TESTS_PER_PAGE)}")
+    prev_page_btn.configure(state="normal" if current_page > 0 else "disabled")
+    next_page_btn.configure(state="normal" if current_page < bank.page_count(TESTS_PER_PAGE)-1 else "disabled")
 
 def confirm_start(filename):
     if messagebox.askyesno("Confirm", f"Start {filename}?"):
@@ -71,31 +151,52 @@ create_test_buttons()
 # ---------- UI: Exam Interface ----------
 exam_frame = ctk.CTkFrame(root)
 
+timer_label = ctk.CTkLabel(exam_frame, text="", font=("Arial", 16))
+timer_label.pack(pady=(10, 0))
+# Notices go in the exam window; a message box would take the focus and count as switching away
+banner_label = ctk.CTkLabel(exam_frame, text="", font=("Arial", 14), text_color="#FF5555")
+banner_label.pack()
+banner_job = None
+
+def show_banner(text):
+    global banner_job
+    banner_label.configure(text=text)
+    if banner_job is not None:
+        root.after_cancel(banner_job)
+    banner_job = root.after(BANNER_SECONDS * 1000, hide_banner)
+
+def hide_banner():
+    global banner_job
+    banner_job = None
+    banner_label.configure(text="")
+
 question_label = ctk.CTkLabel(exam_frame, text="", font=("Arial", 20), wraplength=900)
 question_label.pack(pady=20)
 
-options_var = ctk.StringVar(value="")
-options_buttons = []
+options_frame = ctk.CTkFrame(exam_frame, fg_color="transparent")
+options_frame.pack(pady=10)
+options_var = ctk.IntVar(value=-1)
+# Option buttons are created once and reconfigured per question, not rebuilt
+option_pool = OptionPool(options_frame, options_var)
 
 def load_question(index):
-    for btn in options_buttons:
-        btn.destroy()
-    options_buttons.clear()
+    global current_index
+    current_index = index
+    q = test_data.questions[index]
+    question_label.configure(text=f"Q{index+1}: {q.text}")
 
-    q = test_data["questions"][index]
-    question_label.configure(text=f"Q{index+1}: {q['question']}")
-    options_var.set("")
-
-    for i, opt in enumerate(q["options"]):
-        btn = ctk.CTkRadioButton(exam_frame, text=opt, variable=options_var, value=opt,
-                                 command=lambda idx=index, val=opt: save_answer(idx, val))
-        btn.pack(pady=5)
-        options_buttons.append(btn)
+    # Answers are stored as option indexes, like Question.correct
+    option_pool.show(q.options, lambda val, idx=index: save_answer(idx, val),
+                     selected=student_answers.get(index, -1))
 
+    palette.set_current(index)
     update_nav_buttons(index)
 
 def save_answer(q_idx, answer):
     student_answers[q_idx] = answer
+    palette.mark(q_idx)
+    if journal is not None:
+        journal.answer(q_idx, answer, exam_elapsed())
 
 # ---------- UI: Navigation ----------
 nav_frame = ctk.CTkFrame(exam_frame)
@@ -111,28 +212,99 @@ submit_btn.pack(pady=10)
 quit_btn.pack()
 
 def navigate(offset):
-    current = list(student_answers.keys())[-1] if student_answers else 0
-    new_index = current + offset
-    if 0 <= new_index < len(test_data["questions"]):
+    new_index = current_index + offset
+    if 0 <= new_index < len(test_data.questions):
         load_question(new_index)
 
 def update_nav_buttons(index):
     prev_btn.configure(state="normal" if index > 0 else "disabled")
-    next_btn.configure(state="normal" if index < len(test_data["questions"])-1 else "disabled")
+    next_btn.configure(state="normal" if index < len(test_data.questions)-1 else "disabled")
+
+# ---------- UI: Question Palette ----------
+# Click a number to jump there; green = answered, outlined = current
+palette_frame = ctk.CTkScrollableFrame(exam_frame, height=110, width=460)
+palette_frame.pack(pady=10)
+palette = QuestionPalette(palette_frame)
+
+# ---------- Keyboard Navigation ----------
+# ←/→ previous/next, Home/End first/last, 1-9 pick an option
+def on_key(event):
+    if not exam_mode_active or test_data is None:
+        return
+    if event.keysym in ("Left", "Prior"):
+        navigate(-1)
+    elif event.keysym in ("Right", "Next"):
+        navigate(1)
+    elif event.keysym == "Home":
+        load_question(0)
+    elif event.keysym == "End":
+        load_question(len(test_data.questions) - 1)
+    elif event.char.isdigit() and event.char != "0":
+        choice = int(event.char) - 1
+        if choice < len(test_data.questions[current_index].options):
+            options_var.set(choice)
+            save_answer(current_index, choice)
+
+root.bind("<Key>", on_key)
+
+# ---------- Exam Timer ----------
+# Counts down tests that have a "duration"; time used is checkpointed to the journal either way
+def start_timer():
+    scheduler.stop()
+    scheduler.add("checkpoint", CHECKPOINT_SECONDS, checkpoint_journal, repeat=True)
+    if test_data.duration:
+        scheduler.add("exam", max(0.0, test_data.duration - elapsed_before), time_up,
+                      on_tick=show_remaining, on_warning=warn_time_low)
+    else:
+        timer_label.configure(text="")
+
+def checkpoint_journal():
+    if journal is not None:
+        journal.checkpoint(exam_elapsed())
+
+def show_remaining(seconds):
+    mins, secs = divmod(seconds, 60)
+    timer_label.configure(text=f"Time remaining: {mins:02d}:{secs:02d}" if seconds > 0 else "",
+                          text_color=("#FF5555" if seconds <= WARN_AT[0] else ("gray10", "#DCE4EE")))
+
+def warn_time_low(seconds):
+    log(f"{seconds / 60:.0f} minutes left")
+
+def time_up():
+    if exam_mode_active:
+        messagebox.showinfo("Time's Up", "Time is up. Submitting exam.")
+        submit_exam()
 
 # ---------- Submit Exam ----------
 def submit_exam():
     stop_process_monitor()
+    scheduler.stop()
     global exam_mode_active
     exam_mode_active = False
+    answers = [student_answers.get(i, grading.UNANSWERED) for i in range(len(test_data.questions))]
+    # Written before the journal is closed, so a crash in between still resumes the exam
+    path, submission = grading.write_submission(STUDENT_ID, test_data.name, answers, exam_elapsed())
+    log(f"Submission saved to {path}")
+    store = ResultStore()
+    try:
+        store.add(submission, [q.correct for q in test_data.questions])
+    except sqlite3.Error as e:
+        log(f"Could not record result in {store.path}: {e}")   # the submission file is still there
+    finally:
+        store.close()
+    close_journal("submitted")
     root.attributes("-fullscreen", False)
-    score = sum(1 for i, ans in student_answers.items() if ans == test_data["questions"][i]["correct"])
-    messagebox.showinfo("Exam Completed", f"Your score: {score}/{len(test_data['questions'])}")
+    score = sum(1 for i, ans in enumerate(answers) if ans == test_data.questions[i].correct)
+    messagebox.showinfo("Exam Completed", f"Your score: {score}/{len(test_data.questions)}")
     show_selection_ui()
 
 def quit_exam():
+    global exam_mode_active
     if messagebox.askyesno("Quit", "Are you sure you want to quit the exam?"):
         stop_process_monitor()
+        scheduler.stop()
+        exam_mode_active = False
+        close_journal("quit")
         root.attributes("-fullscreen", False)
         show_selection_ui()
 
@@ -144,8 +316,12 @@ def show_exam_ui():
     root.focus_force()
 
 def show_selection_ui():
+    if remote_controlled():
+        root.destroy()   # a sitting started from the teacher console ends here; lab_agent.py reports it
+        return
     exam_frame.pack_forget()
     selection_frame.pack(fill="both", expand=True)
+    create_test_buttons()   # picks up tests added or edited meanwhile
 
 # ---------- Anti-Cheat: Focus Loss Detection ----------
 def on_focus_out(event):
@@ -170,21 +346,54 @@ root.bind("<Button-3>", block_right_click)
 root.bind("<Print>", block_screenshot)
 root.bind("<Control-Shift-s>", block_screenshot)
 
-# ---------- Anti-Cheat: Dummy Monitor Thread ----------
+# ---------- Anti-Cheat: Process Monitor ----------
+# Reports programs the student starts during the exam that are not in ALLOWED_APPS
 def start_process_monitor():
-    global monitor_running, process_monitor_thread
-    monitor_running = True
-    process_monitor_thread = threading.Thread(target=monitor_loop, daemon=True)
-    process_monitor_thread.start()
+    global monitor
+    stop_process_monitor()
+    monitor = ProcessMonitor(ALLOWED_APPS, lambda info: root.after(0, on_unauthorized_process, info),
+                             uid=os.getuid()).start()
+    log(f"Process monitor running ({monitor.mode})")
 
 def stop_process_monitor():
-    global monitor_running
-    monitor_running = False
+    global monitor
+    if monitor is not None:
+        monitor.stop()
+        monitor = None
 
-def monitor_loop():
-    while monitor_running:
-        # Simulated: You can extend this to detect other apps/processes
-        time.sleep(2)
+def on_unauthorized_process(info):
+    if exam_mode_active:
+        log(f"Unauthorized program started: {info.name} (pid {info.pid})")
+        show_banner(f"{info.name} is not allowed during the exam.")
+
+# ---------- Remote Control (lab_agent.py) ----------
+# Started from the teacher console: open the test straight away, then obey "stop" and "extend <seconds>"
+def start_remote_exam():
+    name = os.environ.get("EDULITE_START_TEST")
+    recovered = answer_journal.recover()
+    if recovered is not None and recovered.test == name:
+        start_exam(name, recovered)   # this seat crashed during the same exam; carry on
+    else:
+        if recovered is not None:
+            answer_journal.abandon(recovered)
+        start_exam(name)
+
+def on_remote_command(words):
+    if words[0] == "stop" and exam_mode_active:
+        log("Stopped from the teacher console")
+        submit_exam()
+    elif words[0] == "extend" and scheduler.remaining("exam") is not None:
+        seconds = extend_seconds(words)
+        if seconds is None:
+            log(f"Ignored bad command from the teacher console: {' '.join(words)}")
+            return
+        scheduler.extend("exam", seconds)
+        log(f"{seconds:g} s extra time from the teacher console")
 
 # ---------- Run App ----------
+if remote_controlled():
+    watch_stdin(root, on_remote_command)
+    root.after(100, start_remote_exam)
+else:
+    root.after(100, offer_recovery)
 root.mainloop()
@@ -1,23 +1,91 @@
-from transformers import DistilBertTokenizer, DistilBertForQuestionAnswering, Trainer, TrainingArguments
-from datasets import Dataset
+import argparse
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from qa_sources import iter_aiml_pairs
+
+BASE_MODEL = "distilbert-base-uncased"
+SAVED_MODEL = "fine_tuned_distilbert"
+OUTPUT_DIR = "./results"                     # Trainer checkpoints, used by --resume
+MAX_LENGTH = 128
+TOKENIZED_CACHE = "tokenized_cache"          # pre-tokenized datasets, one folder per (data, mode)
+THROUGHPUT_LOG = "training_throughput.log"
+
+# ---------- Command line ----------
+#   python todo.py train [--resume]    fine-tune and save to fine_tuned_distilbert
+#   python todo.py serve [question..]  answer from the saved model, no training
+# With no command: serve if a saved model exists, otherwise train.
+#
+# Training modes:
+#   legacy  every sequence padded to 128 tokens, batch 4, no accumulation (the original setup)
+#   fast    dynamic padding per batch, length-grouped batches, gradient accumulation
+parser = argparse.ArgumentParser(description="Fine-tune or serve DistilBERT on the chatbot Q&A data (CPU friendly)")
+sub = parser.add_subparsers(dest="command")
+train_parser = sub.add_parser("train", help="fine-tune and save the model")
+train_parser.add_argument("--mode", choices=["fast", "legacy"], default="fast")
+train_parser.add_argument("--batch-size", type=int, default=4)
+train_parser.add_argument("--grad-accum", type=int, default=4, help="batches per optimizer step (fast mode)")
+train_parser.add_argument("--threads", type=int, default=os.cpu_count(), help="torch intra-op threads")
+train_parser.add_argument("--epochs", type=float, default=3)
+train_parser.add_argument("--max-steps", type=int, default=-1, help="stop early, e.g. for throughput runs")
+train_parser.add_argument("--resume", action="store_true", help=f"continue from the last checkpoint in {OUTPUT_DIR}")
+train_parser.add_argument("--no-save", action="store_true", help=f"don't overwrite {SAVED_MODEL}")
+train_parser.add_argument("--compare", action="store_true",
+                          help="run legacy and fast for --max-steps (default 20) and print both throughputs")
+serve_parser = sub.add_parser("serve", help="answer questions from the saved model")
+serve_parser.add_argument("questions", nargs="*", help="questions to answer; interactive if none")
+args = parser.parse_args()
+if args.command is None:
+    args = parser.parse_args(["serve" if os.path.isdir(SAVED_MODEL) else "train"])
+
+
+# ---------- Serve ----------
+def serve(questions, backend="auto"):
+    # Tokenizer and model are loaded once (int8 if exported) and reused for every question
+    from qa_inference import QAModel
+    qa = QAModel(backend, model_dir=SAVED_MODEL)
+    if questions:
+        for question in questions:
+            print(qa.ask_question(question))
+        return
+    print(f"Answering from {SAVED_MODEL} ({qa.backend}). Type 'quit' to exit.")
+    while True:
+        question = input("> ").strip()
+        if question.lower() == "quit":
+            break
+        if question:
+            print(qa.ask_question(question))
+
+
+if args.command == "serve":
+    serve(args.questions)
+    sys.exit(0)
+
+
+# ---------- Train ----------
+if args.compare:
+    steps = str(args.max_steps if args.max_steps > 0 else 20)
+    for mode in ("legacy", "fast"):
+        subprocess.run([sys.executable, __file__, "train", "--mode", mode, "--max-steps", steps, "--no-save",
+                        "--batch-size", str(args.batch_size), "--grad-accum", str(args.grad_accum),
+                        "--threads", str(args.threads)], check=True)
+    sys.exit(0)
+
+from transformers import (DataCollatorForSeq2Seq, DistilBertTokenizer, DistilBertForQuestionAnswering,
+                          Trainer, TrainingArguments)
+from transformers.trainer_utils import get_last_checkpoint
+from datasets import Dataset, load_from_disk
 import pandas as pd
-import aiml
-import csv
-
-# Load math.aiml
-kernel = aiml.Kernel()
-kernel.learn("math.aiml")
-math_data = []
-with open("math.aiml", "r") as f:
-    lines = f.readlines()
-    i = 0
-    while i < len(lines):
-        if "<pattern>" in lines[i]:
-            question = lines[i].replace("<pattern>", "").replace("</pattern>", "").strip()
-            if i + 1 < len(lines) and "<template>" in lines[i + 1]:
-                answer = lines[i + 1].replace("<template>", "").replace("</template>", "").strip()
-                math_data.append({"question": question, "answer": answer})
-        i += 1
+import torch
+
+torch.set_num_threads(args.threads)
+
+# Load math.aiml (streaming XML parse, one <category> at a time)
+math_data = list(iter_aiml_pairs("math.aiml")) if os.path.exists("math.aiml") else []
 
 # Load CSV files
 coding_df = pd.read_csv("coding_facts.csv")
@@ -28,37 +96,50 @@ data = math_data + coding_df.to_dict("records") + general_df.to_dict("records")
 dataset = Dataset.from_list(data)
 
 # Tokenizer and model
-tokenizer = DistilBertTokenizer.from_pretrained("distilbert-base-uncased")
-model = DistilBertForQuestionAnswering.from_pretrained("distilbert-base-uncased")
+tokenizer = DistilBertTokenizer.from_pretrained(BASE_MODEL)
+model = DistilBertForQuestionAnswering.from_pretrained(BASE_MODEL)
 
 # Preprocess for Q&A (simplified: answer as label, no context)
 def preprocess_function(examples):
+    padding = "max_length" if args.mode == "legacy" else False
     encodings = tokenizer(
         examples["question"],
         truncation=True,
-        padding="max_length",
-        max_length=128,
-        return_tensors="pt"
+        padding=padding,
+        max_length=MAX_LENGTH,
     )
     # For simplicity, encode answers as labels (not ideal for production, but lightweight)
     answer_encodings = tokenizer(
         examples["answer"],
         truncation=True,
-        padding="max_length",
-        max_length=128,
-        return_tensors="pt"
+        padding=padding,
+        max_length=MAX_LENGTH,
     )
     encodings["labels"] = answer_encodings["input_ids"]
+    encodings["length"] = [len(ids) for ids in encodings["input_ids"]]
     return encodings
 
-tokenized_dataset = dataset.map(preprocess_function, batched=True)
+# Tokenize once per (data, mode) and reuse the Arrow files on later runs
+cache_key = hashlib.sha1(json.dumps([BASE_MODEL, MAX_LENGTH, args.mode, data], sort_keys=True).encode()).hexdigest()
+cache_path = os.path.join(TOKENIZED_CACHE, f"{args.mode}-{cache_key[:16]}")
+if os.path.isdir(cache_path):
+    tokenized_dataset = load_from_disk(cache_path)
+else:
+    tokenized_dataset = dataset.map(preprocess_function, batched=True, remove_columns=dataset.column_names)
+    tokenized_dataset.save_to_disk(cache_path)
 
 # Training arguments (lightweight settings)
+fast = args.mode == "fast"
 training_args = TrainingArguments(
-    output_dir="./results",
-    num_train_epochs=3,              # Few epochs for speed
-    per_device_train_batch_size=4,   # Small batch for low RAM
-    per_device_eval_batch_size=4,
+    output_dir=OUTPUT_DIR,
+    num_train_epochs=args.epochs,    # Few epochs for speed
+    max_steps=args.max_steps,
+    per_device_train_batch_size=args.batch_size,   # Small batch for low RAM
+    per_device_eval_batch_size=args.batch_size,
+    gradient_accumulation_steps=args.grad_accum if fast else 1,
+    group_by_length=fast,            # similar lengths per batch -> little padding
+    length_column_name="length",
+    dataloader_num_workers=0,        # extra workers only cost RAM on these machines
     warmup_steps=50,
     weight_decay=0.01,
     logging_dir="./logs",
@@ -67,33 +148,37 @@ training_args = TrainingArguments(
     save_total_limit=1,              # Keep only latest checkpoint
 )
 
-# Trainer
+# Trainer; in fast mode batches are padded only to their own longest sequence
 trainer = Trainer(
     model=model,
     args=training_args,
     train_dataset=tokenized_dataset,
+    data_collator=DataCollatorForSeq2Seq(tokenizer, padding="longest") if fast else None,
 )
 
-# Fine-tune
-trainer.train()
+# Fine-tune, picking up from the last saved checkpoint when asked to
+checkpoint = get_last_checkpoint(OUTPUT_DIR) if args.resume and os.path.isdir(OUTPUT_DIR) else None
+if args.resume:
+    print(f"[train] resuming from {checkpoint}" if checkpoint else "[train] no checkpoint found, starting fresh")
+train_result = trainer.train(resume_from_checkpoint=checkpoint)
+
+# Throughput report
+samples_per_sec = train_result.metrics.get("train_samples_per_second", 0.0)
+peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+real_tokens = sum(tokenized_dataset["length"]) / len(tokenized_dataset)
+report = (f"mode={args.mode} batch={args.batch_size} accum={training_args.gradient_accumulation_steps} "
+          f"threads={args.threads} steps={train_result.global_step} samples/sec={samples_per_sec:.2f} "
+          f"peak_rss={peak_rss_mb:.0f}MB avg_tokens/sample={real_tokens:.1f}")
+print(f"[train] {report}")
+with open(THROUGHPUT_LOG, "a") as f:
+    f.write(f"[{time.ctime()}] {report}\n")
+
+if args.no_save:
+    sys.exit(0)
 
 # Save for offline use
-model.save_pretrained("fine_tuned_distilbert")
-tokenizer.save_pretrained("fine_tuned_distilbert")
-
-# Inference script (offline)
-def ask_question(question):
-    inputs = tokenizer(question, return_tensors="pt", truncation=True, padding="max_length", max_length=128)
-    outputs = model(**inputs)
-    start_scores = outputs.start_logits
-    end_scores = outputs.end_logits
-    start_idx = start_scores.argmax()
-    end_idx = end_scores.argmax() + 1
-    answer_ids = inputs["input_ids"][0][start_idx:end_idx]
-    answer = tokenizer.decode(answer_ids, skip_special_tokens=True)
-    return answer if answer else "I don’t know that yet."
-
-# Test
-print(ask_question("What is a neural network?"))
-print(ask_question("What is the capital of France?"))
-print(ask_question("What is a Fibonacci sequence?"))
\ No newline at end of file
+model.save_pretrained(SAVED_MODEL)
+tokenizer.save_pretrained(SAVED_MODEL)
+
+# Test the saved model through the same path "serve" uses
+serve(["What is a neural network?", "What is the capital of France?", "What is a Fibonacci sequence?"], backend="fp32")